@@ -0,0 +1,277 @@
+"""Benchmark the per-step vision and reward pipeline on synthetic frames.
+
+Times each stage of VampireSurvivorsEnv.step in isolation and the whole
+step end to end, using 1920x1080 frames rendered from templates/ by
+SyntheticCapture (no display, game or Windows input needed). Latencies are
+reported as p50/p95/p99 against the 1/fps budget and saved as JSON:
+
+    python bench.py --out bench_results.json
+    python bench.py --compare bench_results.json    # diff against an older run
+"""
+import argparse
+import json
+import platform
+import subprocess
+import time
+
+import cv2
+import numpy as np
+import yaml
+
+from capture_fixed import SyntheticCapture, preprocess
+from controls import KeyController
+from frame_context import FrameContext
+from reward import BarReader, bar_fill_ratio, make_matcher
+from vision import PlayerTracker, AdaptivePlayerTracker, EnemyDensityEstimator, enemy_density_ring
+
+
+def summarize(samples_s, budget_ms):
+    ms = np.asarray(samples_s, dtype=np.float64) * 1000.0
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {
+        "n": int(ms.size),
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "p99_budget_frac": float(p99 / budget_ms),
+    }
+
+
+def time_stage(fn, frames, iters, warmup=3):
+    """Run fn(ctx) over cycling frames. Every call gets a new FrameContext
+    (no pyramid levels or crops cached from earlier calls) seeded with only
+    the grayscale, since the step loop shares that across stages."""
+    grays = [FrameContext(f).gray for f in frames]
+
+    def context(i):
+        return FrameContext(frames[i % len(frames)], gray=grays[i % len(frames)])
+
+    for i in range(warmup):
+        fn(context(i))
+    out = []
+    for i in range(iters):
+        ctx = context(i)
+        t0 = time.perf_counter()
+        fn(ctx)
+        out.append(time.perf_counter() - t0)
+    return out
+
+
+def player_positions(frames, tracker):
+    pos = []
+    for f in frames:
+        tracker.last_xy = None
+        cx, cy, _ = tracker.locate(f)
+        pos.append((cx, cy) if cx is not None else (f.shape[1] // 2, f.shape[0] // 2))
+    return pos
+
+
+def run_stages(cfg, frames, iters):
+    budget_ms = 1000.0 / float(cfg["fps"])
+    mcfg = cfg.get("matching", {}) or {}
+    go = make_matcher(cfg["templates"]["game_over"], 0.75, mcfg.get("game_over"))
+    vcfg = cfg["vision"]
+    tracker = PlayerTracker(
+        cfg["templates"]["player"],
+        threshold=float(vcfg["player_match_threshold"]),
+        search_radius=int(vcfg["search_radius"]),
+    )
+    ep = cfg["enemy_penalty"]
+    r_in, r_out = int(ep["ring_inner"]), int(ep["ring_outer"])
+    roi_xp, roi_hp = cfg["roi"]["xp_bar"], cfg["roi"]["hp_bar"]
+    pos = player_positions(frames, tracker)
+    xp_reader, hp_reader = BarReader(), BarReader()
+    for f in frames:
+        if xp_reader.calibrated and hp_reader.calibrated:
+            break
+        for reader, roi in ((xp_reader, roi_xp), (hp_reader, roi_hp)):
+            if not reader.calibrated:
+                reader.calibrate(FrameContext(f).gray_crop(roi))
+    idx = {id(f): i for i, f in enumerate(frames)}
+
+    def tracked(ctx):
+        tracker.last_xy = pos[idx[id(ctx.frame)]]
+        tracker.locate(ctx)
+
+    def fallback(ctx):
+        tracker.last_xy = None
+        tracker.locate(ctx)
+
+    adaptive = AdaptivePlayerTracker(
+        cfg["templates"]["player"],
+        threshold=float(vcfg["player_match_threshold"]),
+        search_radius=int(vcfg["search_radius"]),
+    )
+
+    def adaptive_tracked(ctx):
+        adaptive.last_xy = pos[idx[id(ctx.frame)]]
+        adaptive.locate(ctx)
+
+    def adaptive_lost(ctx):
+        adaptive.reset()
+        adaptive.locate(ctx)
+
+    def adaptive_widened(ctx):
+        # A confident prediction that is 300 px off: the predicted window misses.
+        adaptive.reset()
+        adaptive.confidence = 1.0
+        cx, cy = pos[idx[id(ctx.frame)]]
+        adaptive.last_xy = (cx + 300, cy + 150)
+        adaptive.locate(ctx)
+
+    def density(ctx):
+        cx, cy = pos[idx[id(ctx.frame)]]
+        enemy_density_ring(ctx, cx, cy, r_in, r_out)
+
+    estimator = EnemyDensityEstimator(r_in, r_out)
+    offsets = np.array([(0, 0), (0, -1), (0, 1), (-1, 0), (1, 0), (-1, -1), (1, -1), (-1, 1), (1, 1)]) * 40
+
+    def density_9(ctx):
+        estimator.score_many(ctx, np.asarray(pos[idx[id(ctx.frame)]]) + offsets)
+
+    stages = {
+        "grayscale": lambda ctx: FrameContext(ctx.frame).gray,
+        "preprocess": lambda ctx: preprocess(ctx, int(cfg["obs_width"]), int(cfg["obs_height"])),
+        "game_over_score": go.score,
+        "player_locate_tracked": tracked,
+        "player_locate_fullframe": fallback,
+        "player_adaptive_tracked": adaptive_tracked,
+        "player_adaptive_widened": adaptive_widened,
+        "player_adaptive_lost": adaptive_lost,
+        "bar_fill_ratio": lambda ctx: (bar_fill_ratio(ctx.gray_crop(roi_xp)), bar_fill_ratio(ctx.gray_crop(roi_hp))),
+        "bar_reader_calibrated": lambda ctx: (xp_reader.read(ctx.gray_crop(roi_xp)), hp_reader.read(ctx.gray_crop(roi_hp))),
+        "enemy_density_ring": density,
+        "enemy_density_9_actions": density_9,
+    }
+    return {name: summarize(time_stage(fn, frames, iters), budget_ms) for name, fn in stages.items()}
+
+
+def run_input(iters, delay_s, budget_ms):
+    """KeyController.hold_action with a RecordingInput that sleeps ``delay_s`` per
+    key event: blocking calls vs the threaded InputDispatcher."""
+    rng = np.random.default_rng(0)
+    actions = rng.integers(0, 9, size=iters)
+    out = {}
+    for name, threaded in (("input_hold_blocking", False), ("input_hold_threaded", True)):
+        ctl = KeyController(backend="recording", threaded=threaded)
+        ctl.input.delay = delay_s
+        samples = []
+        for a in actions:
+            t0 = time.perf_counter()
+            ctl.hold_action(int(a))
+            samples.append(time.perf_counter() - t0)
+            # Leave time for the keys to go out, as the sub-step sleep would.
+            time.sleep(4 * delay_s)
+        out[name] = summarize(samples, budget_ms)
+        if threaded:
+            st = ctl.dispatcher.stats()
+            out[name]["dispatch_p50_ms"] = st["latency_ms_p50"]
+            out[name]["dispatch_p99_ms"] = st["latency_ms_p99"]
+        ctl.close()
+    return out
+
+
+def run_end_to_end(config_path, cfg, iters):
+    from vs_env_fixed import VampireSurvivorsEnv
+
+    # Synthetic frames, capture on the calling thread and no pacing sleep, so
+    # the step time is pure capture + vision + reward work.
+    overrides = {
+        "capture_source": "synthetic",
+        "capture_thread": {"enabled": False},
+        "record": {"enabled": False},
+        "input_backend": "recording",
+        "fps": 1e9,
+        "roi": cfg["roi"],
+    }
+    env = VampireSurvivorsEnv(config_path, overrides=overrides)
+    try:
+        env.reset()
+        samples = []
+        for i in range(iters):
+            t0 = time.perf_counter()
+            _, _, terminated, _, _ = env.step(i % 9)
+            samples.append(time.perf_counter() - t0)
+            if terminated:
+                env.reset()
+    finally:
+        env.close()
+    budget_ms = 1000.0 * int(cfg["action_repeat"]) / float(cfg["fps"])
+    return summarize(samples, budget_ms)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return None
+
+
+def compare(new, old_path):
+    old = json.load(open(old_path, "r", encoding="utf-8"))
+    print(f"\n--- p50 / p99 vs {old_path} (commit {old['meta'].get('commit')}) ---")
+    for name, s in new["stages"].items():
+        o = old["stages"].get(name)
+        if o is None:
+            continue
+        d50 = 100.0 * (s["p50_ms"] / o["p50_ms"] - 1.0) if o["p50_ms"] else 0.0
+        d99 = 100.0 * (s["p99_ms"] / o["p99_ms"] - 1.0) if o["p99_ms"] else 0.0
+        print(f"{name:26s} p50 {o['p50_ms']:8.2f} -> {s['p50_ms']:8.2f} ms ({d50:+6.1f}%)"
+              f"   p99 {o['p99_ms']:8.2f} -> {s['p99_ms']:8.2f} ms ({d99:+6.1f}%)")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--config", default="config_fixed.yaml")
+    ap.add_argument("--iters", type=int, default=200)
+    ap.add_argument("--frames", type=int, default=16, help="distinct synthetic frames to cycle through")
+    ap.add_argument("--input-delay-ms", type=float, default=0.1,
+                    help="simulated cost of one key event for the input benchmark")
+    ap.add_argument("--no-env", action="store_true", help="skip the end-to-end env.step benchmark")
+    ap.add_argument("--out", default="bench_results.json")
+    ap.add_argument("--compare", default=None, help="previous JSON result to diff against")
+    args = ap.parse_args()
+
+    cfg = yaml.safe_load(open(args.config, "r", encoding="utf-8"))
+    # The benchmark frames are 1920x1080: use the 1080p HUD strips from config.yaml
+    # if this config still carries placeholder ROIs.
+    if cfg["roi"]["xp_bar"][:2] == [0, 0]:
+        cfg["roi"] = {"xp_bar": [360, 24, 1200, 18], "hp_bar": [885, 600, 150, 14]}
+
+    src = SyntheticCapture(cfg["templates"], bars=[cfg["roi"]["xp_bar"], cfg["roi"]["hp_bar"]])
+    frames = [src.grab() for _ in range(args.frames)]
+
+    result = {
+        "meta": {
+            "commit": git_commit(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "opencv": cv2.__version__,
+            "numpy": np.__version__,
+            "cv2_threads": cv2.getNumThreads(),
+            "config": args.config,
+            "fps": float(cfg["fps"]),
+            "substep_budget_ms": 1000.0 / float(cfg["fps"]),
+            "iters": args.iters,
+        },
+        "stages": run_stages(cfg, frames, args.iters),
+    }
+    result["stages"].update(run_input(args.iters, args.input_delay_ms / 1000.0, 1000.0 / float(cfg["fps"])))
+    if not args.no_env:
+        result["stages"]["env_step"] = run_end_to_end(args.config, cfg, max(1, args.iters // 4))
+
+    print(f"budget: {result['meta']['substep_budget_ms']:.1f} ms per sub-step (env_step: x action_repeat)")
+    for name, s in result["stages"].items():
+        print(f"{name:26s} p50 {s['p50_ms']:8.2f}  p95 {s['p95_ms']:8.2f}  p99 {s['p99_ms']:8.2f} ms"
+              f"  ({100.0 * s['p99_budget_frac']:5.1f}% of budget @p99)")
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"Saved: {args.out}")
+    if args.compare:
+        compare(result, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import time
+
+import numpy as np
+import torch as th
+from stable_baselines3.common.callbacks import BaseCallback
+
+from curriculum import curriculum_params, blend_params, phase_at
+from metrics import merge_snapshots
+
+
+class GamePauseCallback(BaseCallback):
+    """Pause the game while PPO runs its gradient epochs.
+
+    SB3 calls ``_on_rollout_end`` right before ``train()`` and
+    ``_on_rollout_start`` when collection resumes, so the game is frozen
+    (via each env's ``pause_game``/``resume_game``) exactly for the update.
+    Pause durations are logged as ``game/pause_seconds``.
+    """
+
+    def __init__(self, verbose: int = 0):
+        super().__init__(verbose)
+        self._paused_at = None
+        self.pause_seconds = []
+
+    def _on_rollout_end(self) -> None:
+        self.training_env.env_method("pause_game")
+        self._paused_at = time.monotonic()
+
+    def _on_rollout_start(self) -> None:
+        self._resume()
+
+    def _on_training_end(self) -> None:
+        self._resume()
+
+    def _resume(self):
+        if self._paused_at is None:
+            return
+        self.training_env.env_method("resume_game")
+        took = time.monotonic() - self._paused_at
+        self._paused_at = None
+        self.pause_seconds.append(took)
+        self.logger.record("game/pause_seconds", took)
+        if self.verbose:
+            print(f"[pause] game paused for {took:.1f}s during the PPO update")
+
+    def _on_step(self) -> bool:
+        return True
+
+
+class CurriculumCallback(BaseCallback):
+    """Drive reward weights from a timestep schedule, in place.
+
+    ``phases`` is the same ``[(phase, timesteps), ...]`` list train_fixed.py
+    runs. The active phase is picked from the model's global ``num_timesteps``;
+    during the last ``blend_steps`` of a phase the weights ramp linearly toward
+    the next phase's. Updates go through ``env_method("set_reward_params")``,
+    so they reach every (sub)process env without rewriting config files.
+    """
+
+    def __init__(self, phases, blend_steps: int = 0, update_every: int = 256, verbose: int = 0):
+        super().__init__(verbose)
+        self.phases = [(int(p), int(n)) for p, n in phases]
+        self.blend_steps = int(blend_steps)
+        self.update_every = max(1, int(update_every))
+        self._last = None
+
+    def params_at(self, t: int) -> dict:
+        start = 0
+        for i, (phase, steps) in enumerate(self.phases):
+            end = start + steps
+            if t < end or i == len(self.phases) - 1:
+                p = curriculum_params(phase)
+                if self.blend_steps > 0 and i + 1 < len(self.phases) and t >= end - self.blend_steps:
+                    frac = (t - (end - self.blend_steps)) / self.blend_steps
+                    p = blend_params(p, curriculum_params(self.phases[i + 1][0]), frac)
+                return p
+            start = end
+        return curriculum_params(self.phases[-1][0])
+
+    def _apply(self):
+        p = self.params_at(self.num_timesteps)
+        rounded = {k: round(v, 4) for k, v in p.items()}
+        if rounded == self._last:
+            return
+        self.training_env.env_method("set_reward_params", **rounded)
+        self._last = rounded
+        for k, v in rounded.items():
+            self.logger.record(f"curriculum/{k}", v)
+        if self.verbose:
+            print(f"[curriculum] t={self.num_timesteps}: {rounded}")
+
+    def _on_training_start(self) -> None:
+        self._apply()
+
+    def _on_step(self) -> bool:
+        if self.n_calls % self.update_every == 0:
+            self._apply()
+        return True
+
+
+class PeriodicCheckpointCallback(BaseCallback):
+    """Submit a checkpoint to a ``checkpoint.CheckpointWriter`` every ``every_steps``.
+
+    Only the in-memory snapshot happens on the training thread; the write
+    and rotation run on the writer's thread. The snapshot records the
+    curriculum phase from ``phases`` at the current global timestep.
+    """
+
+    def __init__(self, writer, every_steps: int, phases=None, verbose: int = 0):
+        super().__init__(verbose)
+        self.writer = writer
+        self.every_steps = max(1, int(every_steps))
+        self.phases = phases
+        self._last = None
+
+    def _on_training_start(self) -> None:
+        if self._last is None:
+            self._last = self.num_timesteps
+
+    def _on_step(self) -> bool:
+        if self.num_timesteps - self._last >= self.every_steps:
+            self._last = self.num_timesteps
+            phase = phase_at(self.phases, self.num_timesteps) if self.phases else None
+            t0 = time.monotonic()
+            self.writer.submit(self.model, phase=phase)
+            if self.verbose:
+                print(f"[checkpoint] t={self.num_timesteps} phase={phase} "
+                      f"(snapshot {1000.0 * (time.monotonic() - t0):.0f} ms, written in background)")
+        return True
+
+
+class MetricsCallback(BaseCallback):
+    """Export the envs' per-stage instrumentation to the SB3 logger (TensorBoard).
+
+    Every ``every`` rollouts, drains ``metrics_snapshot()`` from all envs,
+    merges the histograms and records ``perf/<name>/{mean,p50,p95,max}``
+    for each timer (ms), ``perf/<counter>`` totals, the realized
+    ``perf/step_rate_hz`` and ``perf/player_found_rate``. With
+    ``histograms=True`` the raw distributions also go to TensorBoard only.
+    Stages: capture_ms / preprocess_ms / match_<template>_ms / player_ms /
+    reward_ms (signals + player + density + shaping) / step_ms / input_ms;
+    outside_step_ms is the time spent in the learner between env steps
+    (with DummyVecEnv it also includes the other envs' steps).
+    """
+
+    def __init__(self, every: int = 1, histograms: bool = True, verbose: int = 0):
+        super().__init__(verbose)
+        self.every = max(1, int(every))
+        self.histograms = bool(histograms)
+        self._rollouts = 0
+
+    def _on_rollout_end(self) -> None:
+        self._rollouts += 1
+        if self._rollouts % self.every:
+            return
+        snap = merge_snapshots(self.training_env.env_method("metrics_snapshot"))
+        if not snap["hists"] and not snap["counts"]:
+            return
+        for name, h in sorted(snap["hists"].items()):
+            if not h.n:
+                continue
+            self.logger.record(f"perf/{name}/mean", h.mean)
+            self.logger.record(f"perf/{name}/p50", h.quantile(0.50))
+            self.logger.record(f"perf/{name}/p95", h.quantile(0.95))
+            self.logger.record(f"perf/{name}/max", h.max)
+            if self.histograms:
+                samples = th.as_tensor(np.repeat(h.centers(), h.counts))
+                self.logger.record(f"perf_hist/{name}", samples, exclude=("stdout", "log", "json", "csv"))
+        counts = snap["counts"]
+        for name, v in sorted(counts.items()):
+            self.logger.record(f"perf/{name}", v)
+        if snap["seconds"] > 0 and counts.get("steps"):
+            self.logger.record("perf/step_rate_hz", counts["steps"] / snap["seconds"])
+        seen = counts.get("player_found", 0) + counts.get("player_lost", 0)
+        if seen:
+            self.logger.record("perf/player_found_rate", counts.get("player_found", 0) / seen)
+        if self.verbose:
+            st = snap["hists"].get("step_ms")
+            print(f"[perf] step p50={st.quantile(0.5):.1f}ms p95={st.quantile(0.95):.1f}ms" if st else "[perf] no steps")
+
+    def _on_step(self) -> bool:
+        return True
@@ -1,6 +1,11 @@
+from pathlib import Path
+
 import numpy as np
 from mss import mss
 
+from frame_context import as_context
+from metrics import NULL_METRICS
+
 # OpenCV is optional but strongly recommended for fast resize / grayscale.
 try:
     import cv2  # type: ignore
@@ -10,12 +15,24 @@ except Exception as e:  # pragma: no cover
 
 
 class MonitorCapture:
-    """Captures full-monitor frames using MSS.
+    """Captures frames from a monitor using MSS.
+
+    Modes (``capture_mode`` in the config):
+      - "monitor": full-monitor BGR uint8 frames shaped (H, W, 3) (legacy).
+      - "window":  only the ``window`` rectangle (x, y, w, h, relative to the
+        monitor), returned as a BGRA view (h, w, 4) over the MSS buffer with no
+        alpha-strip copy.
+      - "regions": the window plus each rectangle in ``regions`` grabbed on its
+        own (see ``grab_regions``), so HUD strips outside the window still work.
 
-    Returns BGR uint8 frames shaped (H, W, 3).
+    ``origin`` is the monitor-relative (x, y) of the returned frame; ROIs in the
+    config stay in monitor coordinates and are offset by FrameContext.
     """
 
-    def __init__(self, monitor_index: int = 1):
+    MODES = ("monitor", "window", "regions")
+    metrics = NULL_METRICS
+
+    def __init__(self, monitor_index: int = 1, mode: str = "monitor", window=None, regions=None):
         self.sct = mss()
         # Clamp monitor index to a valid range so we don't crash on startup.
         max_idx = len(self.sct.monitors) - 1  # monitors[0] is 'all'
@@ -23,19 +40,210 @@ class MonitorCapture:
             monitor_index = 1
         self.monitor_index = monitor_index
 
-    def grab(self) -> np.ndarray:
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown capture_mode: {mode!r} (expected one of {self.MODES})")
+        self.mode = mode
+        mon = self.sct.monitors[self.monitor_index]
+        if mode == "monitor" or window is None:
+            window = (0, 0, mon["width"], mon["height"])
+        self.window = tuple(int(v) for v in window)
+        self.origin = (0, 0) if mode == "monitor" else self.window[:2]
+        self._window_box = self._box(self.window)
+        self.regions = [tuple(int(v) for v in r) for r in (regions or [])] if mode == "regions" else []
+        self._region_boxes = [self._box(r) for r in self.regions]
+
+    def _box(self, rect):
         mon = self.sct.monitors[self.monitor_index]
-        img = np.array(self.sct.grab(mon))  # BGRA
-        return img[:, :, :3]                # BGR
+        x, y, w, h = rect
+        return {"left": mon["left"] + x, "top": mon["top"] + y, "width": w, "height": h}
+
+    def _grab_view(self, box) -> np.ndarray:
+        shot = self.sct.grab(box)
+        # View over MSS's buffer: no np.array copy and no alpha-strip copy.
+        return np.frombuffer(shot.raw, dtype=np.uint8).reshape(shot.height, shot.width, 4)
+
+    def grab(self) -> np.ndarray:
+        with self.metrics.timer("capture_grab_ms"):
+            if self.mode == "monitor":
+                mon = self.sct.monitors[self.monitor_index]
+                img = np.array(self.sct.grab(mon))  # BGRA
+                return img[:, :, :3]                # BGR
+            return self._grab_view(self._window_box)
+
+    def grab_regions(self) -> dict:
+        """BGRA views keyed by their (x, y, w, h) rect; empty unless mode == "regions"."""
+        return {r: self._grab_view(b) for r, b in zip(self.regions, self._region_boxes)}
+
 
+def preprocess(frame_bgr, out_w: int, out_h: int, dst=None) -> np.ndarray:
+    """Convert BGR frame (or FrameContext) to grayscale and resize to (out_h, out_w).
 
-def preprocess(frame_bgr: np.ndarray, out_w: int, out_h: int) -> np.ndarray:
-    """Convert BGR frame to grayscale and resize to (out_h, out_w)."""
+    If ``dst`` is a preallocated (out_h, out_w) uint8 array the result is
+    written straight into it.
+    """
     if cv2 is None:
         raise RuntimeError(
             "OpenCV (opencv-python) is required for preprocessing but failed to import. " 
             f"Import error: {_cv2_err}"
         )
-    gray = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY)
+    gray = as_context(frame_bgr).gray
+    if dst is not None:
+        return cv2.resize(gray, (out_w, out_h), dst=dst, interpolation=cv2.INTER_AREA)
     resized = cv2.resize(gray, (out_w, out_h), interpolation=cv2.INTER_AREA)
     return resized.astype(np.uint8)
+
+
+class FrameStacker:
+    """Circular, array-backed stack of the last ``n`` preprocessed frames.
+
+    ``push`` resizes each frame directly into preallocated memory; the ordered
+    stack is only assembled by ``observation()``. Every frame is written to
+    slot i and its mirror i + n, so the ordered stack is always one contiguous
+    slice. The first push after ``clear()`` fills the whole stack with that
+    frame (same as the old deque behaviour on reset).
+
+    With ``channels_first`` observations are (n, h, w), the layout
+    VecTransposeImage would otherwise produce; otherwise (h, w, n).
+    """
+
+    def __init__(self, n: int, out_w: int, out_h: int, channels_first: bool = False):
+        self.n, self.out_w, self.out_h = int(n), int(out_w), int(out_h)
+        self.channels_first = bool(channels_first)
+        self._buf = np.zeros((2 * self.n, self.out_h, self.out_w), dtype=np.uint8)
+        self._last = -1  # ring index of the newest frame, -1 when empty
+
+    @property
+    def shape(self):
+        if self.channels_first:
+            return (self.n, self.out_h, self.out_w)
+        return (self.out_h, self.out_w, self.n)
+
+    def __len__(self):
+        return 0 if self._last < 0 else self.n
+
+    def clear(self):
+        self._last = -1
+
+    def push(self, frame):
+        i = (self._last + 1) % self.n
+        preprocess(frame, self.out_w, self.out_h, dst=self._buf[i])
+        self._commit(i)
+
+    def push_processed(self, img):
+        """Push a frame that is already preprocessed to (out_h, out_w) uint8."""
+        i = (self._last + 1) % self.n
+        self._buf[i] = img
+        self._commit(i)
+
+    def _commit(self, i):
+        if self._last < 0:
+            self._buf[:] = self._buf[i]
+        else:
+            self._buf[i + self.n] = self._buf[i]
+        self._last = i
+
+    def observation(self) -> np.ndarray:
+        """Oldest-to-newest stack as a fresh array (safe to hand to SB3)."""
+        stack = self._buf[self._last + 1:self._last + 1 + self.n]
+        if self.channels_first:
+            return stack.copy()
+        return np.ascontiguousarray(stack.transpose(1, 2, 0))
+
+
+class SyntheticCapture:
+    """Game-free frame source for testing and benchmarking on any OS.
+
+    Renders (H, W, 3) BGR frames from the PNGs in ``templates``: a noisy
+    background, the HUD template, the player sprite moving on a circle,
+    drifting dark "enemy" blobs and partially filled XP/HP bars at ``bars``
+    ROIs. If ``game_over_after`` is set, the game-over template appears from
+    that frame on.
+    """
+
+    def __init__(self, templates: dict, width: int = 1920, height: int = 1080,
+                 bars=(), n_enemies: int = 40, game_over_after=None, seed: int = 0):
+        if cv2 is None:
+            raise RuntimeError(f"OpenCV is required for SyntheticCapture. Import error: {_cv2_err}")
+        self.width, self.height = int(width), int(height)
+        self.origin = (0, 0)
+        self.rng = np.random.default_rng(seed)
+        self.bars = [tuple(int(v) for v in r) for r in bars]
+        self.game_over_after = game_over_after
+        self.tpl = {}
+        for name in ("hud", "player", "game_over"):
+            path = templates.get(name)
+            img = cv2.imread(str(path), cv2.IMREAD_COLOR) if path else None
+            if img is not None:
+                self.tpl[name] = img
+        self.background = self.rng.integers(40, 90, size=(self.height, self.width, 3), dtype=np.uint8)
+        self.enemies = self.rng.uniform((0, 0), (self.width, self.height), size=(n_enemies, 2))
+        self.enemy_vel = self.rng.normal(0.0, 4.0, size=(n_enemies, 2))
+        self.t = 0
+
+    def _paste(self, frame, img, x, y):
+        h, w = img.shape[:2]
+        x = int(np.clip(x, 0, self.width - w))
+        y = int(np.clip(y, 0, self.height - h))
+        frame[y:y+h, x:x+w] = img
+
+    def grab(self) -> np.ndarray:
+        frame = self.background.copy()
+        self.enemies = (self.enemies + self.enemy_vel) % (self.width, self.height)
+        for ex, ey in self.enemies.astype(int):
+            cv2.circle(frame, (int(ex), int(ey)), 14, (15, 15, 20), -1)
+
+        for i, (x, y, w, h) in enumerate(self.bars):
+            fill = 0.5 + 0.4 * np.sin(0.05 * self.t + i)
+            frame[y:y+h, x:x+w] = (30, 30, 30)
+            frame[y:y+h, x:x + int(w * fill)] = (220, 180, 40) if i == 0 else (40, 40, 220)
+
+        if "hud" in self.tpl:
+            self._paste(frame, self.tpl["hud"], 40, 60)
+        if "player" in self.tpl:
+            ph, pw = self.tpl["player"].shape[:2]
+            cx = self.width / 2 + 200 * np.cos(0.03 * self.t)
+            cy = self.height / 2 + 150 * np.sin(0.03 * self.t)
+            self._paste(frame, self.tpl["player"], cx - pw / 2, cy - ph / 2)
+        if "game_over" in self.tpl and self.game_over_after is not None and self.t >= self.game_over_after:
+            gh, gw = self.tpl["game_over"].shape[:2]
+            self._paste(frame, self.tpl["game_over"], (self.width - gw) / 2, (self.height - gh) / 3)
+
+        self.t += 1
+        return frame
+
+    def grab_regions(self) -> dict:
+        return {}
+
+
+class FileCapture:
+    """Frame source that replays still images (a single file or a directory, sorted)."""
+
+    EXTS = (".png", ".jpg", ".jpeg", ".bmp")
+
+    def __init__(self, path: str, loop: bool = True):
+        if cv2 is None:
+            raise RuntimeError(f"OpenCV is required for FileCapture. Import error: {_cv2_err}")
+        p = Path(path)
+        if p.is_dir():
+            self.paths = sorted(q for q in p.iterdir() if q.suffix.lower() in self.EXTS)
+        else:
+            self.paths = [p]
+        if not self.paths or not self.paths[0].exists():
+            raise FileNotFoundError(f"No capture images found at: {path}")
+        self.loop = bool(loop)
+        self.origin = (0, 0)
+        self.i = 0
+
+    def grab(self) -> np.ndarray:
+        if self.i >= len(self.paths):
+            if not self.loop:
+                raise EOFError("FileCapture exhausted")
+            self.i = 0
+        frame = cv2.imread(str(self.paths[self.i]), cv2.IMREAD_COLOR)
+        if frame is None:
+            raise RuntimeError(f"Failed to load capture image: {self.paths[self.i]}")
+        self.i += 1
+        return frame
+
+    def grab_regions(self) -> dict:
+        return {}
@@ -0,0 +1,115 @@
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+# frame is the consumer's own copy of the ring slot, so it stays valid however
+# long it is kept (reset() holds frames across its HUD-check sleeps).
+CapturedFrame = namedtuple("CapturedFrame", "frame timestamp seq missed")
+
+
+class CaptureWorker:
+    """Grabs frames continuously on a background thread into a ring buffer.
+
+    ``make_source`` is called inside the worker thread (MSS handles are not
+    safe to share across threads) and must return an object with ``grab()``
+    and ``origin`` -- MonitorCapture, SyntheticCapture, FileCapture, ...
+    Each slot of the preallocated ring is tagged with a monotonic timestamp
+    and a sequence number; ``latest()`` never blocks on capture.
+    """
+
+    def __init__(self, make_source, fps: float, buffer_size: int = 4):
+        if buffer_size < 2:
+            raise ValueError("buffer_size must be >= 2")
+        self.make_source = make_source
+        self.period = 1.0 / float(fps)
+        self.buffer_size = int(buffer_size)
+        self.origin = (0, 0)
+
+        self._buf = None
+        self._stamps = np.zeros(self.buffer_size, dtype=np.float64)
+        self._seqs = np.full(self.buffer_size, -1, dtype=np.int64)
+        self._seq = -1           # last written sequence number
+        self._read_seq = -1      # last sequence number handed to a consumer
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._error = None
+
+    def start(self, timeout: float = 10.0):
+        if self._thread is not None:
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="capture-worker", daemon=True)
+        self._thread.start()
+        if not self._ready.wait(timeout):
+            raise TimeoutError("Capture worker produced no frame in time")
+        if self._error is not None:
+            raise RuntimeError("Capture worker failed to start") from self._error
+        return self
+
+    @property
+    def shape(self):
+        """Frame shape, known once ``start()`` has returned."""
+        return None if self._buf is None else self._buf.shape[1:]
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+        self._thread = None
+
+    def _write(self, frame):
+        if self._buf is None:
+            self._buf = np.empty((self.buffer_size,) + frame.shape, dtype=frame.dtype)
+        seq = self._seq + 1
+        slot = seq % self.buffer_size
+        np.copyto(self._buf[slot], frame)
+        with self._lock:
+            self._stamps[slot] = time.monotonic()
+            self._seqs[slot] = seq
+            self._seq = seq
+
+    def _run(self):
+        try:
+            source = self.make_source()
+            self.origin = tuple(getattr(source, "origin", (0, 0)))
+            self._write(source.grab())
+        except Exception as e:
+            self._error = e
+            self._ready.set()
+            return
+        self._ready.set()
+
+        # Absolute deadlines so grab time does not stretch the capture period.
+        next_t = time.monotonic() + self.period
+        while not self._stop.is_set():
+            delay = next_t - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            next_t += self.period
+            if next_t < time.monotonic():
+                next_t = time.monotonic() + self.period
+            try:
+                self._write(source.grab())
+            except Exception as e:
+                self._error = e
+                break
+
+    def latest(self) -> CapturedFrame:
+        """Freshest frame; ``missed`` counts frames produced but never returned."""
+        if self._error is not None:
+            raise RuntimeError("Capture worker stopped") from self._error
+        if self._buf is None:
+            raise RuntimeError("Capture worker not started")
+        with self._lock:
+            seq = self._seq
+            slot = seq % self.buffer_size
+            stamp = float(self._stamps[slot])
+        # The slot is only rewritten buffer_size - 1 grabs from now; copy it before that.
+        frame = self._buf[slot].copy()
+        missed = max(0, seq - self._read_seq - 1) if self._read_seq >= 0 else 0
+        self._read_seq = seq
+        return CapturedFrame(frame, stamp, seq, missed)
@@ -0,0 +1,174 @@
+import copy
+import os
+import queue
+import random
+import re
+import threading
+from collections import deque
+from pathlib import Path
+
+import numpy as np
+import torch as th
+from stable_baselines3.common.save_util import save_to_zip_file
+from stable_baselines3.common.utils import get_device
+
+_NAME = re.compile(r"ckpt_(\d+)\.zip$")
+
+
+def _detached(obj):
+    """CPU copies of every tensor in a (nested) state dict, so training can keep mutating the originals."""
+    if isinstance(obj, th.Tensor):
+        return obj.detach().to("cpu", copy=True)
+    if isinstance(obj, dict):
+        return {k: _detached(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(_detached(v) for v in obj)
+    return copy.deepcopy(obj)
+
+
+def snapshot_model(model):
+    """Everything ``model.save`` writes, captured in memory (same layout, so PPO.load reads it).
+
+    Mirrors BaseAlgorithm.save minus the zip write; this is the only part that
+    runs on the training thread.
+    """
+    data = model.__dict__.copy()
+    exclude = set(model._excluded_save_params())
+    state_dicts_names, torch_variable_names = model._get_torch_save_params()
+    for name in state_dicts_names + torch_variable_names:
+        exclude.add(name.split(".")[0])
+    for name in exclude:
+        data.pop(name, None)
+    # Containers the training loop mutates in place (episode info deques, ...).
+    for k, v in data.items():
+        if isinstance(v, (deque, list, dict, np.ndarray)):
+            data[k] = copy.copy(v)
+    pytorch_variables = {}
+    for name in torch_variable_names:
+        obj = model
+        for attr in name.split("."):
+            obj = getattr(obj, attr)
+        pytorch_variables[name] = _detached(obj)
+    return data, _detached(model.get_parameters()), pytorch_variables
+
+
+def rng_state() -> dict:
+    state = {"python": random.getstate(), "numpy": np.random.get_state(), "torch": th.get_rng_state()}
+    if th.cuda.is_available():
+        state["cuda"] = th.cuda.get_rng_state_all()
+    return state
+
+
+def set_rng_state(state: dict):
+    random.setstate(state["python"])
+    np.random.set_state(state["numpy"])
+    th.set_rng_state(state["torch"])
+    if "cuda" in state and th.cuda.is_available():
+        th.cuda.set_rng_state_all(state["cuda"])
+
+
+class CheckpointWriter:
+    """Writes model snapshots from a background thread.
+
+    ``submit`` snapshots policy/optimizer state on the calling thread (a few
+    ms of tensor copies) and returns; a worker thread writes the SB3 zip plus
+    a ``.state.pt`` sidecar (phase, timesteps, RNG state) and keeps the newest
+    ``keep`` rotating checkpoints. Writes go to a temp file and are renamed,
+    so a crash mid-write never leaves a truncated "latest" checkpoint. If
+    the disk falls behind, a pending rotating snapshot is replaced by the
+    newer one rather than queueing up.
+    """
+
+    def __init__(self, directory: str = "checkpoints", keep: int = 3):
+        self.dir = Path(directory)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.keep = max(1, int(keep))
+        self.written = 0
+        self.error = None
+        self._q = queue.Queue()
+        self._pending = None  # newest rotating snapshot not yet picked up by the thread
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="checkpoint-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, model, phase=None, path=None, rotate=None):
+        """Queue a checkpoint of ``model``; ``path`` writes a fixed file instead of a rotating one.
+
+        ``rotate=True`` with a ``path`` writes both from the same snapshot.
+        """
+        if rotate is None:
+            rotate = path is None
+        job = {
+            "snapshot": snapshot_model(model),
+            "state": {"num_timesteps": int(model.num_timesteps), "phase": phase, "rng": rng_state()},
+            "path": None,
+        }
+        if path is not None:
+            self._q.put(dict(job, path=path))
+        if not rotate:
+            return
+        with self._lock:
+            replaced = self._pending is not None
+            self._pending = job
+        if not replaced:
+            self._q.put("rotating")
+
+    def _write(self, job):
+        if job == "rotating":
+            with self._lock:
+                job, self._pending = self._pending, None
+            path = self.dir / f"ckpt_{job['state']['num_timesteps']:010d}.zip"
+        else:
+            path = Path(job["path"])
+            path.parent.mkdir(parents=True, exist_ok=True)
+        data, params, variables = job["snapshot"]
+        tmp = path.with_name(path.name + ".tmp")
+        save_to_zip_file(tmp, data=data, params=params, pytorch_variables=variables)
+        th.save(job["state"], str(tmp) + ".state")
+        # Sidecar first, then the zip: a zip on disk always has its state next to it.
+        os.replace(str(tmp) + ".state", _state_path(path))
+        os.replace(tmp, path)
+        self.written += 1
+        if job["path"] is None:
+            self._rotate()
+
+    def _rotate(self):
+        ckpts = sorted(p for p in self.dir.glob("ckpt_*.zip") if _NAME.search(p.name))
+        for p in ckpts[:-self.keep]:
+            p.unlink(missing_ok=True)
+            _state_path(p).unlink(missing_ok=True)
+
+    def _run(self):
+        while True:
+            job = self._q.get()
+            try:
+                if job is None:
+                    return
+                self._write(job)
+            except Exception as e:
+                self.error = e
+                print(f"[checkpoint] write failed: {e}")
+            finally:
+                self._q.task_done()
+
+    def flush(self):
+        self._q.join()
+
+    def close(self):
+        self.flush()
+        self._q.put(None)
+        self._thread.join(timeout=10.0)
+
+
+def _state_path(zip_path) -> Path:
+    return Path(str(zip_path)[:-len(".zip")] + ".state.pt")
+
+
+def latest_checkpoint(directory: str = "checkpoints"):
+    """(zip path, state dict) of the newest complete rotating checkpoint, or (None, None)."""
+    ckpts = sorted(p for p in Path(directory).glob("ckpt_*.zip") if _NAME.search(p.name))
+    for p in reversed(ckpts):
+        sp = _state_path(p)
+        if sp.exists():
+            return p, th.load(sp, weights_only=False, map_location=get_device("cpu"))
+    return None, None
@@ -1,29 +1,265 @@
+import threading
 import time
-import pydirectinput
+from collections import deque
+
+from metrics import Histogram, NULL_METRICS
+
+# pydirectinput only works on Windows; elsewhere (benchmarks, replay, tests)
+# fall back to a stub that drops key events so the env can still be built.
+try:
+    import pydirectinput
+except Exception as e:  # pragma: no cover
+    class _NoInput:
+        FAILSAFE = False
+        PAUSE = 0.0
+
+        def keyDown(self, key):
+            pass
+
+        def keyUp(self, key):
+            pass
+
+    print(f"[controls] pydirectinput unavailable ({e}); key events will be dropped.")
+    pydirectinput = _NoInput()
 
 pydirectinput.FAILSAFE = False
 pydirectinput.PAUSE = 0.0
 
+class WindowInput:
+    """Sends key events to one window by title via PostMessage (pywin32).
+
+    Unlike pydirectinput this does not need the window to have focus, so
+    several game instances can be driven at once.
+    """
+
+    _VK = {"up": 0x26, "down": 0x28, "left": 0x25, "right": 0x27,
+           "esc": 0x1B, "escape": 0x1B, "space": 0x20, "enter": 0x0D}
+
+    def __init__(self, title: str):
+        import win32api, win32con, win32gui  # Windows only (pywin32)
+        self._api, self._con = win32api, win32con
+        self.hwnd = win32gui.FindWindow(None, title)
+        if not self.hwnd:
+            raise RuntimeError(f"No window titled {title!r} found for input")
+
+    def _vk(self, key):
+        return self._VK.get(key.lower(), ord(key.upper()[0]))
+
+    def keyDown(self, key):
+        vk = self._vk(key)
+        lparam = 1 | (self._api.MapVirtualKey(vk, 0) << 16)
+        self._api.PostMessage(self.hwnd, self._con.WM_KEYDOWN, vk, lparam)
+
+    def keyUp(self, key):
+        vk = self._vk(key)
+        lparam = 1 | (self._api.MapVirtualKey(vk, 0) << 16) | (0xC0 << 24)
+        self._api.PostMessage(self.hwnd, self._con.WM_KEYUP, vk, lparam)
+
+class RecordingInput:
+    """Backend that records key events instead of sending them.
+
+    For tests and benchmarks on machines without a game (or Windows).
+    ``delay`` sleeps per event to stand in for the cost of a real
+    SendInput/PostMessage call.
+    """
+
+    def __init__(self, delay: float = 0.0, max_events: int = 100_000):
+        self.delay = float(delay)
+        self.events = deque(maxlen=int(max_events))  # (perf_counter, "down"/"up", key)
+        self.held = set()
+
+    def keyDown(self, key):
+        if self.delay:
+            time.sleep(self.delay)
+        self.events.append((time.perf_counter(), "down", key))
+        self.held.add(key)
+
+    def keyUp(self, key):
+        if self.delay:
+            time.sleep(self.delay)
+        self.events.append((time.perf_counter(), "up", key))
+        self.held.discard(key)
+
+def make_input(backend="auto", window=None):
+    """Key-event backend: "auto" (window title if given, else pydirectinput),
+    "pydirectinput", "window" or "recording"."""
+    if backend == "auto":
+        backend = "window" if window else "pydirectinput"
+    if backend == "pydirectinput":
+        return pydirectinput
+    if backend == "window":
+        if not window:
+            raise ValueError("input_backend: window needs input_window")
+        return WindowInput(window)
+    if backend == "recording":
+        return RecordingInput()
+    raise ValueError(f"Unknown input_backend: {backend!r}")
+
+class InputDispatcher:
+    """Sends held-key changes from a dedicated thread.
+
+    ``transitions[a][b]`` is the precomputed (keys to release, keys to press)
+    to go from action ``a`` to action ``b``, so ``submit`` is just a lookup
+    and a notify; ``submit_keys`` takes any key set (diffed against the held
+    keys when it is not one of the actions). Requests that arrive while the
+    thread is busy are batched:
+    only the newest target is sent, as one transition from the state that
+    is actually held. Dispatch-to-send latency goes into ``latency`` (ms).
+    """
+
+    metrics = NULL_METRICS
+
+    def __init__(self, backend, action_keys):
+        self.input = backend
+        self.action_keys = [tuple(k) for k in action_keys]
+        sets = [set(k) for k in self.action_keys]
+        self.transitions = [
+            [(tuple(k for k in self.action_keys[a] if k not in sets[b]),
+              tuple(k for k in self.action_keys[b] if k not in sets[a]))
+             for b in range(len(sets))]
+            for a in range(len(sets))
+        ]
+        self._index = {frozenset(k): i for i, k in enumerate(self.action_keys)}
+        self.current = 0  # action whose keys are held right now (None: a raw key set)
+        self.held = frozenset()
+        self.latency = Histogram()
+        self.submitted = 0
+        self.sent = 0
+        self._target = None
+        self._t_submit = 0.0
+        self._busy = False
+        self._stop = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="input-dispatch", daemon=True)
+        self._thread.start()
+
+    def submit(self, action: int):
+        self._request(int(action))
+
+    def submit_keys(self, keys):
+        """Hold exactly ``keys``, which need not be one of the action key sets."""
+        keys = frozenset(keys)
+        self._request(self._index.get(keys, keys))
+
+    def _request(self, target):
+        with self._cond:
+            self._target = target
+            self._t_submit = time.perf_counter()
+            self.submitted += 1
+            self._cond.notify_all()
+
+    def flush(self, timeout: float = 1.0) -> bool:
+        """Block until every submitted transition has been sent."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._target is None and not self._busy, timeout)
+
+    def stop(self):
+        self.flush()
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+        self._thread.join(timeout=1.0)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._target is not None or self._stop)
+                if self._target is None:
+                    return
+                target, t_submit = self._target, self._t_submit
+                self._target = None
+                self._busy = True
+            if isinstance(target, int) and self.current is not None:
+                ups, downs = self.transitions[self.current][target]
+                keys = frozenset(self.action_keys[target])
+            else:
+                keys = frozenset(self.action_keys[target]) if isinstance(target, int) else target
+                ups = tuple(k for k in self.held if k not in keys)
+                downs = tuple(k for k in keys if k not in self.held)
+            try:
+                for k in ups:
+                    self.input.keyUp(k)
+                for k in downs:
+                    self.input.keyDown(k)
+                self.held = keys
+                self.current = target if isinstance(target, int) else None
+            except Exception as e:
+                print(f"[controls] input dispatch failed: {e}")
+            ms = 1000.0 * (time.perf_counter() - t_submit)
+            self.latency.add(ms)
+            self.metrics.observe("input_dispatch_ms", ms)
+            self.metrics.count("input_key_events", len(ups) + len(downs))
+            self.sent += 1
+            with self._cond:
+                self._busy = False
+                self._cond.notify_all()
+
+    def stats(self) -> dict:
+        return {
+            "submitted": self.submitted,
+            "sent": self.sent,
+            "coalesced": self.submitted - self.sent,
+            "latency_ms_p50": self.latency.quantile(0.5),
+            "latency_ms_p99": self.latency.quantile(0.99),
+            "latency_ms_max": self.latency.max,
+        }
+
 class KeyController:
-    def __init__(self, up="w", down="s", left="a", right="d"):
+    metrics = NULL_METRICS
+
+    def __init__(self, up="w", down="s", left="a", right="d", window=None,
+                 backend="auto", threaded=False):
         self.up, self.down, self.left, self.right = up, down, left, right
         self._held = set()
+        # window: send to this window title instead of the focused one.
+        self.input = make_input(backend, window)
+        # Keys held for each Discrete(9) action (same order as vs_env_fixed.ACTION_DIRS).
+        self.actions = [(), (up,), (down,), (left,), (right,),
+                        (up, left), (up, right), (down, left), (down, right)]
+        # threaded: key changes go out from an InputDispatcher thread and
+        # hold_action() returns immediately.
+        self.dispatcher = InputDispatcher(self.input, self.actions) if threaded else None
 
     def release_all(self):
+        if self.dispatcher is not None:
+            self.dispatcher.submit(0)
+            self.dispatcher.flush()
+            return
         for k in list(self._held):
-            pydirectinput.keyUp(k)
+            self.input.keyUp(k)
         self._held.clear()
 
     def hold(self, keys):
+        if self.dispatcher is not None:
+            with self.metrics.timer("input_ms"):
+                self.dispatcher.submit_keys(keys)
+            return
         keys = set(keys)
-        for k in list(self._held - keys):
-            pydirectinput.keyUp(k)
-            self._held.remove(k)
-        for k in list(keys - self._held):
-            pydirectinput.keyDown(k)
-            self._held.add(k)
+        with self.metrics.timer("input_ms"):
+            for k in list(self._held - keys):
+                self.input.keyUp(k)
+                self._held.remove(k)
+                self.metrics.count("input_key_events")
+            for k in list(keys - self._held):
+                self.input.keyDown(k)
+                self._held.add(k)
+                self.metrics.count("input_key_events")
+
+    def hold_action(self, action: int):
+        if self.dispatcher is None:
+            self.hold(self.actions[action])
+            return
+        with self.metrics.timer("input_ms"):
+            self.dispatcher.submit(action)
 
     def tap(self, key, duration=0.02):
-        pydirectinput.keyDown(key)
+        if self.dispatcher is not None:
+            self.dispatcher.flush()
+        self.input.keyDown(key)
         time.sleep(duration)
-        pydirectinput.keyUp(key)
+        self.input.keyUp(key)
+
+    def close(self):
+        self.release_all()
+        if self.dispatcher is not None:
+            self.dispatcher.stop()
@@ -1,13 +1,29 @@
-def set_curriculum(cfg: dict, phase: int):
-    if phase == 1:
-        cfg["enemy_penalty"]["density_weight"] = 0.40
-        cfg["idle_penalty"]["weight"] = 0.06
-        cfg["_xp_scale"] = 1.2
-    elif phase == 2:
-        cfg["enemy_penalty"]["density_weight"] = 0.25
-        cfg["idle_penalty"]["weight"] = 0.03
-        cfg["_xp_scale"] = 2.0
-    else:
-        cfg["enemy_penalty"]["density_weight"] = 0.18
-        cfg["idle_penalty"]["weight"] = 0.02
-        cfg["_xp_scale"] = 2.6
+PHASE_PARAMS = {
+    1: {"density_weight": 0.40, "idle_weight": 0.06, "xp_scale": 1.2},
+    2: {"density_weight": 0.25, "idle_weight": 0.03, "xp_scale": 2.0},
+    3: {"density_weight": 0.18, "idle_weight": 0.02, "xp_scale": 2.6},
+}
+
+def curriculum_params(phase: int) -> dict:
+    """Reward weights for a phase (any phase other than 1/2 uses phase 3's)."""
+    return dict(PHASE_PARAMS.get(int(phase), PHASE_PARAMS[3]))
+
+def blend_params(a: dict, b: dict, frac: float) -> dict:
+    """Linear blend of two param dicts, frac=0 -> a, frac=1 -> b."""
+    frac = min(max(float(frac), 0.0), 1.0)
+    return {k: (1.0 - frac) * a[k] + frac * b[k] for k in a}
+
+def remaining_phases(phases, t: int):
+    """[(phase, timesteps still to run), ...] of a [(phase, timesteps), ...] schedule at global step t."""
+    out = []
+    end = 0
+    for phase, steps in phases:
+        end += int(steps)
+        if end > t:
+            out.append((phase, end - max(int(t), end - int(steps))))
+    return out
+
+def phase_at(phases, t: int):
+    """Phase running at global step t (the last one once the schedule is done)."""
+    left = remaining_phases(phases, t)
+    return left[0][0] if left else phases[-1][0]
@@ -1,15 +1,26 @@
 import cv2, yaml
-from capture import MonitorCapture
+from capture_fixed import MonitorCapture
+from reward import BarReader, crop
 
 cfg = yaml.safe_load(open("config.yaml", "r", encoding="utf-8"))
 cap = MonitorCapture(int(cfg.get("monitor_index", 1)))
+print("ESC quits; C prints bar_reader levels for the current frame (bars must be partly filled).")
 
 while True:
     frame = cap.grab()
+    key = cv2.waitKey(1)
+    if key in (ord("c"), ord("C")):
+        for name in ("xp", "hp"):
+            reader = BarReader(min_contrast=float((cfg.get("bar_reader", {}) or {}).get("min_contrast", 20.0)))
+            if reader.calibrate(crop(frame, cfg["roi"][f"{name}_bar"])):
+                fill, bg = reader.levels
+                print(f"  {name}: [{fill:.1f}, {bg:.1f}]")
+            else:
+                print(f"  {name}: not enough contrast (bar empty or full?)")
     x,y,w,h = cfg["roi"]["xp_bar"]
     cv2.rectangle(frame, (x,y), (x+w,y+h), (0,255,255), 2)
     x,y,w,h = cfg["roi"]["hp_bar"]
     cv2.rectangle(frame, (x,y), (x+w,y+h), (0,0,255), 2)
     cv2.imshow("ROI Debug (ESC to quit)", frame)
-    if cv2.waitKey(1) == 27:
+    if key == 27:
         break
@@ -0,0 +1,202 @@
+"""Frame-deduplicating storage for SB3 rollout / replay buffers.
+
+A stacked observation shares all but its newest frame(s) with the previous
+step of the same env, so storing full (stack, 84, 84) observations keeps
+each pixel ~stack times. Here every distinct 84x84 frame is written once
+into a preallocated uint8 ``FrameRing``; buffers store only the frame ids
+of each stack and rebuild observations at sample time.
+
+``StackIndexer`` works on the observations alone (no env cooperation): a
+new stack is matched against the env's previous one at every shift, which
+covers plain steps (shift = frames pushed per step, i.e. action_repeat),
+identical stacks (next_obs -> obs in replay buffers) and reset()'s stack of
+one repeated first frame (stored once).
+
+    PPO("CnnPolicy", env, rollout_buffer_class=DedupRolloutBuffer,
+        rollout_buffer_kwargs={"frames_per_step": 2.0})
+    DQN("CnnPolicy", env, buffer_size=2_000_000, replay_buffer_class=DedupReplayBuffer)
+"""
+import numpy as np
+from gymnasium import spaces
+from stable_baselines3.common.buffers import ReplayBuffer, RolloutBuffer
+from stable_baselines3.common.preprocessing import is_image_space_channels_first
+from stable_baselines3.common.type_aliases import ReplayBufferSamples
+
+
+class FrameRing:
+    """Distinct frames in a preallocated uint8 ring, addressed by ever-increasing ids.
+
+    Frame ``i`` lives in slot ``i % capacity`` until ``capacity`` newer frames
+    overwrite it; ``valid`` tells whether a set of ids is still intact.
+    """
+
+    def __init__(self, capacity: int, frame_shape):
+        self.capacity = int(capacity)
+        self.frames = np.zeros((self.capacity,) + tuple(frame_shape), dtype=np.uint8)
+        self.next_id = 0
+
+    @property
+    def oldest(self) -> int:
+        return max(0, self.next_id - self.capacity)
+
+    def push(self, frame) -> int:
+        i = self.next_id
+        self.frames[i % self.capacity] = frame
+        self.next_id += 1
+        return i
+
+    def holds(self, i: int, frame) -> bool:
+        return i >= self.oldest and np.array_equal(self.frames[i % self.capacity], frame)
+
+    def valid(self, ids) -> np.ndarray:
+        return np.asarray(ids).min(axis=-1) >= self.oldest
+
+    def gather(self, ids) -> np.ndarray:
+        return self.frames[np.asarray(ids, dtype=np.int64) % self.capacity]
+
+
+class StackIndexer:
+    """Turns (n_envs, stack, h, w) observations into (n_envs, stack) frame ids."""
+
+    def __init__(self, ring: FrameRing, n_envs: int, n_stack: int):
+        self.ring = ring
+        self.n_stack = int(n_stack)
+        self._last = [None] * int(n_envs)
+        self._shift = [1] * int(n_envs)
+
+    def _push_new(self, ids, frames):
+        for f in frames:
+            # Runs of identical frames (reset fills the stack with one frame) share an id.
+            if ids and self.ring.holds(ids[-1], f):
+                ids.append(ids[-1])
+            else:
+                ids.append(self.ring.push(f))
+        return ids
+
+    def _match(self, prev, stack, s):
+        n = self.n_stack
+        return all(self.ring.holds(prev[s + j], stack[j]) for j in range(n - s))
+
+    def index_one(self, e: int, stack) -> list:
+        prev = self._last[e]
+        ids = None
+        if prev is not None:
+            # Try the shift seen last time first (action_repeat frames per step).
+            order = [self._shift[e]] + [s for s in range(self.n_stack) if s != self._shift[e]]
+            for s in order:
+                if self._match(prev, stack, s):
+                    ids = self._push_new(list(prev[s:]), stack[self.n_stack - s:])
+                    self._shift[e] = s
+                    break
+        if ids is None:
+            ids = self._push_new([], stack)
+        self._last[e] = ids
+        return ids
+
+    def index(self, stacks) -> np.ndarray:
+        return np.array([self.index_one(e, s) for e, s in enumerate(stacks)], dtype=np.int64)
+
+
+class _DedupFrames:
+    """Shared plumbing: layout handling and the ring/indexer pair."""
+
+    def _init_frames(self, observation_space, buffer_size, n_envs, frames_per_step, spare_stacks):
+        if not (isinstance(observation_space, spaces.Box) and observation_space.dtype == np.uint8
+                and len(observation_space.shape) == 3):
+            raise ValueError("Frame deduplication needs uint8 (stack, h, w) or (h, w, stack) observations")
+        self.channels_first = is_image_space_channels_first(observation_space)
+        shape = observation_space.shape
+        self.n_stack = shape[0] if self.channels_first else shape[-1]
+        frame_shape = shape[1:] if self.channels_first else shape[:2]
+        capacity = int(frames_per_step * buffer_size * n_envs) + spare_stacks * self.n_stack * n_envs
+        self.ring = FrameRing(capacity, frame_shape)
+        self.indexer = StackIndexer(self.ring, n_envs, self.n_stack)
+        return spaces.Box(0, np.iinfo(np.int64).max, (self.n_stack,), dtype=np.int64)
+
+    def _index(self, obs):
+        obs = np.asarray(obs)
+        return self.indexer.index(obs if self.channels_first else np.moveaxis(obs, -1, 1))
+
+    def _gather(self, ids):
+        frames = self.ring.gather(ids)
+        return frames if self.channels_first else np.moveaxis(frames, -3, -1)
+
+
+class DedupRolloutBuffer(_DedupFrames, RolloutBuffer):
+    """RolloutBuffer that stores frame ids instead of observations (for PPO/A2C).
+
+    ``frames_per_step`` sizes the ring: new frames each env step adds
+    (= action_repeat in this repo). Rollouts that outgrow it raise at get().
+    """
+
+    def __init__(self, buffer_size, observation_space, action_space, device="auto",
+                 gae_lambda=1, gamma=0.99, n_envs=1, frames_per_step: float = 2.0):
+        index_space = self._init_frames(observation_space, buffer_size, n_envs, frames_per_step, 2)
+        # The base class allocates ``observations`` from this space: (buffer, n_envs, stack) ids.
+        super().__init__(buffer_size, index_space, action_space, device=device,
+                         gae_lambda=gae_lambda, gamma=gamma, n_envs=n_envs)
+        self.frame_space = observation_space
+
+    def reset(self):
+        super().reset()
+        # Older SB3 (2.3.x) allocates ``observations`` as float32 regardless of the space;
+        # ids must stay exact integers.
+        if self.observations.dtype != np.int64:
+            self.observations = np.zeros(self.observations.shape, dtype=np.int64)
+
+    def add(self, obs, *args, **kwargs):
+        super().add(self._index(obs), *args, **kwargs)
+
+    def get(self, batch_size=None):
+        if not self.ring.valid(self.observations).all():
+            raise RuntimeError("Frame ring overwrote frames of this rollout; raise frames_per_step")
+        yield from super().get(batch_size)
+
+    def _get_samples(self, batch_inds, env=None):
+        samples = super()._get_samples(batch_inds, env)
+        return samples._replace(observations=self.to_torch(self._gather(self.observations[batch_inds])))
+
+
+class DedupReplayBuffer(_DedupFrames, ReplayBuffer):
+    """ReplayBuffer that stores frame ids for obs and next_obs (for DQN/QR-DQN/...).
+
+    obs(t+1) is normally next_obs(t), and next_obs(t) is obs(t) advanced by
+    one step, so a transition costs ~``frames_per_step`` new frames instead
+    of 2 * stack. Transitions whose frames were evicted are resampled.
+    """
+
+    def __init__(self, buffer_size, observation_space, action_space, device="auto", n_envs=1,
+                 optimize_memory_usage=False, handle_timeout_termination=True,
+                 frames_per_step: float = 2.0):
+        index_space = self._init_frames(observation_space, buffer_size, n_envs, frames_per_step, 4)
+        # next_obs ids are stored separately; the ring already shares their frames.
+        super().__init__(buffer_size, index_space, action_space, device=device, n_envs=n_envs,
+                         optimize_memory_usage=False,
+                         handle_timeout_termination=handle_timeout_termination)
+        self.frame_space = observation_space
+
+    def add(self, obs, next_obs, action, reward, done, infos):
+        super().add(self._index(obs), self._index(next_obs), action, reward, done, infos)
+
+    def _get_samples(self, batch_inds, env=None):
+        env_indices = np.random.randint(0, high=self.n_envs, size=(len(batch_inds),))
+        upper = self.buffer_size if self.full else self.pos
+        for _ in range(16):
+            ok = self.ring.valid(self.observations[batch_inds, env_indices]) & \
+                self.ring.valid(self.next_observations[batch_inds, env_indices])
+            if ok.all():
+                break
+            bad = ~ok
+            batch_inds[bad] = np.random.randint(0, upper, size=int(bad.sum()))
+            env_indices[bad] = np.random.randint(0, self.n_envs, size=int(bad.sum()))
+        else:
+            raise RuntimeError("Frame ring too small for this replay buffer; raise frames_per_step")
+
+        data = (
+            self._normalize_obs(self._gather(self.observations[batch_inds, env_indices]), env),
+            self.actions[batch_inds, env_indices, :],
+            self._normalize_obs(self._gather(self.next_observations[batch_inds, env_indices]), env),
+            (self.dones[batch_inds, env_indices] * (1 - self.timeouts[batch_inds, env_indices])).reshape(-1, 1),
+            self._normalize_reward(self.rewards[batch_inds, env_indices].reshape(-1, 1), env),
+        )
+        return ReplayBufferSamples(*tuple(map(self.to_torch, data)))
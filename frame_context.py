@@ -0,0 +1,97 @@
+import numpy as np
+
+try:
+    import cv2  # type: ignore
+except Exception as e:  # pragma: no cover
+    cv2 = None
+    _cv2_err = e
+
+
+def to_gray(img: np.ndarray) -> np.ndarray:
+    """Grayscale conversion that accepts gray, BGR or BGRA input."""
+    if img.ndim == 2:
+        return img
+    if cv2 is None:
+        raise RuntimeError(
+            "OpenCV (opencv-python) is required for grayscale conversion but failed to import. "
+            f"Import error: {_cv2_err}"
+        )
+    if img.shape[2] == 4:
+        return cv2.cvtColor(img, cv2.COLOR_BGRA2GRAY)
+    return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+
+class FrameContext:
+    """Per-frame cache of derived images.
+
+    Wraps one captured frame and lazily computes (once) the grayscale image,
+    downscaled pyramid levels and ROI crops, so every consumer in the step
+    loop shares the same conversions instead of redoing them on the full frame.
+
+    ROIs passed to ``crop``/``gray_crop`` are in monitor coordinates: ``origin``
+    is where the frame sits on the monitor, and ``regions`` holds separately
+    captured strips (keyed by their rect) for region-only capture. ``gray``
+    seeds the grayscale image when the caller already has it.
+    """
+
+    def __init__(self, frame: np.ndarray, origin=(0, 0), regions=None, gray=None):
+        self.frame = frame
+        self.origin = (int(origin[0]), int(origin[1]))
+        self.regions = regions or {}
+        self._gray = gray
+        self._pyramid = []
+        self._crops = {}
+
+    @property
+    def shape(self):
+        return self.frame.shape
+
+    @property
+    def gray(self) -> np.ndarray:
+        if self._gray is None:
+            self._gray = to_gray(self.frame)
+        return self._gray
+
+    def pyramid(self, level: int) -> np.ndarray:
+        """Grayscale image downscaled by 2**level (level 0 is `gray`)."""
+        if level <= 0:
+            return self.gray
+        if not self._pyramid:
+            self._pyramid.append(self.gray)
+        while len(self._pyramid) <= level:
+            self._pyramid.append(cv2.pyrDown(self._pyramid[-1]))
+        return self._pyramid[level]
+
+    def crop(self, roi) -> np.ndarray:
+        """Colour crop (a view into the frame) for an (x, y, w, h) roi."""
+        key = tuple(int(v) for v in roi)
+        if key in self.regions:
+            return self.regions[key]
+        x, y, w, h = key
+        x -= self.origin[0]
+        y -= self.origin[1]
+        return self.frame[max(0, y):y+h, max(0, x):x+w]
+
+    def gray_crop(self, roi) -> np.ndarray:
+        key = tuple(int(v) for v in roi)
+        out = self._crops.get(key)
+        if out is None:
+            x, y, w, h = key
+            x -= self.origin[0]
+            y -= self.origin[1]
+            if key in self.regions:
+                out = to_gray(self.regions[key])
+            elif self._gray is not None:
+                out = self._gray[max(0, y):y+h, max(0, x):x+w]
+            else:
+                # Small strips: convert just the crop instead of forcing the full frame.
+                out = to_gray(self.crop(key))
+            self._crops[key] = out
+        return out
+
+
+def as_context(frame) -> FrameContext:
+    """Accept either a raw frame or an existing FrameContext."""
+    if isinstance(frame, FrameContext):
+        return frame
+    return FrameContext(frame)
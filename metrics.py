@@ -0,0 +1,144 @@
+import time
+from bisect import bisect_right
+
+import numpy as np
+
+
+class Histogram:
+    """Fixed-size log-spaced histogram; memory does not grow with samples.
+
+    Bins span ``lo``..``hi`` geometrically (plus under/overflow), which keeps
+    ~12% relative resolution for timings from 10 us to 10 s.
+    """
+
+    def __init__(self, lo: float = 0.01, hi: float = 10000.0, bins: int = 120):
+        self.edges = np.geomspace(lo, hi, bins + 1)
+        self._edges = self.edges.tolist()
+        self.counts = np.zeros(bins + 2, dtype=np.int64)
+        self.n = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, v: float):
+        self.counts[bisect_right(self._edges, v)] += 1
+        self.n += 1
+        self.total += v
+        if v > self.max:
+            self.max = v
+
+    def merge(self, other: "Histogram"):
+        self.counts += other.counts
+        self.n += other.n
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.n if self.n else 0.0
+
+    def centers(self) -> np.ndarray:
+        e = self.edges
+        mid = np.sqrt(e[:-1] * e[1:])
+        return np.concatenate([[e[0]], mid, [e[-1]]])
+
+    def quantile(self, q: float) -> float:
+        if not self.n:
+            return 0.0
+        i = int(np.searchsorted(np.cumsum(self.counts), q * self.n, side="left"))
+        return float(min(self.centers()[i], self.max))
+
+
+class _Timer:
+    __slots__ = ("hist", "t0")
+
+    def __init__(self, hist):
+        self.hist = hist
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.hist.add(1000.0 * (time.perf_counter() - self.t0))
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Metrics:
+    """Named timers (ms histograms) and counters, drained by ``snapshot()``.
+
+    Disabled instances are no-ops, so components can always call into their
+    ``metrics`` attribute. Counters/histograms are created on first use.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = bool(enabled)
+        self._reset()
+
+    def _reset(self):
+        self.hists = {}
+        self.counts = {}
+        self.since = time.monotonic()
+
+    def _hist(self, name):
+        h = self.hists.get(name)
+        if h is None:
+            h = self.hists[name] = Histogram()
+        return h
+
+    def timer(self, name: str):
+        """``with metrics.timer("capture_ms"): ...`` records the block's wall time in ms."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self._hist(name))
+
+    def observe(self, name: str, value: float):
+        if self.enabled:
+            self._hist(name).add(value)
+
+    def count(self, name: str, n: int = 1):
+        if self.enabled:
+            self.counts[name] = self.counts.get(name, 0) + n
+
+    def snapshot(self, reset: bool = True):
+        """Histograms, counters and the wall seconds they cover; None when disabled."""
+        if not self.enabled:
+            return None
+        snap = {"hists": self.hists, "counts": self.counts,
+                "seconds": time.monotonic() - self.since}
+        if reset:
+            self._reset()
+        return snap
+
+
+NULL_METRICS = Metrics(enabled=False)
+
+
+def merge_snapshots(snaps) -> dict:
+    """Combine snapshots from several envs (e.g. ``env_method`` results)."""
+    out = {"hists": {}, "counts": {}, "seconds": 0.0}
+    for s in snaps:
+        if not s:
+            continue
+        for k, h in s["hists"].items():
+            if k in out["hists"]:
+                out["hists"][k].merge(h)
+            else:
+                out["hists"][k] = h
+        for k, v in s["counts"].items():
+            out["counts"][k] = out["counts"].get(k, 0) + v
+        out["seconds"] = max(out["seconds"], s["seconds"])
+    return out
@@ -0,0 +1,313 @@
+import multiprocessing as mp
+import queue
+import time
+import traceback
+from collections import namedtuple
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Everything the env needs from one captured frame. ``obs`` is the
+# preprocessed (obs_height, obs_width) frame; ``missed`` counts frames that
+# were captured (or analyzed) but superseded before the env asked for one.
+# ``profiles`` carries the XP/HP column profiles while a bar level is still
+# unknown (bar_reader.mode: calibrated), so the env can calibrate.
+Analysis = namedtuple(
+    "Analysis",
+    "seq timestamp missed obs game_over hud xp hp cx cy density action_density profiles",
+    defaults=(None,),
+)
+
+
+def _slot_views(names, shape, dtype):
+    shms = [shared_memory.SharedMemory(name=n) for n in names]
+    return shms, [np.ndarray(shape, dtype=dtype, buffer=s.buf) for s in shms]
+
+
+def _capture_main(cfg, names, shape, dtype, free_q, task_q, stop, n_workers):
+    from vs_env_fixed import make_source
+
+    shms, slots = _slot_views(names, shape, dtype)
+    try:
+        source = make_source(cfg)
+        period = 1.0 / float(cfg["fps"])
+        seq = 0
+        dropped = 0
+        next_t = time.monotonic()
+        while not stop.is_set():
+            delay = next_t - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            next_t += period
+            if next_t < time.monotonic():
+                next_t = time.monotonic() + period
+            frame = source.grab()
+            try:
+                slot = free_q.get_nowait()
+            except queue.Empty:
+                # Every slot is still being analyzed: drop this frame.
+                dropped += 1
+                continue
+            np.copyto(slots[slot], frame)
+            task_q.put((slot, seq, time.monotonic(), dropped))
+            seq += 1
+            dropped = 0
+    finally:
+        for _ in range(n_workers):
+            task_q.put(None)
+        task_q.cancel_join_thread()
+        for s in shms:
+            s.close()
+
+
+def _vision_main(cfg, names, shape, dtype, origin, task_q, free_q, result_q, hint, want_hud, bar_levels):
+    from frame_context import FrameContext
+    from capture_fixed import preprocess
+    from reward import BarReader, bar_fill_ratio, make_bar_reader, make_matcher
+    from vision import PlayerTracker, AdaptivePlayerTracker, EnemyDensityEstimator
+    from vs_env_fixed import ACTION_DIRS
+
+    shms, slots = _slot_views(names, shape, dtype)
+    try:
+        mcfg = cfg.get("matching", {}) or {}
+        go = make_matcher(cfg["templates"]["game_over"], 0.75, mcfg.get("game_over"))
+        hud = make_matcher(cfg["templates"]["hud"], float(cfg["reset_wait"]["hud_threshold"]), mcfg.get("hud"))
+        vcfg = cfg["vision"]
+        adaptive = vcfg.get("tracker", "fixed") == "adaptive"
+        if adaptive:
+            tracker = AdaptivePlayerTracker(
+                cfg["templates"]["player"],
+                threshold=float(vcfg["player_match_threshold"]),
+                search_radius=int(vcfg["search_radius"]),
+                min_radius=int(vcfg.get("min_radius", 60)),
+                move_px=float(vcfg.get("move_px", 8.0)),
+                coarse_level=int(vcfg.get("coarse_level", 2)),
+                full_scan=bool(vcfg.get("full_scan", True)),
+            )
+        else:
+            tracker = PlayerTracker(
+                cfg["templates"]["player"],
+                threshold=float(vcfg["player_match_threshold"]),
+                search_radius=int(vcfg["search_radius"]),
+            )
+        ep = cfg["enemy_penalty"]
+        density = EnemyDensityEstimator(int(ep["ring_inner"]), int(ep["ring_outer"]))
+        lookahead = float(ep.get("lookahead_px", 0.0))
+        roi_xp, roi_hp = cfg["roi"]["xp_bar"], cfg["roi"]["hp_bar"]
+        # Unfiltered here: each worker sees every n-th frame, so the env smooths in order.
+        # Levels come only from the env (bar_levels), so every worker reads with the same ones.
+        bcfg = dict(cfg.get("bar_reader", {}) or {}, xp=None, hp=None)
+        xp_reader = make_bar_reader(bcfg, "xp", window=1)
+        hp_reader = make_bar_reader(bcfg, "hp", window=1)
+        out_w, out_h = int(cfg["obs_width"]), int(cfg["obs_height"])
+    except Exception:
+        result_q.put(traceback.format_exc())
+        return
+
+    try:
+        while True:
+            item = task_q.get()
+            if item is None:
+                break
+            slot, seq, stamp, dropped = item
+            ctx = FrameContext(slots[slot], origin=origin)
+            obs = preprocess(ctx, out_w, out_h)
+            is_hud = bool(want_hud.value) and hud.matches(ctx)
+            xp = hp = density_val = np.nan
+            cx = cy = action_density = profiles = None
+            game_over = go.matches(ctx)
+            if not game_over:
+                if xp_reader is not None:
+                    if not (xp_reader.complete and hp_reader.complete):
+                        with bar_levels.get_lock():
+                            levels = bar_levels[:]
+                        for reader, i in ((xp_reader, 0), (hp_reader, 2)):
+                            new = levels[i:i + 2]
+                            if not np.isnan(new).all() and (
+                                    reader.levels is None or not np.allclose(new, reader.levels, equal_nan=True)):
+                                reader.set_levels(*new)
+                    xp = xp_reader.measure(ctx.gray_crop(roi_xp))
+                    hp = hp_reader.measure(ctx.gray_crop(roi_hp))
+                    if not (xp_reader.complete and hp_reader.complete):
+                        profiles = (BarReader.profile(ctx.gray_crop(roi_xp)),
+                                    BarReader.profile(ctx.gray_crop(roi_hp)))
+                else:
+                    xp = bar_fill_ratio(ctx.gray_crop(roi_xp))
+                    hp = bar_fill_ratio(ctx.gray_crop(roi_hp))
+                # The last position any worker found (and, for the adaptive tracker,
+                # the shared velocity/confidence) seeds this worker's search window.
+                with hint.get_lock():
+                    hx, hy, found, action, vx, vy, conf = hint[:]
+                tracker.last_xy = (int(hx), int(hy)) if found else None
+                if adaptive:
+                    tracker.set_heading(ACTION_DIRS[int(action)])
+                    tracker.velocity[:] = (vx, vy)
+                    tracker.confidence = conf
+                cx, cy, _ = tracker.locate(ctx)
+                if cx is not None:
+                    density_val = density.score(ctx, cx, cy)
+                    if lookahead > 0:
+                        cands = np.rint(np.array([cx, cy]) + lookahead * ACTION_DIRS).astype(np.int32)
+                        action_density = density.score_many(ctx, cands)
+                with hint.get_lock():
+                    if cx is not None:
+                        hint[0], hint[1], hint[2] = cx, cy, 1
+                    else:
+                        hint[2] = 0
+                    if adaptive:
+                        hint[4], hint[5] = float(tracker.velocity[0]), float(tracker.velocity[1])
+                        hint[6] = tracker.confidence
+            free_q.put(slot)
+            result_q.put(Analysis(seq, stamp, dropped, obs, game_over, is_hud, xp, hp,
+                                  cx, cy, density_val, action_density, profiles))
+    except Exception:
+        result_q.put(traceback.format_exc())
+    finally:
+        result_q.cancel_join_thread()
+        for s in shms:
+            s.close()
+
+
+class VisionPipeline:
+    """Capture in one process, vision analysis in a pool of worker processes.
+
+    Frames travel through ``slots`` preallocated ``multiprocessing.shared_memory``
+    buffers: the capture process copies each grab into a free slot and queues
+    only its index; a worker runs preprocessing, game-over/HUD matching, bar
+    reading, player tracking and ring density on it, frees the slot and
+    returns a small ``Analysis``. While the env consumes frame N, frames
+    N+1.. are already being analyzed. Workers share the last player position
+    (and the current action plus velocity/confidence, for the adaptive
+    tracker's prediction) through a tiny shared array so tracking stays
+    ROI-local and every worker predicts from the same motion state.
+
+    ``cfg`` is the env's config dict; the capture source is rebuilt from it in
+    the capture process. Uses the "spawn" start method, so it cannot run inside
+    daemonic SubprocVecEnv workers.
+    """
+
+    def __init__(self, cfg: dict, workers: int = 2, slots: int = 0):
+        self.cfg = cfg
+        self.workers = max(1, int(workers))
+        self.n_slots = int(slots) if slots else self.workers + 3
+        self.origin = (0, 0)
+        self._ctx = mp.get_context("spawn")
+        self._procs = []
+        self._shms = []
+        self._last_seq = -1
+
+    def start(self, timeout: float = 30.0):
+        from vs_env_fixed import check_rois, make_source
+
+        # Probe the frame geometry once here so the slots can be sized up front.
+        probe = make_source(self.cfg)
+        frame = np.asarray(probe.grab())
+        self.origin = tuple(getattr(probe, "origin", (0, 0)))
+        del probe
+        shape, dtype = frame.shape, frame.dtype.str
+        # The workers crop the bars out of these frames; fail here, before anything is spawned.
+        check_rois(self.cfg["roi"], (*self.origin, shape[1], shape[0]))
+        self._shms = [shared_memory.SharedMemory(create=True, size=frame.nbytes) for _ in range(self.n_slots)]
+        names = [s.name for s in self._shms]
+
+        ctx = self._ctx
+        self._stop = ctx.Event()
+        self._free_q = ctx.Queue()
+        self._task_q = ctx.Queue()
+        self._result_q = ctx.Queue()
+        # x, y, found, action, velocity x/y, match confidence (the last three for the adaptive tracker)
+        self._hint = ctx.Array("d", [0.0] * 7)
+        self._want_hud = ctx.Value("b", 0)
+        # XP fill, XP background, HP fill, HP background; NaN until set_bar_levels.
+        self._bar_levels = ctx.Array("d", [np.nan] * 4)
+        for i in range(self.n_slots):
+            self._free_q.put(i)
+
+        for i in range(self.workers):
+            p = ctx.Process(
+                target=_vision_main, name=f"vision-{i}", daemon=True,
+                args=(self.cfg, names, shape, dtype, self.origin, self._task_q, self._free_q,
+                      self._result_q, self._hint, self._want_hud, self._bar_levels),
+            )
+            p.start()
+            self._procs.append(p)
+        p = ctx.Process(
+            target=_capture_main, name="capture", daemon=True,
+            args=(self.cfg, names, shape, dtype, self._free_q, self._task_q, self._stop, self.workers),
+        )
+        p.start()
+        self._procs.append(p)
+
+        first = self._get(timeout)
+        self._last_seq = first.seq
+        return self
+
+    def _get(self, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                item = self._result_q.get(timeout=0.5)
+            except queue.Empty:
+                if not all(p.is_alive() for p in self._procs):
+                    raise RuntimeError("Vision pipeline process exited")
+                if time.monotonic() > deadline:
+                    raise TimeoutError("Vision pipeline produced no result in time")
+                continue
+            if isinstance(item, str):
+                raise RuntimeError(f"Vision pipeline worker failed:\n{item}")
+            return item
+
+    def latest(self, timeout: float = 10.0) -> Analysis:
+        """Freshest analysis newer than the last one returned (blocks for the next if none)."""
+        missed = 0
+        best = None
+        while True:
+            try:
+                item = self._result_q.get_nowait() if best is not None else self._get(timeout)
+            except queue.Empty:
+                break
+            if isinstance(item, str):
+                raise RuntimeError(f"Vision pipeline worker failed:\n{item}")
+            missed += item.missed
+            if item.seq <= self._last_seq:
+                missed += 1
+                continue
+            # Workers finish out of order: keep the newest frame, not the last arrival.
+            if best is not None:
+                missed += 1
+            if best is None or item.seq > best.seq:
+                best = item
+        self._last_seq = best.seq
+        return best._replace(missed=missed)
+
+    def set_want_hud(self, on: bool):
+        """HUD matching only runs while reset() waits for gameplay."""
+        self._want_hud.value = 1 if on else 0
+
+    def set_action(self, action: int):
+        with self._hint.get_lock():
+            self._hint[3] = int(action)
+
+    def set_bar_levels(self, bar: int, levels):
+        """Bar reader levels (fill, background) for bar 0 (XP) or 1 (HP), shared by every worker."""
+        with self._bar_levels.get_lock():
+            self._bar_levels[2 * bar], self._bar_levels[2 * bar + 1] = float(levels[0]), float(levels[1])
+
+    def reset_tracking(self):
+        with self._hint.get_lock():
+            self._hint[2] = 0
+            self._hint[4] = self._hint[5] = self._hint[6] = 0.0
+
+    def stop(self):
+        if not self._procs:
+            return
+        self._stop.set()
+        for p in self._procs:
+            p.join(timeout=2.0)
+            if p.is_alive():
+                p.terminate()
+        self._procs = []
+        for s in self._shms:
+            s.close()
+            s.unlink()
+        self._shms = []
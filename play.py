@@ -0,0 +1,218 @@
+"""Play / evaluate a trained policy without the SB3 training stack.
+
+Loads a saved PPO zip, exports the CnnPolicy actor to a lean CPU runtime
+(TorchScript, or ONNX when onnxruntime is installed; optionally int8
+dynamic-quantized) and runs it greedily against VampireSurvivorsEnv.
+Reports per-step inference latency and episode survival statistics:
+
+    python play.py --model vs_ppo_final.zip --episodes 5
+    python play.py --model vs_ppo_final.zip --format onnx --quantize
+    python play.py --model vs_ppo_sim.zip --source synthetic --episodes 3
+    python play.py --model vs_ppo_final.zip --source replay --replay recordings/episode_20250101_120000_p1234_003
+
+``--format sb3`` runs ``model.predict(deterministic=True)`` as the baseline.
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+import torch as th
+from torch import nn
+
+from metrics import Histogram
+
+try:
+    import onnxruntime as ort  # type: ignore
+except Exception:  # pragma: no cover
+    ort = None
+
+
+class GreedyActor(nn.Module):
+    """The deterministic action path of an SB3 ActorCriticCnnPolicy.
+
+    Takes the uint8 observation batch exactly as the env returns it
+    ((N, h, w, stack) or, with obs_channels_first, (N, stack, h, w)) and
+    returns argmax action indices; the value head is dropped.
+    """
+
+    def __init__(self, policy, channels_last: bool):
+        super().__init__()
+        self.features = policy.pi_features_extractor
+        self.mlp = policy.mlp_extractor
+        self.action_net = policy.action_net
+        self.channels_last = bool(channels_last)
+
+    def forward(self, obs):
+        x = obs.float() / 255.0
+        if self.channels_last:
+            x = x.permute(0, 3, 1, 2)
+        latent = self.mlp.forward_actor(self.features(x))
+        return self.action_net(latent).argmax(dim=1)
+
+
+def export_policy(model, env_obs_shape, fmt: str, path: str, quantize: bool = False) -> str:
+    """Export ``model.policy`` as a GreedyActor to TorchScript or ONNX; returns the file path."""
+    channels_last = tuple(env_obs_shape) != tuple(model.observation_space.shape)
+    actor = GreedyActor(model.policy, channels_last).cpu().eval()
+    example = th.zeros((1,) + tuple(env_obs_shape), dtype=th.uint8)
+    if fmt == "torchscript":
+        if quantize:
+            # Dynamic int8 covers the Linear layers (NatureCNN's 3136x512 is most of the weights).
+            actor = th.ao.quantization.quantize_dynamic(actor, {nn.Linear}, dtype=th.qint8)
+        with th.no_grad():
+            scripted = th.jit.trace(actor, example)
+        scripted = th.jit.freeze(scripted.eval())
+        scripted.save(path)
+        return path
+    if fmt == "onnx":
+        if ort is None:
+            raise RuntimeError("--format onnx needs onnxruntime (pip install onnx onnxruntime)")
+        fp32 = path if not quantize else str(Path(path).with_suffix(".fp32.onnx"))
+        th.onnx.export(actor, example, fp32, input_names=["obs"], output_names=["action"],
+                       dynamic_axes={"obs": {0: "n"}, "action": {0: "n"}}, opset_version=17)
+        if quantize:
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            quantize_dynamic(fp32, path, weight_type=QuantType.QInt8)
+        return path
+    raise ValueError(f"Unknown export format: {fmt!r}")
+
+
+class PolicyRuntime:
+    """Greedy action for one observation from an exported (or SB3) policy; times every call."""
+
+    def __init__(self, fmt: str, path: str = None, model=None, threads: int = 1):
+        self.fmt = fmt
+        self.latency = Histogram()
+        th.set_num_threads(max(1, int(threads)))
+        if fmt == "sb3":
+            self.model = model
+        elif fmt == "torchscript":
+            self.module = th.jit.load(path, map_location="cpu")
+        elif fmt == "onnx":
+            opts = ort.SessionOptions()
+            opts.intra_op_num_threads = max(1, int(threads))
+            self.session = ort.InferenceSession(path, opts, providers=["CPUExecutionProvider"])
+        else:
+            raise ValueError(f"Unknown runtime format: {fmt!r}")
+
+    def act(self, obs) -> int:
+        t0 = time.perf_counter()
+        if self.fmt == "sb3":
+            a, _ = self.model.predict(obs, deterministic=True)
+            a = int(a)
+        elif self.fmt == "torchscript":
+            with th.inference_mode():
+                a = int(self.module(th.from_numpy(obs[None]))[0])
+        else:
+            a = int(self.session.run(None, {"obs": obs[None]})[0][0])
+        self.latency.add(1000.0 * (time.perf_counter() - t0))
+        return a
+
+
+def check_agreement(model, runtime, obs_shape, n: int = 64, seed: int = 0) -> float:
+    """Fraction of random observations where the runtime picks SB3's deterministic action."""
+    rng = np.random.default_rng(seed)
+    same = 0
+    for _ in range(n):
+        obs = rng.integers(0, 256, size=obs_shape, dtype=np.uint8)
+        a, _ = model.predict(obs, deterministic=True)
+        same += int(a) == runtime.act(obs)
+    runtime.latency = Histogram()
+    return same / n
+
+
+def evaluate(env, runtime, episodes: int, max_steps: int = 0) -> dict:
+    """Run ``episodes`` greedy episodes; survival is measured in env steps and wall seconds."""
+    rows = []
+    for ep in range(episodes):
+        obs, _ = env.reset()
+        t0 = time.monotonic()
+        steps, ret, died = 0, 0.0, False
+        while True:
+            obs, r, terminated, truncated, _ = env.step(runtime.act(obs))
+            steps += 1
+            ret += r
+            if terminated or truncated or (max_steps and steps >= max_steps):
+                died = bool(terminated)
+                break
+        rows.append({"steps": steps, "seconds": time.monotonic() - t0, "return": ret, "died": died})
+        print(f"[play] episode {ep}: {steps} steps, {rows[-1]['seconds']:.1f}s, return {ret:.2f}"
+              f"{'' if died else ' (cut off)'}")
+    steps = np.array([r["steps"] for r in rows])
+    secs = np.array([r["seconds"] for r in rows])
+    lat = runtime.latency
+    return {
+        "episodes": rows,
+        "survival_steps_mean": float(steps.mean()),
+        "survival_steps_median": float(np.median(steps)),
+        "survival_steps_max": int(steps.max()),
+        "survival_seconds_mean": float(secs.mean()),
+        "return_mean": float(np.mean([r["return"] for r in rows])),
+        "inference_ms_mean": lat.mean,
+        "inference_ms_p50": lat.quantile(0.50),
+        "inference_ms_p95": lat.quantile(0.95),
+        "inference_ms_p99": lat.quantile(0.99),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--model", default="vs_ppo_final.zip")
+    ap.add_argument("--config", default="config_fixed.yaml")
+    ap.add_argument("--format", choices=("torchscript", "onnx", "sb3"), default="torchscript")
+    ap.add_argument("--quantize", action="store_true", help="int8 dynamic quantization of the exported policy")
+    ap.add_argument("--export-path", default=None, help="default: next to --model")
+    ap.add_argument("--threads", type=int, default=1, help="CPU threads for inference")
+    ap.add_argument("--episodes", type=int, default=5)
+    ap.add_argument("--max-steps", type=int, default=0, help="cut episodes off after this many steps (0 = never)")
+    ap.add_argument("--source", choices=("monitor", "synthetic", "replay", "file"), default=None,
+                    help="override capture_source (default: the config's)")
+    ap.add_argument("--replay", default=None, help="episode directory for --source replay")
+    ap.add_argument("--out", default=None, help="write the summary as JSON")
+    args = ap.parse_args()
+
+    from stable_baselines3 import PPO
+    from vs_env_fixed import VampireSurvivorsEnv
+
+    overrides = {"record": {"enabled": False}, "signal_log": {"enabled": False}}
+    if args.source:
+        overrides["capture_source"] = args.source
+    if args.replay:
+        overrides["replay"] = {"path": args.replay}
+    env = VampireSurvivorsEnv(args.config, overrides=overrides)
+
+    model = PPO.load(args.model, device="cpu")
+    if args.format == "sb3":
+        runtime = PolicyRuntime("sb3", model=model, threads=args.threads)
+    else:
+        suffix = (".int8" if args.quantize else "") + (".torchscript.pt" if args.format == "torchscript" else ".onnx")
+        path = args.export_path or str(Path(args.model).with_suffix(suffix))
+        export_policy(model, env.observation_space.shape, args.format, path, quantize=args.quantize)
+        print(f"[play] exported {args.format}{' int8' if args.quantize else ''} policy: {path}")
+        runtime = PolicyRuntime(args.format, path, threads=args.threads)
+        agree = check_agreement(model, runtime, env.observation_space.shape)
+        print(f"[play] agrees with SB3 deterministic actions on {100 * agree:.0f}% of random inputs")
+
+    try:
+        if env.cfg.get("capture_source", "monitor") == "monitor":
+            print("Starting in 5 seconds. Click the game window so it has focus...")
+            time.sleep(5)
+        summary = evaluate(env, runtime, args.episodes, args.max_steps)
+    finally:
+        env.close()
+    summary["format"] = args.format
+    summary["quantized"] = bool(args.quantize)
+    print(f"survival: mean {summary['survival_steps_mean']:.0f} / median {summary['survival_steps_median']:.0f}"
+          f" / max {summary['survival_steps_max']} steps ({summary['survival_seconds_mean']:.1f}s mean)")
+    print(f"inference: p50 {summary['inference_ms_p50']:.2f}  p95 {summary['inference_ms_p95']:.2f}"
+          f"  p99 {summary['inference_ms_p99']:.2f} ms")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        print(f"Saved: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
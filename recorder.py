@@ -0,0 +1,197 @@
+import json
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from metrics import NULL_METRICS
+
+try:
+    import cv2  # type: ignore
+except Exception as e:  # pragma: no cover
+    cv2 = None
+    _cv2_err = e
+
+# Per-frame columns stored next to each chunk of encoded frames.
+SIGNAL_COLUMNS = ("t", "action", "xp", "hp", "px", "py", "game_over")
+
+
+class EpisodeRecorder:
+    """Streams env frames + actions + signals to chunked episode directories.
+
+    Layout of one episode::
+
+        <root>/episode_<stamp>_p<pid>_<n>/meta.json         frame shape, origin, chunk size
+        <root>/episode_<stamp>_p<pid>_<n>/chunk_00000.bin   PNG-encoded frames, back to back
+        <root>/episode_<stamp>_p<pid>_<n>/chunk_00000.npz   offsets/sizes + SIGNAL_COLUMNS
+
+    The pid keeps concurrent env workers (one process per game instance)
+    from writing into the same directory.
+
+    Frames are copied on ``record`` and encoded/written on a background
+    thread so the step loop only pays for the copy. If the writer falls
+    more than ``max_queue`` frames behind, new frames are dropped rather
+    than blocking the step; the count goes to meta.json ("dropped_frames")
+    and the ``record_dropped`` counter.
+    """
+
+    metrics = NULL_METRICS
+
+    def __init__(self, root: str = "recordings", chunk_frames: int = 256,
+                 png_compression: int = 1, max_queue: int = 64):
+        if cv2 is None:
+            raise RuntimeError(f"OpenCV is required for EpisodeRecorder. Import error: {_cv2_err}")
+        self.root = Path(root)
+        self.chunk_frames = int(chunk_frames)
+        self.png_params = [cv2.IMWRITE_PNG_COMPRESSION, int(png_compression)]
+        self._q = queue.Queue(maxsize=int(max_queue))
+        self._thread = threading.Thread(target=self._run, name="episode-recorder", daemon=True)
+        self._thread.start()
+        self.episode_dir = None
+        self._n_episodes = 0
+        self.dropped = 0
+
+    # --- producer side (env thread) ---
+
+    def begin_episode(self, origin=(0, 0), fps: float = 0.0):
+        self.end_episode()
+        stamp = time.strftime("%Y%m%d_%H%M%S")
+        self.episode_dir = self.root / f"episode_{stamp}_p{os.getpid()}_{self._n_episodes:03d}"
+        self._n_episodes += 1
+        self.dropped = 0
+        self._q.put(("begin", self.episode_dir, {"origin": list(origin), "fps": fps}))
+
+    def record(self, frame: np.ndarray, action: int, xp=np.nan, hp=np.nan,
+               player_xy=None, game_over: bool = False, t: float = None):
+        if self.episode_dir is None:
+            return
+        px, py = player_xy if player_xy is not None and player_xy[0] is not None else (-1, -1)
+        row = (time.monotonic() if t is None else t, int(action), xp, hp, px, py, bool(game_over))
+        try:
+            self._q.put_nowait(("frame", np.array(frame, copy=True), row))
+        except queue.Full:
+            self.dropped += 1
+            self.metrics.count("record_dropped")
+
+    def end_episode(self):
+        if self.episode_dir is not None:
+            self._q.put(("end", self.dropped, None))
+            self.episode_dir = None
+
+    def close(self):
+        self.end_episode()
+        self._q.put(("stop", None, None))
+        self._thread.join(timeout=30.0)
+
+    # --- writer thread ---
+
+    def _run(self):
+        ep_dir, meta, blobs, rows, chunk = None, None, [], [], 0
+        while True:
+            kind, a, b = self._q.get()
+            if kind == "begin":
+                ep_dir, meta, blobs, rows, chunk = a, b, [], [], 0
+                ep_dir.mkdir(parents=True, exist_ok=True)
+            elif kind == "frame" and ep_dir is not None:
+                if not meta.get("shape"):
+                    meta["shape"] = list(a.shape)
+                    meta["chunk_frames"] = self.chunk_frames
+                    (ep_dir / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+                ok, buf = cv2.imencode(".png", a, self.png_params)
+                if ok:
+                    blobs.append(buf.tobytes())
+                    rows.append(b)
+                if len(blobs) >= self.chunk_frames:
+                    self._flush(ep_dir, chunk, blobs, rows)
+                    chunk, blobs, rows = chunk + 1, [], []
+            elif kind in ("end", "stop"):
+                if ep_dir is not None and blobs:
+                    self._flush(ep_dir, chunk, blobs, rows)
+                if ep_dir is not None and a and meta.get("shape"):
+                    meta["dropped_frames"] = int(a)
+                    (ep_dir / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+                ep_dir, blobs, rows = None, [], []
+                if kind == "stop":
+                    return
+
+    def _flush(self, ep_dir: Path, chunk: int, blobs, rows):
+        sizes = np.array([len(x) for x in blobs], dtype=np.int64)
+        offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int64)
+        with open(ep_dir / f"chunk_{chunk:05d}.bin", "wb") as f:
+            for x in blobs:
+                f.write(x)
+        cols = {name: np.array([r[i] for r in rows]) for i, name in enumerate(SIGNAL_COLUMNS)}
+        np.savez(ep_dir / f"chunk_{chunk:05d}.npz", offsets=offsets, sizes=sizes, **cols)
+
+
+class ReplayCapture:
+    """Frame source that replays EpisodeRecorder output (drop-in for MonitorCapture).
+
+    ``path`` is one episode directory or a directory of episodes (played in
+    name order). Chunk files are memory-mapped and frames decoded one at a
+    time, so long recordings never need to fit in RAM. The recorded columns
+    are available through ``signals()``.
+    """
+
+    def __init__(self, path: str, loop: bool = True):
+        if cv2 is None:
+            raise RuntimeError(f"OpenCV is required for ReplayCapture. Import error: {_cv2_err}")
+        p = Path(path)
+        if (p / "meta.json").exists():
+            episodes = [p]
+        elif p.is_dir():
+            episodes = sorted(d for d in p.iterdir() if (d / "meta.json").exists())
+        else:
+            episodes = []
+        if not episodes:
+            raise FileNotFoundError(f"No recorded episodes found at: {path}")
+
+        self.loop = bool(loop)
+        meta = json.loads((episodes[0] / "meta.json").read_text(encoding="utf-8"))
+        self.origin = tuple(meta.get("origin", (0, 0)))
+        self.fps = float(meta.get("fps", 0.0))
+
+        # (bin_path, offsets, sizes, columns) per chunk, in playback order.
+        self.chunks = []
+        for ep in episodes:
+            for idx in sorted(ep.glob("chunk_*.npz")):
+                with np.load(idx) as z:
+                    cols = {k: z[k] for k in z.files}
+                self.chunks.append((idx.with_suffix(".bin"), cols.pop("offsets"), cols.pop("sizes"), cols))
+        if not self.chunks:
+            raise FileNotFoundError(f"Recorded episodes at {path} contain no frames")
+        self.n_frames = int(sum(len(c[1]) for c in self.chunks))
+        self._chunk = 0
+        self._i = 0
+        self._mm = None
+
+    def __len__(self):
+        return self.n_frames
+
+    def grab(self) -> np.ndarray:
+        bin_path, offsets, sizes, _ = self.chunks[self._chunk]
+        if self._i >= len(offsets):
+            self._chunk += 1
+            self._i = 0
+            self._mm = None
+            if self._chunk >= len(self.chunks):
+                if not self.loop:
+                    raise EOFError("ReplayCapture exhausted")
+                self._chunk = 0
+            bin_path, offsets, sizes, _ = self.chunks[self._chunk]
+        if self._mm is None:
+            self._mm = np.memmap(bin_path, dtype=np.uint8, mode="r")
+        o, n = int(offsets[self._i]), int(sizes[self._i])
+        frame = cv2.imdecode(self._mm[o:o + n], cv2.IMREAD_UNCHANGED)
+        self._i += 1
+        return frame
+
+    def grab_regions(self) -> dict:
+        return {}
+
+    def signals(self) -> dict:
+        """All recorded SIGNAL_COLUMNS concatenated across chunks."""
+        return {k: np.concatenate([c[3][k] for c in self.chunks]) for k in SIGNAL_COLUMNS}
@@ -1,19 +1,171 @@
 import cv2
 import numpy as np
+from collections import deque
 from pathlib import Path
 
+from frame_context import as_context, to_gray
+from metrics import NULL_METRICS
+
 def crop(frame_bgr: np.ndarray, roi):
     x, y, w, h = roi
     return frame_bgr[y:y+h, x:x+w]
 
 def bar_fill_ratio(bar_bgr: np.ndarray) -> float:
-    gray = cv2.cvtColor(bar_bgr, cv2.COLOR_BGR2GRAY)
+    # Accepts a colour crop or an already-gray crop (FrameContext.gray_crop).
+    gray = to_gray(bar_bgr)
     _, thr = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
     return float((thr > 0).mean())
 
+class BarReader:
+    """Bar fill from calibrated gray levels instead of a per-frame Otsu threshold.
+
+    Calibration learns the fill and background gray levels once: a two-class
+    split of the bar's column profile, so it needs both parts of the bar on
+    screen (or pass ``levels`` from ``debug_roi.py``). The levels are gray
+    values of the crop FrameContext already converts, not BGR colours. A
+    reading then averages the crop down to one gray value per column, maps it
+    through a 256-entry LUT to a score in [-1, 1] (+1 fill, -1 background) and
+    puts the fill edge at the split that best fits a filled-left / empty-right
+    step, i.e. the argmax of the score's cumulative sum: O(width), and a few
+    columns covered by effects barely move it. ``smooth`` takes the median of
+    the last ``window`` readings.
+
+    A bar showing one part only (HP full, XP empty at the start of a run)
+    cannot be split. With ``uniform`` ("full" or "empty") such a bar gives
+    that one level, and columns within ``min_contrast / 2`` of it score as
+    that part, anything else as the other: the bar reads from the first frame
+    and the second level is learned once the bar is part-way filled. Until
+    some level is known, readings are NaN (no signal), never a different
+    estimator, so calibrating mid-episode cannot produce a jump.
+    """
+
+    def __init__(self, levels=None, window: int = 3, min_contrast: float = 20.0, uniform=None):
+        if uniform not in (None, "full", "empty"):
+            raise ValueError(f"Unknown bar uniform state: {uniform!r} (expected full, empty or null)")
+        self.min_contrast = float(min_contrast)
+        self.uniform = uniform
+        self.levels = None
+        self.lut = None
+        self._history = deque(maxlen=max(1, int(window)))
+        if levels is not None:
+            self.set_levels(*levels)
+
+    @property
+    def calibrated(self) -> bool:
+        return self.lut is not None
+
+    @property
+    def complete(self) -> bool:
+        """Both levels are known (not just the one from a uniform bar)."""
+        return self.levels is not None and not np.isnan(self.levels).any()
+
+    def set_levels(self, fill: float, background: float):
+        """LUT from (fill, background); either may be NaN when only the other is known."""
+        fill = float("nan") if fill is None else float(fill)
+        background = float("nan") if background is None else float(background)
+        v = np.arange(256, dtype=np.float32)
+        if np.isnan(fill) and np.isnan(background):
+            raise ValueError("Bar fill and background levels are both unknown")
+        tol = 0.5 * self.min_contrast
+        if np.isnan(background):
+            # Only the fill level: columns near it are fill, anything else background.
+            self.lut = np.where(np.abs(v - fill) <= tol, 1.0, -1.0).astype(np.float32)
+        elif np.isnan(fill):
+            self.lut = np.where(np.abs(v - background) <= tol, -1.0, 1.0).astype(np.float32)
+        else:
+            if abs(fill - background) < 1.0:
+                raise ValueError(f"Bar fill and background levels are too close: {fill:.1f} / {background:.1f}")
+            score = np.clip((v - background) / (fill - background), 0.0, 1.0)
+            self.lut = 2.0 * score - 1.0
+        self.levels = (fill, background)
+
+    @staticmethod
+    def profile(bar) -> np.ndarray:
+        """Mean gray value of every column of a bar crop (uint8, length = width)."""
+        return cv2.reduce(to_gray(bar), 0, cv2.REDUCE_AVG).ravel()
+
+    def calibrate(self, bar) -> bool:
+        """Learn levels from this bar; False if they did not change."""
+        return self.calibrate_profile(self.profile(bar))
+
+    def calibrate_profile(self, prof) -> bool:
+        lo, hi = np.percentile(prof, (5, 95))
+        if hi - lo < self.min_contrast:
+            if self.calibrated or self.uniform is None:
+                return False
+            # One part only: the bar is taken to be full (or empty), as it is at the start of a run.
+            level = float(np.median(prof))
+            if self.uniform == "full":
+                self.set_levels(level, None)
+            else:
+                self.set_levels(None, level)
+            return True
+        t, _ = cv2.threshold(prof.reshape(1, -1), 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        bright = prof > t
+        if bright.sum() < 2 or (~bright).sum() < 2:
+            return False
+        bright_level, dark_level = float(prof[bright].mean()), float(prof[~bright].mean())
+        # Bars fill from the left, so the leftmost columns show the fill colour.
+        left = float(np.median(prof[:max(2, prof.size // 32)]))
+        if left > t:
+            self.set_levels(bright_level, dark_level)
+        else:
+            self.set_levels(dark_level, bright_level)
+        return True
+
+    def measure(self, bar) -> float:
+        if self.lut is None:
+            return float("nan")
+        return self.measure_profile(self.profile(bar))
+
+    def measure_profile(self, prof) -> float:
+        edge = np.cumsum(self.lut[prof])
+        k = int(np.argmax(edge)) + 1
+        # An empty bar (every prefix sums negative) has its edge at 0.
+        if edge[k - 1] <= 0.0:
+            k = 0
+        return k / edge.size
+
+    def smooth(self, value: float) -> float:
+        if np.isnan(value):
+            return float(value)
+        self._history.append(value)
+        return float(np.median(self._history)) if len(self._history) > 1 else float(value)
+
+    def read(self, bar) -> float:
+        """Calibrate from this crop if a level is still missing, then measure and smooth."""
+        if not self.complete:
+            self.calibrate(bar)
+        return self.smooth(self.measure(bar))
+
+    def reset(self):
+        """Forget the filter history (calibration is kept)."""
+        self._history.clear()
+
+# Which part a one-part bar shows at the start of a run (see BarReader.uniform).
+BAR_UNIFORM = {"xp": "empty", "hp": "full"}
+
+def make_bar_reader(bcfg, name: str, window=None):
+    """BarReader for the ``bar_reader`` config block (``<name>``: optional [fill, background]), None in otsu mode."""
+    bcfg = bcfg or {}
+    mode = bcfg.get("mode", "otsu")
+    if mode == "otsu":
+        return None
+    if mode == "calibrated":
+        return BarReader(
+            levels=bcfg.get(name),
+            window=int(bcfg.get("window", 3)) if window is None else int(window),
+            min_contrast=float(bcfg.get("min_contrast", 20.0)),
+            uniform=dict(BAR_UNIFORM, **(bcfg.get("uniform") or {})).get(name),
+        )
+    raise ValueError(f"Unknown bar_reader mode: {mode!r}")
+
 class TemplateMatcher:
+    metrics = NULL_METRICS
+
     def __init__(self, template_path: str, threshold: float = 0.75):
         p = Path(template_path)
+        self.name = p.stem
         if not p.exists():
             raise FileNotFoundError(f"Missing template: {template_path}")
         self.template = cv2.imread(str(p), cv2.IMREAD_GRAYSCALE)
@@ -21,10 +173,98 @@ class TemplateMatcher:
             raise RuntimeError(f"Failed to load template: {template_path}")
         self.thresh = threshold
 
-    def score(self, frame_bgr: np.ndarray) -> float:
-        gray = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY)
+    def score(self, frame_bgr) -> float:
+        gray = as_context(frame_bgr).gray
+        res = cv2.matchTemplate(gray, self.template, cv2.TM_CCOEFF_NORMED)
+        return float(res.max())
+
+    def matches(self, frame_bgr) -> bool:
+        with self.metrics.timer(f"match_{self.name}_ms"):
+            return self.score(frame_bgr) >= self.thresh
+
+
+class PyramidTemplateMatcher(TemplateMatcher):
+    """Coarse-to-fine TemplateMatcher (same score/matches API).
+
+    1. Optional precheck: if the search area is nearly flat (grayscale std
+       below ``min_std``) the template cannot be there, return 0.
+    2. Match a downscaled template on pyramid level ``level`` of the frame,
+       optionally limited to ``region`` (x, y, w, h in monitor coordinates).
+    3. If the coarse score is below ``coarse_reject`` return it as-is; else
+       confirm at full resolution in a small window around the best candidate.
+    """
+
+    def __init__(self, template_path: str, threshold: float = 0.75, level: int = 2,
+                 region=None, refine_margin: int = 8, coarse_reject: float = 0.5, min_std: float = 0.0):
+        super().__init__(template_path, threshold)
+        self.level = max(0, int(level))
+        self.region = tuple(int(v) for v in region) if region else None
+        self.refine_margin = int(refine_margin)
+        self.coarse_reject = float(coarse_reject)
+        self.min_std = float(min_std)
+        tpl = self.template
+        for _ in range(self.level):
+            tpl = cv2.pyrDown(tpl)
+        self.coarse_template = tpl
+
+    def _search_rect(self, ctx):
+        H, W = ctx.shape[:2]
+        if self.region is None:
+            return 0, 0, W, H
+        x, y, w, h = self.region
+        x -= ctx.origin[0]
+        y -= ctx.origin[1]
+        x1, y1 = max(0, x), max(0, y)
+        return x1, y1, min(W, x + w), min(H, y + h)
+
+    def _full_score(self, gray) -> float:
+        th, tw = self.template.shape[:2]
+        if gray.shape[0] < th or gray.shape[1] < tw:
+            return 0.0
         res = cv2.matchTemplate(gray, self.template, cv2.TM_CCOEFF_NORMED)
         return float(res.max())
 
-    def matches(self, frame_bgr: np.ndarray) -> bool:
-        return self.score(frame_bgr) >= self.thresh
+    def score(self, frame_bgr) -> float:
+        ctx = as_context(frame_bgr)
+        x1, y1, x2, y2 = self._search_rect(ctx)
+        s = 2 ** self.level
+        coarse = ctx.pyramid(self.level)[y1 // s:y2 // s, x1 // s:x2 // s]
+        ch, cw = self.coarse_template.shape[:2]
+        if coarse.shape[0] < ch or coarse.shape[1] < cw:
+            return self._full_score(ctx.gray[y1:y2, x1:x2])
+
+        if self.min_std > 0.0 and float(coarse.std()) < self.min_std:
+            return 0.0
+
+        res = cv2.matchTemplate(coarse, self.coarse_template, cv2.TM_CCOEFF_NORMED)
+        _, coarse_val, _, loc = cv2.minMaxLoc(res)
+        if coarse_val < self.coarse_reject:
+            return float(coarse_val)
+
+        # Refine at full resolution around the coarse candidate only.
+        th, tw = self.template.shape[:2]
+        pad = self.refine_margin + s
+        fx = (x1 // s + loc[0]) * s
+        fy = (y1 // s + loc[1]) * s
+        rx1, ry1 = max(x1, fx - pad), max(y1, fy - pad)
+        rx2, ry2 = min(x2, fx + tw + pad), min(y2, fy + th + pad)
+        return self._full_score(ctx.gray[ry1:ry2, rx1:rx2])
+
+
+def make_matcher(template_path: str, threshold: float, mcfg=None) -> TemplateMatcher:
+    """Build a matcher from a ``matching.<name>`` config block (mode: full | pyramid)."""
+    mcfg = mcfg or {}
+    mode = mcfg.get("mode", "full")
+    if mode == "full":
+        return TemplateMatcher(template_path, threshold=threshold)
+    if mode == "pyramid":
+        return PyramidTemplateMatcher(
+            template_path,
+            threshold=threshold,
+            level=int(mcfg.get("level", 2)),
+            region=mcfg.get("region"),
+            refine_margin=int(mcfg.get("refine_margin", 8)),
+            coarse_reject=float(mcfg.get("coarse_reject", 0.5)),
+            min_std=float(mcfg.get("min_std", 0.0)),
+        )
+    raise ValueError(f"Unknown matcher mode: {mode!r}")
@@ -0,0 +1,68 @@
+import time
+
+import numpy as np
+
+
+class StepScheduler:
+    """Fixed-rate pacing against absolute deadlines on a monotonic clock.
+
+    ``wait()`` sleeps until the next deadline, so capture/vision/reward time
+    is absorbed into the period instead of being added to it (the old
+    ``time.sleep(dt)`` ran at dt + processing). A tick that arrives after its
+    deadline is an overrun; once the backlog exceeds ``max_lag`` periods the
+    schedule re-anchors to "now" instead of firing a burst of catch-up ticks.
+    """
+
+    def __init__(self, period: float, max_lag: float = 3.0, window: int = 256):
+        self.period = float(period)
+        self.max_lag = float(max_lag)
+        self._late = np.zeros(int(window), dtype=np.float64)
+        self.reset()
+
+    def reset(self):
+        self.deadline = time.monotonic() + self.period
+        self.ticks = 0
+        self.overruns = 0
+        self.resyncs = 0
+        self._n = 0
+        self._last_tick = None
+        self._intervals = 0.0
+
+    def wait(self) -> float:
+        """Block until the next deadline; returns how late this tick is (s, >= 0)."""
+        now = time.monotonic()
+        delay = self.deadline - now
+        if delay > 0:
+            time.sleep(delay)
+            now = time.monotonic()
+        late = max(0.0, now - self.deadline)
+
+        self._late[self._n % self._late.size] = late
+        self._n += 1
+        self.ticks += 1
+        if late > 0.1 * self.period:
+            self.overruns += 1
+        if self._last_tick is not None:
+            self._intervals += now - self._last_tick
+        self._last_tick = now
+
+        self.deadline += self.period
+        if now - self.deadline > self.max_lag * self.period:
+            self.deadline = now + self.period
+            self.resyncs += 1
+        return late
+
+    def is_stale(self) -> bool:
+        """True when the next deadline has already passed (we are a full period behind)."""
+        return time.monotonic() > self.deadline
+
+    def stats(self) -> dict:
+        late = self._late[:min(self._n, self._late.size)] * 1000.0
+        return {
+            "overruns": self.overruns,
+            "resyncs": self.resyncs,
+            "late_ms_mean": float(late.mean()) if late.size else 0.0,
+            "late_ms_max": float(late.max()) if late.size else 0.0,
+            "jitter_ms": float(late.std()) if late.size else 0.0,
+            "period_ms": 1000.0 * self._intervals / (self.ticks - 1) if self.ticks > 1 else 0.0,
+        }
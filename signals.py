@@ -0,0 +1,186 @@
+"""Raw per-sub-step signal log and offline reward relabeling.
+
+The env's reward is a fixed function of a few raw signals it already
+computes every sub-step (game-over flag, XP/HP bar fill, player position,
+enemy ring density). ``SignalLog`` stores those signals column-wise in
+compressed .npz chunks; ``relabel`` recomputes per-step rewards from them,
+fully vectorized, for any curriculum phase or weight set:
+
+    cols = load_signals("signals")
+    r1 = relabel(cols, params_from_config(cfg, phase=1))
+    r3 = relabel(cols, params_from_config(cfg, phase=3))
+"""
+import os
+import re
+from pathlib import Path
+
+import numpy as np
+
+from curriculum import curriculum_params
+
+# Column name -> dtype. substep == -1 marks the reset frame of an episode
+# (it seeds the "previous" values but earns no reward).
+COLUMNS = {
+    "episode": np.int32,
+    "step": np.int32,
+    "substep": np.int8,
+    "action": np.int8,
+    "game_over": np.bool_,
+    "xp": np.float32,
+    "hp": np.float32,
+    "found": np.bool_,
+    "cx": np.int32,
+    "cy": np.int32,
+    "density": np.float32,
+}
+
+GAME_OVER_REWARD = -25.0
+
+_CHUNK = re.compile(r"signals_(?:p(\d+)_)?(\d+)\.npz$")
+
+
+class SignalLog:
+    """Append-only columnar store, flushed to ``<root>/signals_p<pid>_<n>.npz`` chunks.
+
+    The pid keeps env workers of a multi-instance run (one process each) from
+    overwriting each other's chunks in a shared directory.
+    """
+
+    def __init__(self, root: str = "signals", chunk_rows: int = 65536):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.chunk_rows = int(chunk_rows)
+        self._cols = {k: np.zeros(self.chunk_rows, dtype=t) for k, t in COLUMNS.items()}
+        self._n = 0
+        self._prefix = f"signals_p{os.getpid()}_"
+        self._chunk = len(list(self.root.glob(self._prefix + "*.npz")))
+
+    def append(self, episode, step, substep, action, game_over=False, xp=np.nan, hp=np.nan,
+               cx=None, cy=None, density=np.nan):
+        i = self._n
+        c = self._cols
+        c["episode"][i] = episode
+        c["step"][i] = step
+        c["substep"][i] = substep
+        c["action"][i] = action
+        c["game_over"][i] = game_over
+        c["xp"][i] = xp
+        c["hp"][i] = hp
+        c["found"][i] = cx is not None
+        c["cx"][i] = -1 if cx is None else cx
+        c["cy"][i] = -1 if cy is None else cy
+        c["density"][i] = density
+        self._n += 1
+        if self._n >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        if self._n == 0:
+            return
+        path = self.root / f"{self._prefix}{self._chunk:05d}.npz"
+        np.savez_compressed(path, **{k: v[:self._n] for k, v in self._cols.items()})
+        self._chunk += 1
+        self._n = 0
+
+    def close(self):
+        self.flush()
+
+
+def load_signals(root: str) -> dict:
+    """Concatenate every chunk under ``root``, one writer process after another.
+
+    Each process numbers its episodes from 0, so episode ids are offset per
+    writer to keep them unique (relabel links rows by episode).
+    """
+    streams = {}
+    for p in Path(root).glob("signals_*.npz"):
+        m = _CHUNK.search(p.name)
+        if m:
+            streams.setdefault(int(m.group(1) or -1), []).append((int(m.group(2)), p))
+    if not streams:
+        raise FileNotFoundError(f"No signal chunks found in: {root}")
+    parts = {k: [] for k in COLUMNS}
+    offset = 0
+    for pid in sorted(streams):
+        top = -1
+        for _, p in sorted(streams[pid]):
+            with np.load(p) as z:
+                for k in COLUMNS:
+                    parts[k].append(z[k] + offset if k == "episode" else z[k])
+                if z["episode"].size:
+                    top = max(top, int(z["episode"].max()))
+        offset += top + 1
+    return {k: np.concatenate(v) for k, v in parts.items()}
+
+
+def params_from_config(cfg: dict, phase=None) -> dict:
+    """Reward weights as the env would use them (optionally with a curriculum phase applied)."""
+    rc = cfg.get("reward", {}) or {}
+    p = {
+        "time_reward": float(rc.get("time_reward", 0.01)),
+        "hp_loss_scale": float(rc.get("hp_loss_scale", 5.0)),
+        "max_neg": float(rc.get("max_negative_per_step", 1.0)),
+        "max_pos": float(rc.get("max_positive_per_step", 1.0)),
+        "idle_when_unknown_penalty": float(rc.get("idle_when_unknown_penalty", 0.0)),
+        "density_weight": float(cfg["enemy_penalty"]["density_weight"]),
+        "idle_weight": float(cfg["idle_penalty"]["weight"]),
+        "idle_speed_thr": float(cfg["idle_penalty"]["speed_px_threshold"]),
+        "xp_scale": float(cfg.get("_xp_scale", 2.0)),
+    }
+    if phase is not None:
+        p.update(curriculum_params(phase))
+    return p
+
+
+def relabel(cols: dict, params: dict):
+    """Recompute per-step rewards from logged signals.
+
+    Mirrors VampireSurvivorsEnv.step: per sub-step time bonus, XP gain,
+    HP loss, ring-density penalty and idle penalty (or the unknown-position
+    penalty), -25 on game over; summed per env step and clipped.
+    Returns ``(episode, step, reward)`` arrays, one entry per env step.
+    """
+    ep = cols["episode"]
+    sub = cols["substep"]
+    n = ep.size
+    if n == 0:
+        z = np.zeros(0)
+        return z.astype(np.int32), z.astype(np.int32), z.astype(np.float32)
+
+    # "Previous" values come from the preceding row of the same episode,
+    # including the reset row; game-over rows never seed anything.
+    same_ep = np.zeros(n, dtype=bool)
+    same_ep[1:] = ep[1:] == ep[:-1]
+    has_prev = same_ep.copy()
+    has_prev[1:] &= ~cols["game_over"][:-1]
+    xp, hp = cols["xp"].astype(np.float64), cols["hp"].astype(np.float64)
+    prev_xp = np.roll(xp, 1)
+    prev_hp = np.roll(hp, 1)
+    found = cols["found"]
+    prev_found = np.roll(found, 1) & has_prev
+    dx = cols["cx"] - np.roll(cols["cx"], 1)
+    dy = cols["cy"] - np.roll(cols["cy"], 1)
+    speed = np.sqrt(dx.astype(np.float64) ** 2 + dy.astype(np.float64) ** 2)
+
+    live = (sub >= 0) & ~cols["game_over"]
+    r = np.zeros(n, dtype=np.float64)
+    r += np.where(live, params["time_reward"], 0.0)
+    # NaN readings (uncalibrated bar reader) contribute no delta, as in step().
+    r += np.where(live & has_prev, params["xp_scale"] * np.nan_to_num(xp - prev_xp), 0.0)
+    r += np.where(live & has_prev, params["hp_loss_scale"] * np.nan_to_num(np.minimum(hp - prev_hp, 0.0)), 0.0)
+    dens = np.nan_to_num(cols["density"].astype(np.float64))
+    r -= np.where(live & found, params["density_weight"] * dens, 0.0)
+    idle = live & found & prev_found & (speed < params["idle_speed_thr"])
+    r -= np.where(idle, params["idle_weight"], 0.0)
+    r -= np.where(live & ~found, params["idle_when_unknown_penalty"], 0.0)
+    r += np.where((sub >= 0) & cols["game_over"], GAME_OVER_REWARD, 0.0)
+
+    # Sum sub-steps into env steps (rows are already in time order).
+    rows = np.flatnonzero(sub >= 0)
+    key_ep, key_step = ep[rows], cols["step"][rows]
+    new = np.ones(rows.size, dtype=bool)
+    new[1:] = (key_ep[1:] != key_ep[:-1]) | (key_step[1:] != key_step[:-1])
+    starts = np.flatnonzero(new)
+    step_r = np.add.reduceat(r[rows], starts) if rows.size else np.zeros(0)
+    step_r = np.clip(step_r, -params["max_neg"], params["max_pos"])
+    return key_ep[starts], key_step[starts], step_r.astype(np.float32)
@@ -0,0 +1,354 @@
+"""Vectorized headless Vampire-Survivors-like surrogate for PPO pretraining.
+
+N arenas run in lockstep as NumPy arrays (player, enemies, XP gems). The
+action space is the same Discrete(9) mapping as VampireSurvivorsEnv, and
+observations are uint8 stacks of 84x84 frames that resemble what
+``preprocess`` makes of the real 1920x1080 screen: the camera follows the
+player (always centred), enemies are dark specks, gems bright ones, and the
+XP/HP bars sit at their configured ROIs. Rewards use the same config terms
+as the real env. It exposes the SB3 VecEnv interface, so
+
+    python sim_env.py --timesteps 2000000 --out vs_ppo_sim.zip
+
+pretrains PPO("CnnPolicy") offline, and ``train_fixed.py --init-model
+vs_ppo_sim.zip`` fine-tunes it on the real game.
+"""
+import argparse
+
+import numpy as np
+import yaml
+from gymnasium import spaces
+from stable_baselines3.common.vec_env.base_vec_env import VecEnv
+
+try:
+    import cv2  # type: ignore
+except Exception:  # pragma: no cover
+    cv2 = None
+
+from vs_env_fixed import ACTION_DIRS
+
+SCREEN_W, SCREEN_H = 1920, 1080
+
+
+class VampireSurvivorsSimVecEnv(VecEnv):
+    """``num_envs`` surrogate arenas stepped together (SB3 VecEnv)."""
+
+    def __init__(self, num_envs: int = 16, config_path: str = "config_fixed.yaml", overrides=None,
+                 max_enemies: int = 96, max_gems: int = 64, max_steps: int = 4000, seed: int = 0):
+        cfg = yaml.safe_load(open(config_path, "r", encoding="utf-8"))
+        for k, v in (overrides or {}).items():
+            cfg[k] = v
+        self.cfg = cfg
+        self.obs_w, self.obs_h = int(cfg["obs_width"]), int(cfg["obs_height"])
+        self.stack_n = int(cfg["frame_stack"])
+        self.channels_first = bool(cfg.get("obs_channels_first", False))
+        self.render_mode = None
+        shape = (self.stack_n, self.obs_h, self.obs_w) if self.channels_first else (self.obs_h, self.obs_w, self.stack_n)
+        super().__init__(num_envs, spaces.Box(0, 255, shape=shape, dtype=np.uint8), spaces.Discrete(9))
+
+        self.E, self.G = int(max_enemies), int(max_gems)
+        self.max_steps = int(max_steps)
+        self.rng = np.random.default_rng(seed)
+        self._actions = np.zeros(num_envs, dtype=np.int64)
+
+        # Game dynamics, in real-screen pixels per sub-step (one captured frame).
+        # Each env step runs action_repeat sub-steps, like VampireSurvivorsEnv.step.
+        self.repeat = int(cfg["action_repeat"])
+        self.player_speed = 9.0
+        self.enemy_speed = 4.0
+        self.contact_r = 40.0
+        self.attack_r = 150.0
+        self.kill_p = 0.15
+        self.pickup_r = 60.0
+        self.damage = 0.01
+        self.xp_per_gem = 0.02
+
+        # Reward terms mirror VampireSurvivorsEnv.step.
+        ep, ip, rc = cfg["enemy_penalty"], cfg["idle_penalty"], cfg.get("reward", {}) or {}
+        self.r_in, self.r_out = float(ep["ring_inner"]), float(ep["ring_outer"])
+        self.enemy_w = float(ep["density_weight"])
+        self.idle_w = float(ip["weight"])
+        self.xp_scale = float(cfg.get("_xp_scale", 2.0))
+        self.time_reward = float(rc.get("time_reward", 0.01))
+        self.hp_loss_scale = float(rc.get("hp_loss_scale", 5.0))
+        self.max_neg = float(rc.get("max_negative_per_step", 1.0))
+        self.max_pos = float(rc.get("max_positive_per_step", 1.0))
+        # Ring density is "dark pixel" share in the real env; scale enemy counts
+        # so a crowded ring lands in the same 0..~0.3 range.
+        self.ring_capacity = 40.0
+
+        self.sx, self.sy = self.obs_w / SCREEN_W, self.obs_h / SCREEN_H
+        self.bars = [self._bar_px(cfg["roi"]["xp_bar"]), self._bar_px(cfg["roi"]["hp_bar"])]
+        self.player_sprite = self._player_sprite(cfg["templates"].get("player"))
+
+        n = num_envs
+        self.pos = np.zeros((n, 2), dtype=np.float32)
+        self.hp = np.ones(n, dtype=np.float32)
+        self.xp = np.zeros(n, dtype=np.float32)
+        self.t = np.zeros(n, dtype=np.int64)
+        self.ep_return = np.zeros(n, dtype=np.float64)
+        self.enemies = np.zeros((n, self.E, 2), dtype=np.float32)
+        self.alive = np.zeros((n, self.E), dtype=bool)
+        self.gems = np.zeros((n, self.G, 2), dtype=np.float32)
+        self.gem_on = np.zeros((n, self.G), dtype=bool)
+        self.background = np.zeros(n, dtype=np.uint8)
+        self.stack = np.zeros((n, self.stack_n, self.obs_h, self.obs_w), dtype=np.uint8)
+        self._arange = np.arange(n)
+
+    # --- setup helpers ---
+
+    def _bar_px(self, roi):
+        x, y, w, h = roi
+        x1, y1 = int(x * self.sx), int(y * self.sy)
+        return x1, y1, max(x1 + 1, int((x + w) * self.sx)), max(y1 + 1, int((y + h) * self.sy))
+
+    def _player_sprite(self, path):
+        w = max(1, round(76 * self.sx))
+        h = max(1, round(76 * self.sy))
+        sprite = np.full((h, w), 200, dtype=np.uint8)
+        if path and cv2 is not None:
+            img = cv2.imread(str(path), cv2.IMREAD_GRAYSCALE)
+            if img is not None:
+                w = max(1, round(img.shape[1] * self.sx))
+                h = max(1, round(img.shape[0] * self.sy))
+                sprite = cv2.resize(img, (w, h), interpolation=cv2.INTER_AREA)
+        return sprite
+
+    def _reset_arenas(self, idx):
+        k = idx.size
+        if k == 0:
+            return
+        self.pos[idx] = 0.0
+        self.hp[idx] = 1.0
+        self.xp[idx] = 0.0
+        self.t[idx] = 0
+        self.ep_return[idx] = 0.0
+        self.alive[idx] = False
+        self.gem_on[idx] = False
+        self.background[idx] = self.rng.integers(45, 85, size=k)
+        frame = self._render(idx)
+        self.stack[idx] = frame[:, None]
+
+    # --- dynamics ---
+
+    def _spawn(self, live):
+        # Spawn rate (per env step) ramps up with survival time, just off screen.
+        rate = (0.15 + self.t / 1500.0) / self.repeat
+        spawn = live & (self.rng.random(self.num_envs) < np.minimum(rate, 1.0))
+        free = ~self.alive
+        slot = np.argmax(free, axis=1)
+        ok = spawn & free[self._arange, slot]
+        if not ok.any():
+            return
+        i = self._arange[ok]
+        ang = self.rng.uniform(0, 2 * np.pi, size=i.size)
+        dist = self.rng.uniform(0.55, 0.75, size=i.size) * SCREEN_W
+        self.enemies[i, slot[ok]] = self.pos[i] + np.stack([np.cos(ang), np.sin(ang)], 1) * dist[:, None]
+        self.alive[i, slot[ok]] = True
+
+    def _rel_enemies(self):
+        return self.enemies - self.pos[:, None, :]
+
+    def step_async(self, actions):
+        self._actions = np.asarray(actions, dtype=np.int64).reshape(self.num_envs)
+
+    def _substep(self, live, idle):
+        """Advance the ``live`` arenas by one frame and push it; returns (reward, died)."""
+        n = self.num_envs
+        prev_xp, prev_hp = self.xp.copy(), self.hp.copy()
+        self.pos += ACTION_DIRS[self._actions] * self.player_speed * live[:, None]
+        alive = self.alive & live[:, None]
+
+        # Enemies chase the player; touching ones deal damage.
+        rel = self._rel_enemies()
+        dist = np.linalg.norm(rel, axis=2) + 1e-6
+        self.enemies -= rel / dist[..., None] * self.enemy_speed * alive[..., None]
+        rel = self._rel_enemies()
+        dist = np.linalg.norm(rel, axis=2)
+        touching = alive & (dist < self.contact_r)
+        self.hp -= self.damage * touching.sum(axis=1)
+
+        # Auto-attack: nearby enemies die and drop a gem.
+        killed = alive & (dist < self.attack_r) & (self.rng.random((n, self.E)) < self.kill_p)
+        self.alive &= ~killed
+        alive &= ~killed
+        for i, e in zip(*np.nonzero(killed)):
+            free = np.flatnonzero(~self.gem_on[i])
+            if free.size:
+                self.gems[i, free[0]] = self.enemies[i, e]
+                self.gem_on[i, free[0]] = True
+
+        grel = self.gems - self.pos[:, None, :]
+        picked = self.gem_on & live[:, None] & (np.linalg.norm(grel, axis=2) < self.pickup_r)
+        self.gem_on &= ~picked
+        self.xp = (self.xp + self.xp_per_gem * picked.sum(axis=1)) % 1.0  # bar wraps on level-up
+        self._spawn(live)
+
+        # One sub-step of the real env's reward terms; the game-over frame earns only -25.
+        ring = alive & (dist >= self.r_in) & (dist <= self.r_out)
+        density = np.minimum(ring.sum(axis=1) / self.ring_capacity, 1.0)
+        dxp = np.where(self.xp >= prev_xp, self.xp - prev_xp, self.xp + 1.0 - prev_xp)
+        dhp = np.minimum(self.hp - prev_hp, 0.0)
+        reward = (self.time_reward + self.xp_scale * dxp + self.hp_loss_scale * dhp
+                  - self.enemy_w * density - self.idle_w * idle)
+        died = live & (self.hp <= 0.0)
+        reward = np.where(died, -25.0, np.where(live, reward, 0.0))
+
+        idx = np.flatnonzero(live)
+        self.stack[idx, :-1] = self.stack[idx, 1:]
+        self.stack[idx, -1] = self._render(idx)
+        return reward, died
+
+    def step_wait(self):
+        n = self.num_envs
+        idle = self._actions == 0
+        self.t += 1
+        reward = np.zeros(n, dtype=np.float64)
+        terminated = np.zeros(n, dtype=bool)
+        # An arena that dies stops there, as the real step breaks on game over.
+        for _ in range(self.repeat):
+            r, died = self._substep(~terminated, idle)
+            reward += r
+            terminated |= died
+
+        truncated = self.t >= self.max_steps
+        reward = np.clip(reward, -self.max_neg, self.max_pos).astype(np.float32)
+        self.ep_return += reward
+
+        dones = terminated | truncated
+        obs = self._obs()
+        infos = [{"steps": int(self.t[i]), "terminated": bool(terminated[i])} for i in range(n)]
+        for i in np.flatnonzero(dones):
+            infos[i]["terminal_observation"] = obs[i]
+            infos[i]["TimeLimit.truncated"] = bool(truncated[i] and not terminated[i])
+            infos[i]["episode"] = {"r": float(self.ep_return[i]), "l": int(self.t[i])}
+        if dones.any():
+            self._reset_arenas(np.flatnonzero(dones))
+            obs = self._obs()
+        return obs, reward, dones, infos
+
+    # --- rendering ---
+
+    def _render(self, idx) -> np.ndarray:
+        k = idx.size
+        frame = np.empty((k, self.obs_h, self.obs_w), dtype=np.uint8)
+        frame[:] = self.background[idx, None, None]
+        cx, cy = self.obs_w / 2.0, self.obs_h / 2.0
+
+        rel = self.enemies[idx] - self.pos[idx, None, :]
+        ex = np.rint(cx + rel[..., 0] * self.sx).astype(np.int64)
+        ey = np.rint(cy + rel[..., 1] * self.sy).astype(np.int64)
+        for dy in (0, 1):
+            vis = self.alive[idx] & (ex >= 0) & (ex < self.obs_w) & (ey + dy >= 0) & (ey + dy < self.obs_h)
+            a, e = np.nonzero(vis)
+            frame[a, ey[a, e] + dy, ex[a, e]] = 15
+
+        grel = self.gems[idx] - self.pos[idx, None, :]
+        gx = np.rint(cx + grel[..., 0] * self.sx).astype(np.int64)
+        gy = np.rint(cy + grel[..., 1] * self.sy).astype(np.int64)
+        vis = self.gem_on[idx] & (gx >= 0) & (gx < self.obs_w) & (gy >= 0) & (gy < self.obs_h)
+        a, g = np.nonzero(vis)
+        frame[a, gy[a, g], gx[a, g]] = 230
+
+        ph, pw = self.player_sprite.shape
+        x0, y0 = int(cx - pw / 2), int(cy - ph / 2)
+        frame[:, y0:y0 + ph, x0:x0 + pw] = self.player_sprite
+
+        for (x1, y1, x2, y2), level, fill in ((self.bars[0], self.xp[idx], 170), (self.bars[1], self.hp[idx], 90)):
+            cols = np.arange(x2 - x1)[None, :] < (level[:, None] * (x2 - x1))
+            frame[:, y1:y2, x1:x2] = np.where(cols[:, None, :], fill, 30).astype(np.uint8)
+        return frame
+
+    def _obs(self) -> np.ndarray:
+        if self.channels_first:
+            return self.stack.copy()
+        return np.ascontiguousarray(self.stack.transpose(0, 2, 3, 1))
+
+    # --- VecEnv plumbing ---
+
+    def reset(self):
+        for i, s in enumerate(self._seeds):
+            if s is not None and i == 0:
+                self.rng = np.random.default_rng(s)
+        self._reset_seeds()
+        self._reset_arenas(self._arange)
+        return self._obs()
+
+    def close(self):
+        pass
+
+    # Attributes and methods are shared by every arena, so they can only be
+    # set or called for all of them, and only once.
+
+    def _all_arenas(self, indices):
+        idx = list(self._get_indices(indices))
+        if sorted(idx) != list(range(self.num_envs)):
+            raise ValueError(f"{type(self).__name__} shares attributes across arenas; "
+                             f"got indices {idx}, expected all {self.num_envs}")
+        return idx
+
+    def get_attr(self, attr_name, indices=None):
+        return [getattr(self, attr_name) for _ in self._get_indices(indices)]
+
+    def set_attr(self, attr_name, value, indices=None):
+        self._all_arenas(indices)
+        setattr(self, attr_name, value)
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        idx = self._all_arenas(indices)
+        result = getattr(self, method_name)(*method_args, **method_kwargs)
+        return [result for _ in idx]
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False for _ in self._get_indices(indices)]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--config", default="config_fixed.yaml")
+    ap.add_argument("--num-envs", type=int, default=16)
+    ap.add_argument("--timesteps", type=int, default=2_000_000)
+    ap.add_argument("--out", default="vs_ppo_sim.zip")
+    ap.add_argument("--bench", action="store_true", help="only measure raw env steps/sec")
+    args = ap.parse_args()
+
+    env = VampireSurvivorsSimVecEnv(args.num_envs, args.config)
+    if args.bench:
+        import time
+        env.reset()
+        n = 500
+        t0 = time.perf_counter()
+        for _ in range(n):
+            env.step(np.random.randint(0, 9, size=args.num_envs))
+        dt = time.perf_counter() - t0
+        print(f"{n * args.num_envs / dt:.0f} env steps/s ({args.num_envs} arenas)")
+        return
+
+    from stable_baselines3 import PPO
+    from stable_baselines3.common.vec_env import VecMonitor, VecTransposeImage
+    from stable_baselines3.common.preprocessing import is_image_space_channels_first
+
+    venv = VecMonitor(env)
+    if not is_image_space_channels_first(venv.observation_space):
+        venv = VecTransposeImage(venv)
+    # Same hyperparameters as train_fixed.py so the weights transfer as-is.
+    model = PPO(
+        policy="CnnPolicy",
+        env=venv,
+        verbose=1,
+        n_steps=max(64, 2048 // args.num_envs),  # same 2048-sample rollouts as the real run
+        batch_size=64,
+        learning_rate=2.5e-4,
+        gamma=0.99,
+        gae_lambda=0.95,
+        clip_range=0.2,
+        tensorboard_log="./tb/",
+        seed=0,
+    )
+    model.learn(total_timesteps=args.timesteps)
+    model.save(args.out)
+    print(f"Saved: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
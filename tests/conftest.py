@@ -0,0 +1,49 @@
+import copy
+import sys
+from pathlib import Path
+
+import pytest
+
+# The modules live at the repo root (no package), so make them importable here once.
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+# Game-free env: synthetic frames, no key events sent, fast sub-steps.
+SYNTHETIC = {
+    "capture_source": "synthetic",
+    "synthetic": {"width": 960, "height": 540, "game_over_after": None, "seed": 0},
+    "input_backend": "recording",
+    "record": {"enabled": False},
+    "signal_log": {"enabled": False},
+    "fps": 1000,
+    "timing": {"mode": "sleep"},
+    "roi": {"xp_bar": [300, 10, 300, 12], "hp_bar": [420, 300, 100, 8]},
+}
+
+
+@pytest.fixture
+def in_repo(monkeypatch):
+    """Run from the repo root, where the configs' relative paths (templates/...) resolve."""
+    monkeypatch.chdir(ROOT)
+    return ROOT
+
+
+@pytest.fixture
+def make_env(in_repo):
+    """Factory for VampireSurvivorsEnv on SyntheticCapture (config_fixed.yaml + overrides).
+
+    Closes every env it built.
+    """
+    from vs_env_fixed import VampireSurvivorsEnv, merge_config
+
+    envs = []
+
+    def make(overrides=None):
+        cfg = merge_config(copy.deepcopy(SYNTHETIC), copy.deepcopy(overrides or {}))
+        env = VampireSurvivorsEnv(str(ROOT / "config_fixed.yaml"), overrides=cfg)
+        envs.append(env)
+        return env
+
+    yield make
+    for env in envs:
+        env.close()
@@ -0,0 +1,102 @@
+import cv2
+import numpy as np
+import pytest
+
+from reward import BarReader, make_bar_reader
+
+
+def _bar(fill, width=200, height=12, fg=200, bg=40, seed=0):
+    """Gray bar crop filled from the left to ``fill`` of its width, with pixel noise."""
+    rng = np.random.default_rng(seed)
+    bar = np.full((height, width), bg, dtype=np.int16)
+    bar[:, :int(round(fill * width))] = fg
+    bar += rng.integers(-6, 7, bar.shape, dtype=np.int16)
+    return np.clip(bar, 0, 255).astype(np.uint8)
+
+
+def test_reads_nan_until_calibrated():
+    r = BarReader(window=1)
+    assert not r.calibrated
+    assert np.isnan(r.measure(_bar(0.4)))
+    # A bar showing only one part cannot calibrate; readings stay NaN.
+    assert np.isnan(r.read(_bar(1.0)))
+    assert not r.calibrated
+
+
+@pytest.mark.parametrize("fill", [0.0, 0.1, 0.37, 0.5, 0.83, 1.0])
+def test_calibrated_level_matches_synthetic_bar(fill):
+    r = BarReader(levels=(200, 40), window=1)
+    assert r.measure(_bar(fill)) == pytest.approx(fill, abs=1.0 / 200)
+
+
+def test_calibrates_from_a_partial_bar_then_reads_other_fills():
+    r = BarReader(window=1)
+    assert r.read(_bar(0.6)) == pytest.approx(0.6, abs=0.01)
+    assert r.calibrated
+    fill, background = r.levels
+    assert fill > background  # the bright part is on the left, so it is the fill
+    assert r.read(_bar(0.25, seed=1)) == pytest.approx(0.25, abs=0.01)
+
+
+def test_smooth_is_a_running_median_and_skips_nan():
+    r = BarReader(levels=(200, 40), window=3)
+    assert r.smooth(0.5) == 0.5
+    assert r.smooth(0.9) == pytest.approx(0.7)
+    assert np.isnan(r.smooth(float("nan")))
+    assert r.smooth(0.52) == pytest.approx(0.52)
+    r.reset()
+    assert r.smooth(0.1) == 0.1
+
+
+def test_make_bar_reader_modes():
+    assert make_bar_reader({"mode": "otsu"}, "xp") is None
+    r = make_bar_reader({"mode": "calibrated", "xp": [200, 40]}, "xp")
+    assert r.calibrated and r.levels == (200.0, 40.0)
+    with pytest.raises(ValueError):
+        make_bar_reader({"mode": "nope"}, "xp")
+
+
+def test_one_part_bar_reads_from_its_single_level():
+    hp = BarReader(window=1, uniform="full")
+    assert hp.read(_bar(1.0)) == 1.0  # full HP at the start of a run
+    assert hp.calibrated and not hp.complete
+    assert hp.read(_bar(0.7, seed=1)) == pytest.approx(0.7, abs=0.01)
+    assert hp.complete  # the part-way bar taught it the background too
+    assert hp.read(_bar(0.4, seed=2)) == pytest.approx(0.4, abs=0.01)
+
+    xp = BarReader(window=1, uniform="empty")
+    assert xp.read(_bar(0.0)) == 0.0
+    assert xp.read(_bar(0.05, seed=3)) == pytest.approx(0.05, abs=0.01)
+
+
+def test_make_bar_reader_assumes_full_hp_and_empty_xp():
+    assert make_bar_reader({"mode": "calibrated"}, "hp").uniform == "full"
+    assert make_bar_reader({"mode": "calibrated"}, "xp").uniform == "empty"
+    assert make_bar_reader({"mode": "calibrated", "uniform": {"xp": None}}, "xp").uniform is None
+
+
+def _hud_frame(hp, xp=0.0, w=960, h=540):
+    frame = np.full((h, w, 3), 60, dtype=np.uint8)
+    hud = cv2.imread("templates/hud.png", cv2.IMREAD_COLOR)
+    frame[60:60 + hud.shape[0], 40:40 + hud.shape[1]] = hud
+    for (x, y, bw, bh), fill, colour in (((300, 10, 300, 12), xp, (220, 180, 40)),
+                                         ((420, 300, 100, 8), hp, (40, 40, 220))):
+        frame[y:y + bh, x:x + bw] = 30
+        frame[y:y + bh, x:x + int(round(fill * bw))] = colour
+    return frame
+
+
+def test_env_penalizes_the_first_hp_loss(tmp_path, make_env):
+    # Start of a run: XP empty, HP full; HP drops on the second sub-step of step 1.
+    for i, hp in enumerate([1.0, 1.0, 0.8, 0.8, 0.8]):
+        cv2.imwrite(str(tmp_path / f"{i:03d}.png"), _hud_frame(hp))
+    env = make_env({
+        "capture_source": "file", "capture_file": str(tmp_path), "capture_file_loop": False,
+        "bar_reader": {"mode": "calibrated", "window": 1, "xp": None, "hp": None},
+        "reward": {"time_reward": 0.0, "hp_loss_scale": 1.0},
+        "idle_penalty": {"weight": 0.0}, "enemy_penalty": {"density_weight": 0.0},
+    })
+    env.reset()
+    assert env.prev_hp == 1.0 and env.prev_xp == 0.0
+    _, reward, _, _, _ = env.step(0)
+    assert reward == pytest.approx(-0.2, abs=0.01)
@@ -0,0 +1,44 @@
+import json
+import sys
+
+import numpy as np
+import pytest
+
+import bench
+from frame_context import FrameContext
+
+
+def test_summarize_reports_percentiles_against_the_budget():
+    s = bench.summarize([i / 1000.0 for i in range(1, 101)], budget_ms=50.0)  # 1..100 ms
+    assert s["n"] == 100
+    assert s["mean_ms"] == pytest.approx(50.5)
+    assert (s["p50_ms"], s["p95_ms"], s["p99_ms"]) == pytest.approx((50.5, 95.05, 99.01))
+    assert s["p99_budget_frac"] == pytest.approx(99.01 / 50.0)
+
+
+def test_time_stage_hands_out_a_fresh_context_per_call():
+    frames = [np.full((8, 8, 3), v, dtype=np.uint8) for v in (10, 20)]
+    seen = []
+    samples = bench.time_stage(seen.append, frames, iters=5, warmup=1)
+    assert len(samples) == 5 and len(seen) == 6
+    assert all(isinstance(c, FrameContext) for c in seen)
+    assert len({id(c) for c in seen}) == 6  # nothing cached from earlier calls
+    assert [int(c.gray[0, 0]) for c in seen] == [10, 10, 20, 10, 20, 10]
+
+
+def test_main_writes_json_and_compares(tmp_path, in_repo, monkeypatch, capsys):
+    out = tmp_path / "bench.json"
+    monkeypatch.setattr(sys, "argv", ["bench.py", "--iters", "4", "--frames", "2", "--out", str(out)])
+    bench.main()
+    result = json.loads(out.read_text())
+    assert result["meta"]["iters"] == 4 and result["meta"]["substep_budget_ms"] > 0
+    for name in ("preprocess", "game_over_score", "player_locate_tracked", "player_locate_fullframe",
+                 "bar_fill_ratio", "enemy_density_ring", "input_hold_threaded", "env_step"):
+        assert result["stages"][name]["n"] > 0
+    assert result["stages"]["preprocess"]["n"] == 4
+
+    monkeypatch.setattr(sys, "argv", ["bench.py", "--iters", "4", "--frames", "2", "--no-env",
+                                      "--out", str(tmp_path / "new.json"), "--compare", str(out)])
+    bench.main()
+    assert "p50 / p99 vs" in capsys.readouterr().out
+    assert "env_step" not in json.loads((tmp_path / "new.json").read_text())["stages"]
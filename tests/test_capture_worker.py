@@ -0,0 +1,73 @@
+import time
+
+import numpy as np
+import pytest
+
+from capture_fixed import SyntheticCapture
+from capture_worker import CaptureWorker
+
+
+class CountingSource:
+    """Every grab is a frame filled with its own grab count."""
+
+    origin = (5, 7)
+
+    def __init__(self):
+        self.n = 0
+
+    def grab(self):
+        frame = np.full((8, 8, 3), self.n % 256, dtype=np.uint8)
+        self.n += 1
+        return frame
+
+
+def test_latest_is_the_newest_frame_and_counts_missed():
+    w = CaptureWorker(CountingSource, fps=200, buffer_size=4).start()
+    try:
+        assert w.origin == (5, 7)
+        a = w.latest()
+        assert a.missed == 0
+        time.sleep(0.1)  # ~20 capture periods
+        b = w.latest()
+        assert b.seq > a.seq + 4
+        assert b.missed == b.seq - a.seq - 1
+        assert b.timestamp > a.timestamp
+        assert (b.frame == b.seq % 256).all()
+    finally:
+        w.stop()
+
+
+def test_kept_frames_are_not_overwritten():
+    w = CaptureWorker(CountingSource, fps=200, buffer_size=2).start()
+    try:
+        kept = w.latest()
+        value = int(kept.frame[0, 0, 0])
+        time.sleep(0.05)  # the ring wraps many times
+        assert w.latest().seq > kept.seq + 2
+        assert (kept.frame == value).all()
+        assert not np.shares_memory(kept.frame, w._buf)
+    finally:
+        w.stop()
+
+
+def test_synthetic_source_on_a_background_thread(in_repo):
+    templates = {"hud": "templates/hud.png", "player": "templates/player.png"}
+    w = CaptureWorker(lambda: SyntheticCapture(templates, width=320, height=180), fps=100).start()
+    try:
+        first = w.latest()
+        assert first.frame.shape == (180, 320, 3)
+        time.sleep(0.1)
+        nxt = w.latest()
+        assert nxt.seq > first.seq
+        assert nxt.missed == nxt.seq - first.seq - 1
+        assert not np.array_equal(nxt.frame, first.frame)  # the scene moves every grab
+    finally:
+        w.stop()
+
+
+def test_start_reports_source_errors():
+    def broken():
+        raise OSError("no display")
+
+    with pytest.raises(RuntimeError):
+        CaptureWorker(broken, fps=30).start()
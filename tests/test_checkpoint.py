@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+from stable_baselines3 import PPO
+
+import checkpoint
+from callbacks import PeriodicCheckpointCallback
+from checkpoint import CheckpointWriter, latest_checkpoint, rng_state, set_rng_state
+from curriculum import phase_at, remaining_phases
+from sim_env import VampireSurvivorsSimVecEnv
+
+PHASES = [(1, 128), (2, 256), (3, 512)]
+
+
+@pytest.fixture
+def model(in_repo):
+    env = VampireSurvivorsSimVecEnv(num_envs=2, max_steps=200)
+    m = PPO("CnnPolicy", env, n_steps=16, batch_size=32, n_epochs=1, seed=0, device="cpu")
+    yield m
+    env.close()
+
+
+def test_rotation_keeps_the_newest_and_resume_continues_mid_phase(tmp_path, model):
+    writer = CheckpointWriter(str(tmp_path), keep=2)
+    # 2 envs x 16 steps per rollout; a checkpoint every 32 global steps.
+    model.learn(total_timesteps=160, callback=PeriodicCheckpointCallback(writer, 32, PHASES))
+    writer.close()
+    assert writer.error is None and writer.written >= 2
+    kept = sorted(p.name for p in tmp_path.glob("ckpt_*.zip"))
+    assert len(kept) == 2 and len(list(tmp_path.glob("ckpt_*.state.pt"))) == 2
+
+    path, state = latest_checkpoint(str(tmp_path))
+    assert path.name == kept[-1]
+    t = state["num_timesteps"]
+    assert 128 < t <= model.num_timesteps
+    assert state["phase"] == phase_at(PHASES, t) == 2
+
+    resumed = PPO.load(path, env=model.get_env(), device="cpu")
+    assert resumed.num_timesteps == t
+    # Phase 1 is done; phase 2 runs only its remainder, then all of phase 3.
+    assert remaining_phases(PHASES, t) == [(2, 384 - t), (3, 512)]
+
+
+def test_latest_checkpoint_skips_zips_without_a_sidecar(tmp_path, model):
+    writer = CheckpointWriter(str(tmp_path), keep=3)
+    writer.submit(model, phase=1)
+    writer.close()
+    (tmp_path / "ckpt_9999999999.zip").write_bytes(b"half-written")
+    path, state = latest_checkpoint(str(tmp_path))
+    assert path.name == f"ckpt_{model.num_timesteps:010d}.zip" and state["phase"] == 1
+    assert latest_checkpoint(str(tmp_path / "empty")) == (None, None)
+
+
+def test_fixed_path_and_rotating_checkpoint_share_one_snapshot(tmp_path, model, monkeypatch):
+    calls = []
+    real = checkpoint.snapshot_model
+    monkeypatch.setattr(checkpoint, "snapshot_model", lambda m: calls.append(1) or real(m))
+    writer = CheckpointWriter(str(tmp_path / "ckpt"), keep=3)
+    writer.submit(model, phase=2, path=str(tmp_path / "models" / "quit.zip"), rotate=True)
+    writer.submit(model, phase=2, path=str(tmp_path / "phase2.zip"))
+    writer.close()
+    assert len(calls) == 2 and writer.written == 3
+    assert (tmp_path / "models" / "quit.zip").exists() and (tmp_path / "models" / "quit.state.pt").exists()
+    assert (tmp_path / "phase2.zip").exists()
+    assert len(list((tmp_path / "ckpt").glob("ckpt_*.zip"))) == 1  # only the rotate=True submit
+
+
+def test_rng_state_round_trip():
+    state = rng_state()
+    a = np.random.rand(3)
+    set_rng_state(state)
+    np.testing.assert_array_equal(np.random.rand(3), a)
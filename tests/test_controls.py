@@ -0,0 +1,60 @@
+import time
+
+from controls import InputDispatcher, KeyController, RecordingInput
+
+ACTIONS = [(), ("w",), ("s",), ("a",), ("d",), ("w", "a"), ("w", "d"), ("s", "a"), ("s", "d")]
+
+
+def _wait_busy(d, timeout=1.0):
+    end = time.monotonic() + timeout
+    while not d._busy and time.monotonic() < end:
+        time.sleep(0.001)
+    assert d._busy
+
+
+def test_requests_while_busy_are_coalesced_into_the_newest():
+    rec = RecordingInput(delay=0.05)
+    d = InputDispatcher(rec, ACTIONS)
+    try:
+        d.submit(1)
+        _wait_busy(d)
+        for a in (2, 3, 4, 5, 6, 7, 8):
+            d.submit(a)
+        assert d.flush(2.0)
+        st = d.stats()
+        assert (st["submitted"], st["sent"], st["coalesced"]) == (8, 2, 6)
+        # Only w (action 1), then the single 1 -> 8 transition: up w, down s and d.
+        assert [(e, k) for _, e, k in rec.events] == [("down", "w"), ("up", "w"), ("down", "s"), ("down", "d")]
+    finally:
+        d.stop()
+
+
+def test_held_keys_match_the_last_submit():
+    rec = RecordingInput()
+    d = InputDispatcher(rec, ACTIONS)
+    try:
+        for a in (5, 2, 0, 7, 6):
+            d.submit(a)
+        assert d.flush()
+        assert rec.held == {"w", "d"} and d.held == frozenset(("w", "d")) and d.current == 6
+        # A raw key set that is not an action, then back to an action.
+        d.submit_keys({"a", "d", "space"})
+        assert d.flush()
+        assert rec.held == {"a", "d", "space"} and d.current is None
+        d.submit(2)
+        assert d.flush()
+        assert rec.held == {"s"} and d.current == 2
+    finally:
+        d.stop()
+
+
+def test_threaded_key_controller_release_all():
+    kc = KeyController(backend="recording", threaded=True)
+    try:
+        kc.hold_action(8)
+        kc.hold(("w", "a"))
+        kc.release_all()
+        assert kc.input.held == set()
+        assert kc.dispatcher.current == 0
+    finally:
+        kc.close()
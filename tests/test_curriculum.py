@@ -0,0 +1,49 @@
+import pytest
+
+from callbacks import CurriculumCallback
+from curriculum import PHASE_PARAMS, blend_params, curriculum_params, phase_at, remaining_phases
+
+PHASES = [(1, 1000), (2, 2000), (3, 3000)]
+
+
+def test_params_at_phase_boundaries_without_blending():
+    cb = CurriculumCallback(PHASES)
+    assert cb.params_at(0) == PHASE_PARAMS[1]
+    assert cb.params_at(999) == PHASE_PARAMS[1]
+    assert cb.params_at(1000) == PHASE_PARAMS[2]
+    assert cb.params_at(2999) == PHASE_PARAMS[2]
+    assert cb.params_at(3000) == PHASE_PARAMS[3]
+    assert cb.params_at(10_000) == PHASE_PARAMS[3]  # past the schedule: the last phase
+
+
+def test_params_at_ramps_into_the_next_phase():
+    cb = CurriculumCallback(PHASES, blend_steps=200)
+    assert cb.params_at(799) == PHASE_PARAMS[1]  # ramp starts blend_steps before the boundary
+    assert cb.params_at(800) == pytest.approx(PHASE_PARAMS[1])
+    assert cb.params_at(900) == pytest.approx(blend_params(PHASE_PARAMS[1], PHASE_PARAMS[2], 0.5))
+    assert cb.params_at(950)["density_weight"] == pytest.approx(0.25 * 0.40 + 0.75 * 0.25)
+    assert cb.params_at(1000) == PHASE_PARAMS[2]  # and reaches it at the boundary
+    assert cb.params_at(2900) == pytest.approx(blend_params(PHASE_PARAMS[2], PHASE_PARAMS[3], 0.5))
+    assert cb.params_at(5900) == PHASE_PARAMS[3]  # no ramp after the last phase
+
+
+def test_curriculum_params_and_blend():
+    assert curriculum_params(7) == PHASE_PARAMS[3]
+    p = curriculum_params(1)
+    p["xp_scale"] = 0.0
+    assert PHASE_PARAMS[1]["xp_scale"] == 1.2  # a copy
+    assert blend_params({"a": 1.0}, {"a": 3.0}, 2.0) == {"a": 3.0}  # frac clipped to [0, 1]
+
+
+def test_remaining_phases_and_phase_at():
+    assert remaining_phases(PHASES, 0) == PHASES
+    assert remaining_phases(PHASES, 1500) == [(2, 1500), (3, 3000)]
+    assert remaining_phases(PHASES, 6000) == []
+    assert [phase_at(PHASES, t) for t in (0, 999, 1000, 5999, 6000)] == [1, 1, 2, 3, 3]
+
+
+def test_weights_reach_the_env(make_env):
+    env = make_env()
+    env.set_reward_params(**CurriculumCallback(PHASES, blend_steps=200).params_at(900))
+    assert env.enemy_w == pytest.approx(0.325) and env.idle_w == pytest.approx(0.045)
+    assert env.get_reward_params()["xp_scale"] == pytest.approx(1.6)
@@ -0,0 +1,75 @@
+import sys
+
+import gymnasium as gym
+import numpy as np
+import pytest
+import torch as th
+from gymnasium import spaces
+from stable_baselines3 import PPO
+from stable_baselines3.common.buffers import RolloutBuffer
+from stable_baselines3.common.vec_env import DummyVecEnv, VecFrameStack
+
+from frame_buffer import DedupRolloutBuffer
+
+
+class NoiseEnv(gym.Env):
+    """Single 36x36 uint8 frames; VecFrameStack turns them into stacks."""
+
+    observation_space = spaces.Box(0, 255, (36, 36, 1), dtype=np.uint8)
+    action_space = spaces.Discrete(3)
+
+    def reset(self, seed=None, options=None):
+        super().reset(seed=seed)
+        self.t = 0
+        return self.np_random.integers(0, 256, (36, 36, 1), dtype=np.uint8), {}
+
+    def step(self, action):
+        self.t += 1
+        obs = self.np_random.integers(0, 256, (36, 36, 1), dtype=np.uint8)
+        return obs, float(action == 1), self.t >= 20, False, {}
+
+
+def _learn(n_envs=2):
+    env = VecFrameStack(DummyVecEnv([NoiseEnv] * n_envs), n_stack=4)
+    model = PPO("CnnPolicy", env, n_steps=32, batch_size=16, n_epochs=1, device="cpu",
+                rollout_buffer_class=DedupRolloutBuffer, rollout_buffer_kwargs={"frames_per_step": 1.0})
+    model.learn(64)
+    return model
+
+
+def test_ppo_learns_with_dedup_rollout_buffer():
+    model = _learn()
+    assert model.rollout_buffer.observations.dtype == np.int64
+    assert model.num_timesteps >= 64
+
+
+def test_float_observation_allocation_is_replaced(monkeypatch):
+    # stable-baselines3 2.3.x allocates rollout observations as float32 whatever the space dtype.
+    original = RolloutBuffer.reset
+
+    def float_reset(self):
+        original(self)
+        self.observations = self.observations.astype(np.float32)
+
+    monkeypatch.setattr(RolloutBuffer, "reset", float_reset)
+    model = _learn()
+    assert model.rollout_buffer.observations.dtype == np.int64
+
+
+def test_samples_match_stored_stacks():
+    env = VecFrameStack(DummyVecEnv([NoiseEnv]), n_stack=4)
+    buf = DedupRolloutBuffer(8, spaces.Box(0, 255, (36, 36, 4), dtype=np.uint8), env.action_space,
+                             device="cpu", n_envs=1, frames_per_step=1.0)
+    obs = env.reset()
+    seen = []
+    for _ in range(8):
+        seen.append(obs[0].copy())
+        buf.add(obs, np.zeros((1, 1)), np.zeros(1), np.zeros(1, dtype=bool), th.zeros(1), th.zeros(1))
+        obs, *_ = env.step(np.zeros(1, dtype=int))
+    # Before get() flattens the buffer, samples keep the env axis.
+    samples = buf._get_samples(np.arange(8))
+    assert np.array_equal(samples.observations.numpy()[:, 0], np.stack(seen))
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,58 @@
+import cv2
+import numpy as np
+
+import frame_context
+from frame_context import FrameContext, as_context, to_gray
+
+
+def _frame(h=120, w=160, seed=0):
+    return np.random.default_rng(seed).integers(0, 256, (h, w, 3), dtype=np.uint8)
+
+
+def test_gray_is_converted_once(monkeypatch):
+    calls = []
+    real = frame_context.to_gray
+    monkeypatch.setattr(frame_context, "to_gray", lambda img: calls.append(img.shape) or real(img))
+    ctx = FrameContext(_frame())
+    g = ctx.gray
+    assert ctx.gray is g and ctx.pyramid(0) is g
+    ctx.gray_crop((10, 10, 30, 5))  # served from the cached full-frame gray
+    assert calls == [(120, 160, 3)]
+    np.testing.assert_array_equal(g, cv2.cvtColor(ctx.frame, cv2.COLOR_BGR2GRAY))
+
+
+def test_seeded_gray_is_used_as_is():
+    gray = np.zeros((120, 160), dtype=np.uint8)
+    ctx = FrameContext(_frame(), gray=gray)
+    assert ctx.gray is gray
+    assert (ctx.gray_crop((0, 0, 20, 4)) == 0).all()
+
+
+def test_crops_use_monitor_coordinates_and_cache():
+    frame = _frame()
+    ctx = FrameContext(frame, origin=(100, 50))
+    roi = (110, 60, 40, 8)  # frame pixels (10, 10)..(50, 18)
+    np.testing.assert_array_equal(ctx.crop(roi), frame[10:18, 10:50])
+    crop = ctx.gray_crop(roi)
+    np.testing.assert_array_equal(crop, to_gray(frame[10:18, 10:50]))
+    assert ctx.gray_crop(roi) is crop
+
+
+def test_separately_captured_regions_win_over_the_frame():
+    strip = np.full((6, 30, 4), 77, dtype=np.uint8)  # BGRA, as MonitorCapture returns
+    ctx = FrameContext(_frame(), regions={(0, 900, 30, 6): strip})
+    assert ctx.crop((0, 900, 30, 6)) is strip
+    assert ctx.gray_crop((0, 900, 30, 6)).shape == (6, 30)
+
+
+def test_pyramid_levels_halve_the_size():
+    ctx = FrameContext(_frame())
+    assert ctx.pyramid(1).shape == (60, 80)
+    assert ctx.pyramid(2).shape == (30, 40)
+    assert ctx.pyramid(2) is ctx.pyramid(2)
+
+
+def test_as_context_passes_contexts_through():
+    ctx = FrameContext(_frame())
+    assert as_context(ctx) is ctx
+    assert as_context(ctx.frame).frame is ctx.frame
@@ -0,0 +1,45 @@
+import numpy as np
+
+from capture_fixed import FrameStacker
+
+
+def _img(v, h=6, w=5):
+    return np.full((h, w), v, dtype=np.uint8)
+
+
+def test_first_push_fills_the_stack():
+    fs = FrameStacker(4, 5, 6)
+    fs.push_processed(_img(7))
+    assert len(fs) == 4
+    assert fs.observation().shape == (6, 5, 4)
+    assert (fs.observation() == 7).all()
+
+
+def test_stack_order_after_wraparound():
+    fs = FrameStacker(3, 5, 6, channels_first=True)
+    for v in range(1, 9):  # wraps the 3-slot ring more than twice
+        fs.push_processed(_img(v))
+        obs = fs.observation()
+        want = [max(1, v - 2), max(1, v - 1), v]  # oldest to newest
+        assert obs.shape == fs.shape == (3, 6, 5)
+        assert [int(obs[i, 0, 0]) for i in range(3)] == want
+
+
+def test_channels_last_order_and_independent_copies():
+    fs = FrameStacker(4, 5, 6)
+    for v in (10, 20, 30, 40, 50, 60):
+        fs.push_processed(_img(v))
+    obs = fs.observation()
+    assert obs[0, 0].tolist() == [30, 40, 50, 60]
+    fs.push_processed(_img(70))
+    assert obs[0, 0].tolist() == [30, 40, 50, 60]  # earlier observation is not a view
+
+
+def test_clear_restarts_with_the_next_frame():
+    fs = FrameStacker(3, 5, 6)
+    for v in (1, 2, 3, 4):
+        fs.push_processed(_img(v))
+    fs.clear()
+    assert len(fs) == 0
+    fs.push_processed(_img(9))
+    assert fs.observation()[0, 0].tolist() == [9, 9, 9]
@@ -0,0 +1,51 @@
+import pytest
+from stable_baselines3 import PPO
+from stable_baselines3.common.vec_env import DummyVecEnv
+
+from callbacks import GamePauseCallback
+
+NO_SETTLE = {"auto_pause": {"enabled": True, "key": "esc", "settle_seconds": 0.0}}
+
+
+def _taps(env, key="esc"):
+    return [e for _, e, k in env.controller.input.events if k == key]
+
+
+def test_pause_releases_keys_and_taps_the_pause_key_once(make_env):
+    env = make_env({**NO_SETTLE, "timing": {"mode": "deadline"}})
+    env.reset()
+    env.step(6)
+    if env.controller.dispatcher is not None:
+        env.controller.dispatcher.flush()
+    assert env.controller.input.held == {"w", "d"}
+    env.pause_game()
+    env.pause_game()  # already paused: no second tap
+    assert env.game_paused and env.controller.input.held == set()
+    assert _taps(env) == ["down", "up"]
+
+    env.scheduler.wait()
+    env.resume_game()
+    env.resume_game()
+    assert not env.game_paused and _taps(env) == ["down", "up"] * 2
+    assert env.scheduler.ticks == 0  # pacing restarts from the resume
+
+
+def test_callback_pauses_exactly_around_each_update(make_env):
+    env = make_env(NO_SETTLE)
+    states = []
+    real_train = PPO.train
+
+    def train(self):
+        states.append(env.game_paused)  # the game must be frozen while gradients run
+        real_train(self)
+
+    vec = DummyVecEnv([lambda: env])
+    model = PPO("CnnPolicy", vec, n_steps=8, batch_size=8, n_epochs=1, seed=0, device="cpu")
+    model.train = train.__get__(model)
+    cb = GamePauseCallback()
+    model.learn(total_timesteps=16, callback=cb)
+
+    assert states == [True, True]
+    assert not env.game_paused  # resumed when training ended
+    assert len(cb.pause_seconds) == 2 and all(s >= 0.0 for s in cb.pause_seconds)
+    assert _taps(env) == ["down", "up"] * 4
@@ -0,0 +1,61 @@
+import cv2
+import numpy as np
+import pytest
+
+from capture_fixed import SyntheticCapture
+from frame_context import FrameContext
+from reward import PyramidTemplateMatcher, TemplateMatcher, make_matcher
+
+TEMPLATES = {"hud": "templates/hud.png", "player": "templates/player.png",
+             "game_over": "templates/game_over.png"}
+
+
+@pytest.fixture
+def frames(in_repo):
+    cap = SyntheticCapture(TEMPLATES, width=960, height=540, bars=[(300, 10, 300, 12)], game_over_after=2, seed=1)
+    return [cap.grab() for _ in range(4)]  # game-over screen from the third frame on
+
+
+@pytest.mark.parametrize("level", [1, 2])
+@pytest.mark.parametrize("name", ["game_over", "hud", "player"])
+def test_pyramid_agrees_with_full_matching(frames, name, level):
+    full = TemplateMatcher(TEMPLATES[name])
+    pyr = PyramidTemplateMatcher(TEMPLATES[name], level=level)
+    for frame in frames:
+        ctx = FrameContext(frame)
+        a, b = full.score(ctx), pyr.score(ctx)
+        if a >= pyr.coarse_reject:
+            assert b == pytest.approx(a, abs=1e-6)  # refined at full resolution, same peak
+        assert pyr.matches(ctx) == full.matches(ctx)
+    assert [full.matches(f) for f in frames] == ([False, False, True, True] if name == "game_over" else [True] * 4)
+
+
+@pytest.mark.parametrize("x, y", [(0, 0), (37, 101), (211, 58), (453, 465), (131, 3)])
+def test_pyramid_finds_templates_off_the_coarse_grid(in_repo, x, y):
+    # Positions that are not multiples of 2**level, on a noisy background, so the peak is below 1.0.
+    tpl = cv2.imread(TEMPLATES["game_over"], cv2.IMREAD_COLOR)
+    rng = np.random.default_rng(x * 1000 + y)
+    frame = rng.integers(40, 90, (540, 960, 3), dtype=np.uint8)
+    frame[y:y + tpl.shape[0], x:x + tpl.shape[1]] = tpl
+    frame = np.clip(frame + rng.normal(0, 6, frame.shape), 0, 255).astype(np.uint8)
+    full = TemplateMatcher(TEMPLATES["game_over"])
+    pyr = PyramidTemplateMatcher(TEMPLATES["game_over"], level=2)
+    a = full.score(frame)
+    assert 0.9 < a < 1.0
+    assert pyr.score(frame) == pytest.approx(a, abs=1e-6)
+    # Limited to a region around it (monitor coordinates, with a capture origin).
+    region = PyramidTemplateMatcher(TEMPLATES["game_over"], level=2, region=(100 + x - 20, 50 + y - 20, 560, 120))
+    assert region.score(FrameContext(frame, origin=(100, 50))) == pytest.approx(a, abs=1e-6)
+
+
+def test_flat_frames_are_rejected_before_matching(in_repo):
+    pyr = PyramidTemplateMatcher(TEMPLATES["game_over"], min_std=2.0)
+    assert pyr.score(np.full((540, 960, 3), 60, dtype=np.uint8)) == 0.0
+
+
+def test_make_matcher_modes(in_repo):
+    assert type(make_matcher(TEMPLATES["hud"], 0.8)) is TemplateMatcher
+    m = make_matcher(TEMPLATES["hud"], 0.8, {"mode": "pyramid", "level": 1, "region": [0, 0, 300, 200]})
+    assert isinstance(m, PyramidTemplateMatcher) and (m.level, m.region, m.thresh) == (1, (0, 0, 300, 200), 0.8)
+    with pytest.raises(ValueError):
+        make_matcher(TEMPLATES["hud"], 0.8, {"mode": "nope"})
@@ -0,0 +1,94 @@
+import types
+
+import numpy as np
+import pytest
+from stable_baselines3.common.vec_env import DummyVecEnv
+
+from callbacks import MetricsCallback
+from metrics import NULL_METRICS, Histogram, Metrics, merge_snapshots
+
+
+def test_histogram_quantiles_within_bin_resolution():
+    h = Histogram()
+    samples = np.random.default_rng(0).lognormal(np.log(5.0), 0.8, 5000)  # ms
+    for v in samples:
+        h.add(float(v))
+    assert h.n == 5000 and h.mean == pytest.approx(samples.mean())
+    assert h.max == pytest.approx(samples.max())
+    for q in (0.5, 0.95, 0.99):
+        assert h.quantile(q) == pytest.approx(np.quantile(samples, q), rel=0.12)
+    assert h.quantile(1.0) <= h.max
+
+
+def test_histogram_under_overflow_and_merge():
+    a, b = Histogram(lo=1.0, hi=100.0, bins=10), Histogram(lo=1.0, hi=100.0, bins=10)
+    a.add(0.5)      # underflow bin
+    b.add(5000.0)   # overflow bin
+    assert a.counts[0] == 1 and b.counts[-1] == 1
+    a.merge(b)
+    assert (a.n, a.max, a.total) == (2, 5000.0, 5000.5)
+    # Out-of-range samples report the range ends; max keeps the exact value.
+    assert a.quantile(0.5) == pytest.approx(1.0) and a.quantile(1.0) == pytest.approx(100.0)
+    assert Histogram().quantile(0.5) == 0.0
+
+
+def test_metrics_timers_counters_and_snapshot():
+    m = Metrics()
+    with m.timer("capture_ms"):
+        pass
+    m.observe("capture_ms", 3.0)
+    m.count("steps")
+    m.count("steps", 2)
+    snap = m.snapshot()
+    assert snap["hists"]["capture_ms"].n == 2 and snap["counts"] == {"steps": 3}
+    assert snap["seconds"] >= 0.0
+    assert m.snapshot()["counts"] == {}  # drained
+
+    with NULL_METRICS.timer("x"):
+        NULL_METRICS.count("y")
+    assert NULL_METRICS.snapshot() is None and not NULL_METRICS.hists
+
+
+def test_merge_snapshots_skips_disabled_envs():
+    a, b = Metrics(), Metrics()
+    a.observe("step_ms", 10.0)
+    b.observe("step_ms", 20.0)
+    b.observe("reward_ms", 1.0)
+    a.count("steps", 4)
+    b.count("steps", 6)
+    snap = merge_snapshots([a.snapshot(), None, b.snapshot()])
+    assert snap["hists"]["step_ms"].n == 2 and snap["hists"]["reward_ms"].n == 1
+    assert snap["counts"] == {"steps": 10}
+    assert merge_snapshots([None]) == {"hists": {}, "counts": {}, "seconds": 0.0}
+
+
+class Logger:
+    def __init__(self):
+        self.values = {}
+
+    def record(self, key, value, exclude=None):
+        self.values[key] = value
+
+
+def test_env_stages_reach_the_callback(make_env):
+    env = make_env({"instrumentation": {"enabled": True}})
+    vec = DummyVecEnv([lambda: env])
+    vec.reset()
+    for a in range(5):
+        vec.step(np.array([a]))
+    logger = Logger()
+    cb = MetricsCallback(histograms=True)
+    cb.init_callback(types.SimpleNamespace(get_env=lambda: vec, logger=logger))
+    cb.on_rollout_end()
+
+    v = logger.values
+    for stage in ("capture_ms", "preprocess_ms", "match_game_over_ms", "player_ms", "reward_ms", "step_ms"):
+        assert v[f"perf/{stage}/p50"] > 0.0 and v[f"perf/{stage}/max"] >= v[f"perf/{stage}/p95"]
+    assert v["perf/steps"] == 5
+    assert v["perf/step_rate_hz"] > 0.0
+    assert 0.0 <= v["perf/player_found_rate"] <= 1.0
+    assert v["perf_hist/step_ms"].numel() == 5
+    # Drained: the next rollout only reports what happened since.
+    logger.values.clear()
+    cb.on_rollout_end()
+    assert "perf/steps" not in logger.values
@@ -0,0 +1,47 @@
+import queue
+import sys
+
+import pytest
+
+from pipeline import Analysis, VisionPipeline
+
+
+def _analysis(seq, missed=0):
+    return Analysis(seq, 0.0, missed, None, False, False, 0.5, 0.5, None, None, 0.0, None)
+
+
+def _pipeline(last_seq, items):
+    p = VisionPipeline({}, workers=2)
+    p._result_q = queue.Queue()
+    p._last_seq = last_seq
+    for item in items:
+        p._result_q.put(item)
+    return p
+
+
+def test_latest_keeps_newest_seq_when_results_arrive_out_of_order():
+    p = _pipeline(9, [_analysis(11), _analysis(10)])
+    a = p.latest()
+    assert a.seq == 11
+    assert a.missed == 1  # frame 10 was superseded
+    # The older frame that arrived late is never served afterwards.
+    p._result_q.put(_analysis(12))
+    assert p.latest().seq == 12
+
+
+def test_latest_counts_stale_and_upstream_drops():
+    p = _pipeline(10, [_analysis(9), _analysis(13, missed=2), _analysis(12), _analysis(11)])
+    a = p.latest()
+    assert a.seq == 13
+    # 9 is stale, 12 and 11 are superseded, and capture dropped 2 frames before 13.
+    assert a.missed == 5
+
+
+def test_latest_raises_worker_errors():
+    p = _pipeline(0, ["Traceback: boom"])
+    with pytest.raises(RuntimeError):
+        p.latest()
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
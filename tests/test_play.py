@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+from stable_baselines3 import PPO
+
+import play
+from play import PolicyRuntime, check_agreement, evaluate, export_policy
+from sim_env import VampireSurvivorsSimVecEnv
+
+
+@pytest.fixture(params=[False, True], ids=["channels_last", "channels_first"])
+def model(request, in_repo):
+    # Channels-last observations get a VecTransposeImage inside PPO, so the exported
+    # actor has to permute them itself.
+    env = VampireSurvivorsSimVecEnv(num_envs=1, overrides={"obs_channels_first": request.param})
+    m = PPO("CnnPolicy", env, n_steps=16, batch_size=16, seed=0, device="cpu")
+    m.env_obs_shape = env.observation_space.shape
+    yield m
+    env.close()
+
+
+def test_torchscript_export_matches_sb3(tmp_path, model):
+    path = export_policy(model, model.env_obs_shape, "torchscript", str(tmp_path / "p.torchscript.pt"))
+    rt = PolicyRuntime("torchscript", path)
+    assert check_agreement(model, rt, model.env_obs_shape, n=32) == 1.0
+    assert rt.latency.n == 0  # agreement calls are not counted as play latency
+    a = rt.act(np.zeros(model.env_obs_shape, dtype=np.uint8))
+    assert 0 <= a < 9 and rt.latency.n == 1
+
+
+def test_quantized_torchscript_export(tmp_path, model):
+    path = export_policy(model, model.env_obs_shape, "torchscript", str(tmp_path / "p.int8.torchscript.pt"),
+                         quantize=True)
+    rt = PolicyRuntime("torchscript", path)
+    assert check_agreement(model, rt, model.env_obs_shape, n=32) >= 0.75
+
+
+def test_onnx_export_matches_sb3(tmp_path, model):
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("onnx")
+    path = export_policy(model, model.env_obs_shape, "onnx", str(tmp_path / "p.onnx"))
+    assert check_agreement(model, PolicyRuntime("onnx", path), model.env_obs_shape, n=32) == 1.0
+
+
+def test_unknown_formats_are_rejected(tmp_path, model):
+    with pytest.raises(ValueError):
+        export_policy(model, model.env_obs_shape, "tflite", str(tmp_path / "p"))
+    with pytest.raises(ValueError):
+        PolicyRuntime("tflite")
+
+
+def test_onnx_needs_onnxruntime(tmp_path, model, monkeypatch):
+    monkeypatch.setattr(play, "ort", None)
+    with pytest.raises(RuntimeError, match="onnxruntime"):
+        export_policy(model, model.env_obs_shape, "onnx", str(tmp_path / "p.onnx"))
+
+
+class FirstAction:
+    """Runtime stand-in: always action 0, latency of 1 ms."""
+
+    def __init__(self):
+        self.latency = play.Histogram()
+
+    def act(self, obs):
+        self.latency.add(1.0)
+        return 0
+
+
+def test_evaluate_reports_survival_on_a_synthetic_run(make_env):
+    env = make_env({"synthetic": {"game_over_after": 9}})
+    summary = evaluate(env, FirstAction(), episodes=1)
+    (ep,) = summary["episodes"]
+    assert ep["died"] and ep["steps"] == summary["survival_steps_max"]
+    assert summary["survival_steps_mean"] == ep["steps"]
+    assert summary["inference_ms_p50"] == pytest.approx(1.0, rel=0.12)
+
+    env = make_env()
+    summary = evaluate(env, FirstAction(), episodes=2, max_steps=3)
+    assert [e["steps"] for e in summary["episodes"]] == [3, 3]
+    assert not any(e["died"] for e in summary["episodes"])
@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from capture_fixed import SyntheticCapture
+from recorder import EpisodeRecorder, ReplayCapture
+from signals import load_signals
+from vs_env_fixed import make_source
+
+TEMPLATES = {"hud": "templates/hud.png", "player": "templates/player.png",
+             "game_over": "templates/game_over.png"}
+ACTIONS = [4, 4, 1, 0, 7, 2]
+
+
+def _record(make_env, tmp_path):
+    env = make_env({
+        "record": {"enabled": True, "dir": str(tmp_path / "rec"), "chunk_frames": 4},
+        "signal_log": {"enabled": True, "dir": str(tmp_path / "sig")},
+    })
+    env.reset()
+    rewards = [env.step(a)[1] for a in ACTIONS]
+    env.close()  # flushes the recorder and the signal log
+    return env, rewards
+
+
+def test_recorded_episode_replays_through_make_source(tmp_path, make_env):
+    env, _ = _record(make_env, tmp_path)
+    episodes = sorted((tmp_path / "rec").iterdir())
+    assert len(episodes) == 1
+    n = 1 + env.action_repeat * len(ACTIONS)  # the reset frame + every sub-step
+
+    src = make_source({"capture_source": "replay", "replay": {"path": str(tmp_path / "rec"), "loop": False},
+                       "roi": env.cfg["roi"]})
+    assert isinstance(src, ReplayCapture) and len(src) == n
+    assert src.origin == (0, 0) and src.fps == env.fps
+    # SyntheticCapture is deterministic, so the same seed regenerates what the env saw.
+    live = SyntheticCapture(TEMPLATES, width=960, height=540, bars=list(env.cfg["roi"].values()), seed=0)
+    for _ in range(n):
+        np.testing.assert_array_equal(src.grab(), live.grab())
+    with pytest.raises(EOFError):
+        src.grab()
+
+    rec = src.signals()
+    sig = load_signals(str(tmp_path / "sig"))
+    assert rec["action"].tolist() == [-1] + [a for a in ACTIONS for _ in range(env.action_repeat)]
+    np.testing.assert_allclose(rec["xp"], sig["xp"], rtol=1e-6)
+    np.testing.assert_allclose(rec["hp"], sig["hp"], rtol=1e-6)
+    np.testing.assert_array_equal(rec["px"], sig["cx"])
+    np.testing.assert_array_equal(rec["py"], sig["cy"])
+    assert not rec["game_over"].any()
+
+
+def test_replayed_run_gives_the_same_rewards(tmp_path, make_env):
+    _, rewards = _record(make_env, tmp_path)
+    env = make_env({"capture_source": "replay", "replay": {"path": str(tmp_path / "rec"), "loop": False}})
+    env.reset()
+    assert [env.step(a)[1] for a in ACTIONS] == pytest.approx(rewards)
+
+
+def test_recorder_chunks_and_episodes(tmp_path):
+    rec = EpisodeRecorder(str(tmp_path), chunk_frames=3)
+    frames = [np.full((4, 6, 3), i, dtype=np.uint8) for i in range(7)]
+    for ep in range(2):
+        rec.begin_episode(origin=(10, 20), fps=15.0)
+        for i, f in enumerate(frames):
+            rec.record(f, i, xp=i / 10, hp=1.0, player_xy=(None, None) if i == 3 else (i, 2 * i),
+                       game_over=i == 6, t=float(i))
+    rec.close()
+    episodes = sorted(tmp_path.iterdir())
+    assert len(episodes) == 2
+    assert len(list(episodes[0].glob("chunk_*.bin"))) == 3  # 3 + 3 + 1 frames
+
+    src = ReplayCapture(str(episodes[0]), loop=True)
+    assert src.origin == (10, 20) and len(src) == 7
+    got = [int(src.grab()[0, 0, 0]) for _ in range(9)]
+    assert got == [0, 1, 2, 3, 4, 5, 6, 0, 1]  # loops back to the start
+    s = src.signals()
+    assert s["action"].tolist() == list(range(7))
+    assert s["px"][3] == -1 and s["py"][3] == -1  # unknown position
+    assert s["game_over"].tolist() == [False] * 6 + [True]
+    assert len(ReplayCapture(str(tmp_path))) == 14  # both episodes, in name order
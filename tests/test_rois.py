@@ -0,0 +1,33 @@
+import pytest
+
+from vs_env_fixed import check_rois
+
+BAD = {"roi": {"xp_bar": [300, 10, 300, 12], "hp_bar": [900, 300, 100, 8]}}  # runs past x=960
+
+
+def test_check_rois_accepts_bars_inside_the_window():
+    check_rois({"xp_bar": [100, 50, 200, 10]}, (100, 50, 200, 10))  # touching every edge
+    check_rois({"hp_bar": [0, 0, 1, 1]}, (0, 0, 960, 540))
+
+
+@pytest.mark.parametrize("roi", [[99, 50, 20, 10], [100, 49, 20, 10], [290, 50, 20, 10],
+                                 [100, 55, 20, 10], [100, 50, 0, 10]])
+def test_check_rois_rejects_bars_outside_the_window(roi):
+    with pytest.raises(ValueError, match="roi.xp_bar"):
+        check_rois({"xp_bar": roi}, (100, 50, 200, 10))
+
+
+def test_direct_capture_checks_the_synthetic_frame(make_env):
+    with pytest.raises(ValueError, match="roi.hp_bar"):
+        make_env(BAD)
+
+
+def test_capture_thread_checks_its_first_frame(make_env):
+    with pytest.raises(ValueError, match="roi.hp_bar"):
+        make_env({**BAD, "capture_thread": {"enabled": True}})
+
+
+def test_capture_pipeline_checks_the_probe_frame(make_env):
+    # Raised from VisionPipeline.start() before any worker process is spawned.
+    with pytest.raises(ValueError, match="roi.hp_bar"):
+        make_env({**BAD, "capture_pipeline": {"enabled": True, "workers": 1}})
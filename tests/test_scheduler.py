@@ -0,0 +1,75 @@
+import pytest
+
+import scheduler
+from scheduler import StepScheduler
+
+
+class FakeClock:
+    """Stands in for the ``time`` module: sleep() just advances monotonic()."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.slept = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, dt):
+        self.slept += dt
+        self.now += dt
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = FakeClock()
+    monkeypatch.setattr(scheduler, "time", c)
+    return c
+
+
+def test_processing_time_is_absorbed_into_the_period(clock):
+    s = StepScheduler(0.1)
+    for _ in range(5):
+        clock.now += 0.04  # capture + vision + reward
+        assert s.wait() == pytest.approx(0.0)
+    assert clock.now == pytest.approx(0.5)
+    assert s.overruns == 0 and s.resyncs == 0
+    assert s.stats()["period_ms"] == pytest.approx(100.0)
+
+
+def test_overrun_is_counted_and_caught_up_without_resync(clock):
+    s = StepScheduler(0.1, max_lag=3)
+    s.wait()                        # t=0.1
+    clock.now += 0.15               # t=0.25, 0.05 past the 0.2 deadline
+    assert s.wait() == pytest.approx(0.05)
+    assert s.overruns == 1
+    clock.now += 0.01
+    assert s.wait() == pytest.approx(0.0)  # the next deadline (0.3) is still on the old grid
+    assert clock.now == pytest.approx(0.3)
+    assert s.resyncs == 0
+
+
+def test_long_stall_resyncs_to_now(clock):
+    s = StepScheduler(0.1, max_lag=3)
+    s.wait()                        # t=0.1, next deadline 0.2
+    clock.now += 1.0                # t=1.1, ten periods late
+    assert s.wait() == pytest.approx(0.9)
+    assert (s.overruns, s.resyncs) == (1, 1)
+    # Re-anchored: one period from now instead of a burst of catch-up ticks.
+    assert s.deadline == pytest.approx(1.2)
+    assert not s.is_stale()
+    clock.now += 0.15
+    assert s.is_stale()
+    st = s.stats()
+    assert st["overruns"] == 1 and st["resyncs"] == 1
+    assert st["late_ms_max"] == pytest.approx(900.0)
+
+
+def test_reset_reanchors_and_clears_counters(clock):
+    s = StepScheduler(0.1)
+    clock.now += 5.0
+    s.wait()
+    assert s.overruns == 1
+    s.reset()
+    assert (s.ticks, s.overruns, s.resyncs) == (0, 0, 0)
+    assert s.deadline == pytest.approx(5.1)
+    assert s.wait() == pytest.approx(0.0)
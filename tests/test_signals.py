@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from signals import load_signals, params_from_config, relabel
+from vs_env_fixed import merge_config
+
+CASES = {
+    # Otsu bar reading: real XP/HP deltas every sub-step.
+    "otsu": {},
+    # Calibrated reader that never gets enough contrast (and may not assume a
+    # one-part bar is full or empty): every XP/HP reading is NaN.
+    "nan_xp": {"bar_reader": {"mode": "calibrated", "min_contrast": 1000, "xp": None, "hp": None,
+                              "uniform": {"xp": None, "hp": None}}},
+    # Tight per-step limits so most steps hit the clip.
+    "clipped": {"reward": {"max_positive_per_step": 0.012, "max_negative_per_step": 0.03}},
+}
+
+
+def _run(env, steps=40, seed=0):
+    rng = np.random.default_rng(seed)
+    rewards = []
+    terminated = False
+    env.reset()
+    for _ in range(steps):
+        _, r, terminated, _, _ = env.step(int(rng.integers(0, 9)))
+        rewards.append(r)
+        if terminated:
+            break
+    params = params_from_config(env.cfg)
+    env.close()  # flushes the signal log
+    return np.array(rewards, dtype=np.float32), terminated, params
+
+
+@pytest.mark.parametrize("case", sorted(CASES))
+def test_relabel_reproduces_logged_step_rewards(tmp_path, make_env, case):
+    env = make_env(merge_config({
+        "signal_log": {"enabled": True, "dir": str(tmp_path / "signals")},
+        "synthetic": {"game_over_after": 25},
+        "reward": {"idle_when_unknown_penalty": 0.01},
+    }, CASES[case]))
+    rewards, terminated, params = _run(env)
+    cols = load_signals(str(tmp_path / "signals"))
+    ep, step, relabeled = relabel(cols, params)
+
+    assert terminated and cols["game_over"].sum() == 1
+    # The game-over step (-25) is clipped to the negative limit, in both.
+    assert rewards[-1] == relabeled[-1] == pytest.approx(-params["max_neg"])
+    assert (ep == ep[0]).all()
+    np.testing.assert_array_equal(step, np.arange(1, rewards.size + 1))
+    np.testing.assert_allclose(relabeled, rewards, atol=1e-5)
+
+    if case == "nan_xp":
+        assert np.isnan(cols["xp"]).all()
+    if case == "clipped":
+        lo, hi = -params["max_neg"], params["max_pos"]
+        assert np.isclose(rewards, hi).any() and np.isclose(rewards, lo).any()
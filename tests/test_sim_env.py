@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from sim_env import VampireSurvivorsSimVecEnv
+
+
+@pytest.fixture
+def sim(in_repo):
+    env = VampireSurvivorsSimVecEnv(4, "config_fixed.yaml", seed=0)
+    env.reset()
+    yield env
+    env.close()
+
+
+def test_each_step_pushes_action_repeat_frames(sim):
+    assert sim.repeat == 2 and sim.stack_n == 4
+    rendered = []
+
+    def render(idx):  # stamp every rendered frame with its render count
+        rendered.append(idx.size)
+        return np.full((idx.size, sim.obs_h, sim.obs_w), len(rendered), dtype=np.uint8)
+
+    sim._render = render
+    sim.reset()
+    obs, _, _, _ = sim.step(np.full(4, 4))
+    # Reset fills the stack with one frame; a step adds one frame per sub-step.
+    assert obs[0, 0, 0].tolist() == [1, 1, 2, 3]
+    obs, _, _, _ = sim.step(np.full(4, 4))
+    assert obs[0, 0, 0].tolist() == [2, 3, 4, 5]
+    assert rendered == [4] * 5
+
+
+def test_per_sub_step_terms_count_action_repeat_times(sim):
+    sim.reset()
+    # No enemies on screen yet: only the time bonus and (for action 0) the idle penalty.
+    actions = np.array([0, 0, 1, 1])
+    _, reward, _, _ = sim.step(actions)
+    idle = sim.repeat * (sim.time_reward - sim.idle_w)
+    moving = sim.repeat * sim.time_reward
+    np.testing.assert_allclose(reward, [idle, idle, moving, moving], rtol=1e-5)
+
+
+def test_arena_stops_at_game_over(sim):
+    sim.reset()
+    sim.hp[0] = 1e-3
+    sim.enemies[0, 0] = sim.pos[0]
+    sim.alive[0, 0] = True
+    _, reward, dones, infos = sim.step(np.zeros(4, dtype=np.int64))
+    assert dones[0] and infos[0]["terminated"] and not dones[1:].any()
+    assert reward[0] == pytest.approx(-sim.max_neg)
+    assert infos[0]["episode"]["l"] == 1
+    assert "terminal_observation" in infos[0]
+    assert sim.hp[0] == 1.0  # the arena was reset for the next episode
+
+
+def test_env_method_runs_once_and_set_attr_needs_every_arena(sim):
+    calls = []
+    sim.bump = lambda x: calls.append(x) or x
+    assert sim.env_method("bump", 7) == [7, 7, 7, 7]
+    assert calls == [7]
+    sim.set_attr("idle_w", 0.5)
+    assert sim.get_attr("idle_w") == [0.5] * 4
+    with pytest.raises(ValueError):
+        sim.set_attr("idle_w", 0.1, indices=[0])
+    with pytest.raises(ValueError):
+        sim.env_method("bump", 1, indices=[1, 2])
+    assert sim.idle_w == 0.5 and calls == [7]
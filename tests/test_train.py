@@ -0,0 +1,133 @@
+import collections
+import copy
+import importlib
+import sys
+import types
+
+import pytest
+import yaml
+from stable_baselines3.common.vec_env import DummyVecEnv, VecTransposeImage
+
+from conftest import ROOT, SYNTHETIC
+from vs_env_fixed import merge_config
+
+
+class FakeConsole(types.ModuleType):
+    """Stands in for Windows' ``msvcrt``: keys queued with press() are read by kbhit/getwch."""
+
+    def __init__(self):
+        super().__init__("msvcrt")
+        self.keys = collections.deque()
+
+    def press(self, *keys):
+        self.keys.extend(keys)
+
+    def kbhit(self):
+        return bool(self.keys)
+
+    def getwch(self):
+        return self.keys.popleft()
+
+
+@pytest.fixture
+def train(in_repo, tmp_path, monkeypatch):
+    """train_fixed with a fake console and CONFIG_PATH pointing at a synthetic copy of config_fixed.yaml."""
+    console = FakeConsole()
+    monkeypatch.setitem(sys.modules, "msvcrt", console)
+    monkeypatch.delitem(sys.modules, "train_fixed", raising=False)
+    mod = importlib.import_module("train_fixed")
+    mod.console = console
+    base = yaml.safe_load(open(ROOT / "config_fixed.yaml", "r", encoding="utf-8"))
+    path = tmp_path / "config.yaml"
+
+    def configure(instances=None, **overrides):
+        cfg = merge_config(merge_config(base, copy.deepcopy(SYNTHETIC)), overrides)
+        cfg["instances"] = instances
+        path.write_text(yaml.safe_dump(cfg), encoding="utf-8")
+        monkeypatch.setattr(mod, "CONFIG_PATH", str(path))
+
+    mod.configure = configure
+    envs = []
+    mod.built = envs
+    yield mod
+    for env in envs:
+        env.close()
+
+
+def _build(train):
+    env = train.build_env()
+    train.built.append(env)
+    return env
+
+
+def _inner(env):
+    return env.venv if isinstance(env, VecTransposeImage) else env
+
+
+def test_single_instance_runs_in_process(train):
+    train.configure()
+    env = _build(train)
+    assert isinstance(_inner(env), DummyVecEnv) and env.num_envs == 1
+    assert env.observation_space.shape[0] == 4  # channels first for CnnPolicy
+
+
+def test_each_instance_gets_its_own_overrides(train, monkeypatch):
+    # SubprocVecEnv re-imports train_fixed in spawned workers, where the fake console does not exist;
+    # the per-instance wiring is the same in process.
+    started = []
+    monkeypatch.setattr(train, "SubprocVecEnv",
+                        lambda fns, start_method: started.append(start_method) or DummyVecEnv(fns))
+    train.configure(instances=[
+        {"roi": {"hp_bar": [420, 300, 100, 8]}, "synthetic": {"seed": 1}},
+        {"roi": {"hp_bar": [100, 200, 120, 10]}, "synthetic": {"seed": 2}},
+    ])
+    env = _build(train)
+    assert started == ["spawn"] and env.num_envs == 2
+    assert _inner(env).get_attr("roi_hp") == [[420, 300, 100, 8], [100, 200, 120, 10]]
+    assert [e.cfg["roi"]["xp_bar"] for e in _inner(env).envs] == [[300, 10, 300, 12]] * 2  # merged, not replaced
+
+
+@pytest.mark.parametrize("inst, match", [
+    ({"capture_window": [0, 0, 960, 540]}, "capture_window"),
+    ({"capture_pipeline": {"enabled": True}}, "capture_pipeline"),
+])
+def test_build_env_rejects_bad_instances(train, inst, match):
+    train.configure(instances=[{}, inst])
+    with pytest.raises(ValueError, match=match):
+        train.build_env()
+
+
+def test_hotkeys_pause_every_env_and_quit_saves_once(train, monkeypatch):
+    monkeypatch.setattr(train, "SubprocVecEnv", lambda fns, start_method: DummyVecEnv(fns))
+    train.configure(instances=[{}, {}])
+    env = _build(train)
+
+    class Writer:
+        def __init__(self):
+            self.submits = []
+
+        def submit(self, model, **kw):
+            self.submits.append(kw)
+
+    writer = Writer()
+    cb = train.ConsoleHotkeyCallback("models/test", verbose=0, checkpoints=writer, phases=[(1, 100), (2, 100)])
+    cb.init_callback(types.SimpleNamespace(get_env=lambda: env, num_timesteps=150, logger=None))
+    cb.num_timesteps = 150
+
+    calls = []
+    real = env.env_method
+    monkeypatch.setattr(env, "env_method", lambda name, *a, **kw: calls.append(
+        (name, a, _inner(env).get_attr("paused"))) or real(name, *a, **kw))
+    # p pauses every env and a second p resumes them.
+    train.console.press("p", "p")
+    assert cb._on_step() is True
+    assert [c[:2] for c in calls] == [("set_paused", (True,)), ("set_paused", (False,))]
+    assert calls[1][2] == [True, True]  # both envs were paused before the resume
+    assert _inner(env).get_attr("paused") == [False, False]
+    assert writer.submits == []
+
+    # q while paused unpauses every env and saves once.
+    train.console.press("p", "q")
+    assert cb._on_step() is False
+    assert _inner(env).get_attr("paused") == [False, False] and cb.quit_requested
+    assert writer.submits == [{"phase": 2, "path": "models/test.zip", "rotate": True}]
@@ -0,0 +1,137 @@
+import cv2
+import numpy as np
+import pytest
+
+from vision import AdaptivePlayerTracker, EnemyDensityEstimator, ScreenChangeDetector, enemy_density_ring
+
+
+def _frame(h=240, w=320, seed=0):
+    rng = np.random.default_rng(seed)
+    # Dense texture, so the mask is busy right up to every patch border.
+    gray = rng.integers(0, 256, (h, w), dtype=np.uint8)
+    return np.repeat(gray[:, :, None], 3, axis=2)
+
+
+def test_score_many_matches_enemy_density_ring():
+    frame = _frame()
+    est = EnemyDensityEstimator(8, 40)
+    # A 3x3 move grid around a centre plus centres clipped by each edge.
+    positions = [(160 + dx, 120 + dy) for dy in (-24, 0, 24) for dx in (-24, 0, 24)]
+    positions += [(10, 120), (310, 120), (160, 5), (160, 235), (0, 0)]
+    got = est.score_many(frame, positions)
+    want = [enemy_density_ring(frame, x, y, 8, 40) for x, y in positions]
+    np.testing.assert_allclose(got, want, atol=1e-6)
+
+
+def test_screen_change_detector_skips_static_frames_and_flags_changes():
+    menu = _frame(216, 384, seed=1)
+    det = ScreenChangeDetector(threshold=4.0)
+    assert det.update(menu)  # nothing checked yet
+    det.mark()
+    for _ in range(5):
+        assert not det.update(menu.copy())
+    assert det.last_diff == 0.0
+
+    gameplay = np.clip(menu.astype(np.int16) - 60, 0, 255).astype(np.uint8)
+    assert det.update(gameplay)
+    assert det.last_diff > 4.0
+    det.mark()
+    assert not det.update(gameplay.copy())
+
+
+def test_screen_change_detector_ignores_small_noise():
+    base = np.full((216, 384, 3), 100, dtype=np.uint8)
+    rng = np.random.default_rng(2)
+    det = ScreenChangeDetector(threshold=4.0)
+    det.update(base)
+    det.mark()
+    for _ in range(5):
+        noisy = np.clip(base.astype(np.int16) + rng.integers(-3, 4, base.shape), 0, 255).astype(np.uint8)
+        assert not det.update(noisy)
+
+
+PLAYER = "templates/player.png"
+
+
+def _arena(tpl=None, xy=None, seed=0):
+    """1920x1080 noisy background with ``tpl`` centred on ``xy``."""
+    frame = np.random.default_rng(seed).integers(40, 90, (1080, 1920, 3), dtype=np.uint8)
+    if xy is not None:
+        h, w = tpl.shape[:2]
+        x, y = xy[0] - w // 2, xy[1] - h // 2
+        frame[y:y + h, x:x + w] = tpl
+    return frame
+
+
+@pytest.fixture
+def player(in_repo):
+    return cv2.imread(PLAYER, cv2.IMREAD_COLOR)
+
+
+def test_adaptive_tracker_widens_in_tiers(player):
+    tr = AdaptivePlayerTracker(PLAYER)
+    # (position, expected tier): no history -> coarse; small moves -> predicted;
+    # a 300 px jump is outside the predicted window but inside 2x search_radius;
+    # a jump across the screen needs the whole-frame pass.
+    for xy, tier in [((500, 500), "coarse"), ((510, 500), "predicted"), ((520, 500), "predicted"),
+                     ((820, 500), "widened"), ((1500, 900), "coarse")]:
+        cx, cy, val = tr.locate(_arena(player, xy))
+        assert (cx, cy) == xy and val > 0.99
+        assert tr.last_tier == tier
+    x, y, val = tr.locate(_arena())
+    assert x is None and y is None and val < tr.thresh and tr.last_tier == "miss"
+    assert tr.last_xy == (1500, 900)  # the last known position is kept for the next search
+    assert {t: s["count"] for t, s in tr.stats().items()} == \
+        {"predicted": 2, "widened": 1, "coarse": 2, "full": 0, "miss": 1}
+
+
+def test_adaptive_tracker_full_res_last_resort(tmp_path):
+    # A 1-px checkerboard averages out to flat gray on the pyramid, so only the full-res scan finds it.
+    board = (np.indices((40, 40)).sum(0) % 2 * 200 + 30).astype(np.uint8)
+    path = str(tmp_path / "board.png")
+    cv2.imwrite(path, cv2.cvtColor(board, cv2.COLOR_GRAY2BGR))
+    frame = _arena(cv2.imread(path, cv2.IMREAD_COLOR), (700, 400))
+    tr = AdaptivePlayerTracker(path)
+    assert tr.locate(frame)[:2] == (700, 400) and tr.last_tier == "full"
+    tr.reset()
+    tr.full_scan = False
+    assert tr.locate(frame)[:2] == (None, None) and tr.last_tier == "miss"
+
+
+def test_adaptive_tracker_confidence_and_velocity(player):
+    tr = AdaptivePlayerTracker(PLAYER)
+    tr.locate(_arena(player, (600, 500)))
+    assert tr.confidence == pytest.approx(0.3, abs=0.01)  # 0.7 * 0 + 0.3 * ~1.0
+    assert tr.velocity.tolist() == [0.0, 0.0]
+    tr.locate(_arena(player, (620, 490)))
+    assert tr.velocity.tolist() == [10.0, -5.0]  # half of the first move
+    tr.locate(_arena(player, (640, 480)))
+    assert tr.velocity.tolist() == [15.0, -7.5]  # running mean of the moves
+    for i in range(1, 15):  # steady tracking drives confidence up, so the window tightens
+        tr.locate(_arena(player, (640 + 20 * i, 480)))
+        assert tr.last_tier == "predicted"
+    assert tr.confidence > 0.95
+    # 150 px off the prediction fits search_radius but not the tightened window.
+    tr.locate(_arena(player, (940 + 150, 480)))
+    assert tr.last_tier == "widened"
+
+    before = tr.confidence
+    tr.locate(_arena())
+    assert tr.confidence == pytest.approx(0.7 * before)
+    assert tr.velocity.tolist() == [0.0, 0.0]
+    tr.reset()
+    assert tr.last_xy is None and tr.confidence == 0.0
+
+
+def test_adaptive_tracker_follows_the_heading(player):
+    # With a confident tracker the window is tight; the held direction moves it along.
+    tr = AdaptivePlayerTracker(PLAYER, min_radius=40, move_px=160.0)
+    for i in range(12):
+        tr.locate(_arena(player, (600, 500)))
+    assert tr.confidence > 0.95
+    tr.set_heading((1.0, 0.0))
+    tr.locate(_arena(player, (680, 500)))  # 80 px along the heading: the predicted centre
+    assert tr.last_tier == "predicted"
+    tr.set_heading((-1.0, 0.0))
+    tr.locate(_arena(player, (760, 500)))  # 80 px against it
+    assert tr.last_tier == "widened"
@@ -1,12 +1,19 @@
+import argparse
+import copy
 import yaml
 import time
 import os
 import msvcrt
 from stable_baselines3 import PPO
-from stable_baselines3.common.vec_env import DummyVecEnv, VecTransposeImage
+from functools import partial
+from stable_baselines3.common.vec_env import DummyVecEnv, SubprocVecEnv, VecTransposeImage
+from stable_baselines3.common.preprocessing import is_image_space_channels_first
 
-from vs_env_fixed import VampireSurvivorsEnv
-from curriculum import set_curriculum
+from vs_env_fixed import VampireSurvivorsEnv, merge_config
+from callbacks import GamePauseCallback, CurriculumCallback, MetricsCallback, PeriodicCheckpointCallback
+from checkpoint import CheckpointWriter, latest_checkpoint, set_rng_state
+from curriculum import remaining_phases, phase_at
+from frame_buffer import DedupRolloutBuffer
 
 
 from stable_baselines3.common.callbacks import BaseCallback
@@ -16,32 +23,37 @@ class ConsoleHotkeyCallback(BaseCallback):
     - Press 'p' to pause/resume (no actions sent while paused)
     - Press 'q' to save and quit safely
     """
-    def __init__(self, save_path: str, verbose: int = 1):
+    def __init__(self, save_path: str, verbose: int = 1, checkpoints=None, phases=None):
         super().__init__(verbose)
         self.save_path = save_path
         self._paused = False
+        # checkpoints: CheckpointWriter; the quit save then happens off this thread.
+        self.checkpoints = checkpoints
+        self.phases = phases
+        self.quit_requested = False
 
-    def _get_base_env(self):
-        # VecEnv -> first env -> unwrap
-        env = self.training_env.envs[0]
-        return env.unwrapped if hasattr(env, "unwrapped") else env
+    def _set_paused(self, paused: bool):
+        # env_method reaches every env, in-process (DummyVecEnv) or in workers (SubprocVecEnv).
+        self.training_env.env_method("set_paused", paused)
 
     def _toggle_pause(self):
         self._paused = not self._paused
-        env = self._get_base_env()
-        if hasattr(env, "set_paused"):
-            env.set_paused(self._paused)
+        self._set_paused(self._paused)
         if self.verbose:
             print(f"[hotkeys] {'PAUSED' if self._paused else 'RESUMED'} (press 'p' to toggle, 'q' to quit)")
 
     def _safe_quit(self):
         # unpause + release keys + save model
-        env = self._get_base_env()
-        if hasattr(env, "set_paused"):
-            env.set_paused(False)
+        self._set_paused(False)
         # Save
-        os.makedirs(os.path.dirname(self.save_path), exist_ok=True)
-        self.model.save(self.save_path)
+        self.quit_requested = True
+        if self.checkpoints is not None:
+            phase = phase_at(self.phases, self.num_timesteps) if self.phases else None
+            # One snapshot for both the quit save and the rotating checkpoint --resume picks up.
+            self.checkpoints.submit(self.model, phase=phase, path=self.save_path + ".zip", rotate=True)
+        else:
+            os.makedirs(os.path.dirname(self.save_path), exist_ok=True)
+            self.model.save(self.save_path)
         if self.verbose:
             print(f"[hotkeys] Saved model to: {self.save_path}")
             print("[hotkeys] Stopping training now.")
@@ -74,15 +86,49 @@ class ConsoleHotkeyCallback(BaseCallback):
         return True
 
 
-def make_env():
-    return VampireSurvivorsEnv("config_fixed.yaml")
+CONFIG_PATH = "config_fixed.yaml"
+
+def make_env(rank: int = 0):
+    # Each entry of `instances` overrides the base config for one game window
+    # (capture_mode: window + capture_window / monitor_index / input_window / roi ...).
+    cfg = yaml.safe_load(open(CONFIG_PATH, "r", encoding="utf-8"))
+    instances = cfg.get("instances") or [{}]
+    return VampireSurvivorsEnv(CONFIG_PATH, overrides=instances[rank])
 
 def build_env():
-    env = DummyVecEnv([make_env])
-    env = VecTransposeImage(env)
+    cfg = yaml.safe_load(open(CONFIG_PATH, "r", encoding="utf-8"))
+    instances = cfg.get("instances") or []
+    n = max(1, len(instances))
+    for i, inst in enumerate(instances):
+        icfg = merge_config(copy.deepcopy(cfg), inst)
+        # capture_mode: monitor grabs the whole screen and ignores capture_window.
+        if "capture_window" in inst and icfg.get("capture_mode", "monitor") not in ("window", "regions"):
+            raise ValueError(
+                f"instance {i} sets capture_window but capture_mode is "
+                f"{icfg.get('capture_mode', 'monitor')!r}: set capture_mode: window for it"
+            )
+        # SubprocVecEnv workers are daemonic and cannot start the pipeline's processes.
+        if n > 1 and (icfg.get("capture_pipeline", {}) or {}).get("enabled", False):
+            raise ValueError(
+                f"capture_pipeline cannot be enabled with {n} instances (instance {i}): "
+                "disable capture_pipeline or use a single instance"
+            )
+    fns = [partial(make_env, i) for i in range(n)]
+    # One worker process per game window so capture + vision scale across cores.
+    env = SubprocVecEnv(fns, start_method="spawn") if n > 1 else DummyVecEnv(fns)
+    # With obs_channels_first the env already emits (C, H, W); no transpose needed.
+    if not is_image_space_channels_first(env.observation_space):
+        env = VecTransposeImage(env)
     return env
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--init-model", default=None,
+                        help="start from saved PPO weights, e.g. vs_ppo_sim.zip from sim_env.py")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue mid-phase from the latest checkpoint in checkpoint.dir")
+    args = parser.parse_args()
+
     print("Starting training in 5 seconds. Click the game window so it has focus...")
     time.sleep(5)
 
@@ -92,40 +138,88 @@ if __name__ == "__main__":
         (3, 500_000),
     ]
 
-    model = None
-    for phase, steps in phases:
-        cfg = yaml.safe_load(open("config.yaml", "r", encoding="utf-8"))
-        set_curriculum(cfg, phase)
-        with open("config.yaml", "w", encoding="utf-8") as f:
-            yaml.safe_dump(cfg, f, sort_keys=False)
-
-        env = build_env()
-
-        if model is None:
-            model = PPO(
-                policy="CnnPolicy",
-                env=env,
-                verbose=1,
-                n_steps=2048,
-                batch_size=64,
-                learning_rate=2.5e-4,
-                gamma=0.99,
-                gae_lambda=0.95,
-                clip_range=0.2,
-                tensorboard_log="./tb/",
-                seed=0,
-            )
-            hotkeys = ConsoleHotkeyCallback(
-            save_path="models/ppo_vs_rl",
-            verbose=1
-            )
-
+    base_cfg = yaml.safe_load(open(CONFIG_PATH, "r", encoding="utf-8"))
+    ccfg = base_cfg.get("curriculum", {}) or {}
+
+    # The env is built once; curriculum phases only change reward weights,
+    # which CurriculumCallback pushes into the running env(s) in place.
+    env = build_env()
+
+    # Optionally keep each 84x84 frame once in the rollout buffer instead of
+    # full stacks; each env step pushes action_repeat new frames.
+    buffer_kwargs = {}
+    if (base_cfg.get("rollout_buffer", {}) or {}).get("dedup_frames", False):
+        buffer_kwargs = dict(
+            rollout_buffer_class=DedupRolloutBuffer,
+            rollout_buffer_kwargs={"frames_per_step": float(base_cfg["action_repeat"])},
+        )
+
+    kcfg = base_cfg.get("checkpoint", {}) or {}
+    ckpt_dir = kcfg.get("dir", "checkpoints")
+    resume_path, resume_state = latest_checkpoint(ckpt_dir) if args.resume else (None, None)
+    if args.resume and resume_path is None:
+        print(f"[checkpoint] nothing to resume in {ckpt_dir}/, starting fresh")
+
+    if resume_path is not None:
+        # Policy, optimizer and num_timesteps come from the zip; RNG state from its sidecar.
+        model = PPO.load(resume_path, env=env, tensorboard_log="./tb/", **buffer_kwargs)
+        set_rng_state(resume_state["rng"])
+        print(f"[checkpoint] resumed {resume_path} at t={model.num_timesteps} (phase {resume_state['phase']})")
+    elif args.init_model:
+        # Fine-tune pretrained (e.g. simulator) weights on the real game.
+        model = PPO.load(args.init_model, env=env, tensorboard_log="./tb/", **buffer_kwargs)
+        # The pretraining step count must not select a curriculum phase here.
+        model.num_timesteps = 0
+        model._episode_num = 0
+    else:
+        model = PPO(
+            policy="CnnPolicy",
+            env=env,
+            verbose=1,
+            n_steps=2048,
+            batch_size=64,
+            learning_rate=2.5e-4,
+            gamma=0.99,
+            gae_lambda=0.95,
+            clip_range=0.2,
+            tensorboard_log="./tb/",
+            seed=0,
+            **buffer_kwargs,
+        )
+    checkpoints = CheckpointWriter(ckpt_dir, keep=int(kcfg.get("keep", 3)))
+    hotkeys = ConsoleHotkeyCallback(
+    save_path="models/ppo_vs_rl",
+    verbose=1,
+    checkpoints=checkpoints,
+    phases=phases,
+    )
+
+    callbacks = [
+        hotkeys,
+        CurriculumCallback(phases, blend_steps=int(ccfg.get("blend_steps", 0)), verbose=1),
+    ]
+    if base_cfg.get("auto_pause", {}).get("enabled", False):
+        callbacks.append(GamePauseCallback(verbose=1))
+    icfg = base_cfg.get("instrumentation", {}) or {}
+    if icfg.get("enabled", False):
+        callbacks.append(MetricsCallback(every=int(icfg.get("every_rollouts", 1)),
+                                         histograms=bool(icfg.get("histograms", True))))
+    if int(kcfg.get("every_steps", 0)) > 0:
+        callbacks.append(PeriodicCheckpointCallback(checkpoints, int(kcfg["every_steps"]), phases, verbose=1))
+
+    try:
+        # On resume, finished phases are skipped and the current one runs only its remainder.
+        start = model.num_timesteps if resume_path is not None else 0
+        for phase, steps in remaining_phases(phases, start):
+            print(f"\n=== PHASE {phase} | {steps} timesteps ===\n")
+            # reset_num_timesteps=False keeps num_timesteps global, which the
+            # curriculum schedule is keyed on.
+            model.learn(total_timesteps=steps, callback=callbacks, reset_num_timesteps=False)
+            if hotkeys.quit_requested:
+                break
+            checkpoints.submit(model, phase=phase, path=f"vs_ppo_phase{phase}.zip", rotate=True)
         else:
-            model.set_env(env)
-
-        print(f"\n=== PHASE {phase} | {steps} timesteps ===\n")
-        model.learn(total_timesteps=steps, callback=hotkeys)
-        model.save(f"vs_ppo_phase{phase}.zip")
+            checkpoints.submit(model, phase=phases[-1][0], path="vs_ppo_final.zip")
+    finally:
         env.close()
-
-    model.save("vs_ppo_final.zip")
+        checkpoints.close()
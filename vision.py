@@ -1,8 +1,15 @@
+import time
 import cv2
 import numpy as np
+from functools import lru_cache
 from pathlib import Path
 
+from frame_context import as_context, to_gray
+from metrics import NULL_METRICS
+
 class PlayerTracker:
+    metrics = NULL_METRICS
+
     def __init__(self, template_path: str, threshold: float = 0.72, search_radius: int = 220):
         p = Path(template_path)
         if not p.exists():
@@ -16,6 +23,9 @@ class PlayerTracker:
         self.last_xy = None
         self.th, self.tw = self.tpl.shape[:2]
 
+    def reset(self):
+        self.last_xy = None
+
     def _roi_around_last(self, frame_shape):
         H, W = frame_shape[:2]
         cx, cy = self.last_xy
@@ -26,8 +36,8 @@ class PlayerTracker:
         y2 = min(H, cy + r)
         return x1, y1, x2, y2
 
-    def locate(self, frame_bgr: np.ndarray):
-        gray = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY)
+    def locate(self, frame_bgr):
+        gray = as_context(frame_bgr).gray
 
         if self.last_xy is not None:
             x1, y1, x2, y2 = self._roi_around_last(gray.shape)
@@ -40,8 +50,11 @@ class PlayerTracker:
                 cx = px + self.tw // 2
                 cy = py + self.th // 2
                 self.last_xy = (cx, cy)
+                self.metrics.count("player_found")
                 return cx, cy, float(max_val)
 
+        # Fallback: full-frame search (first frame, or lost inside the ROI).
+        self.metrics.count("player_fullframe_searches")
         res = cv2.matchTemplate(gray, self.tpl, cv2.TM_CCOEFF_NORMED)
         _, max_val, _, max_loc = cv2.minMaxLoc(res)
         if max_val >= self.thresh:
@@ -49,31 +62,311 @@ class PlayerTracker:
             cx = px + self.tw // 2
             cy = py + self.th // 2
             self.last_xy = (cx, cy)
+            self.metrics.count("player_found")
             return cx, cy, float(max_val)
 
+        self.metrics.count("player_lost")
         return None, None, float(max_val)
 
-def enemy_density_ring(frame_bgr: np.ndarray, cx: int, cy: int, r_in: int, r_out: int) -> float:
-    H, W = frame_bgr.shape[:2]
-    x1 = max(0, cx - r_out)
-    y1 = max(0, cy - r_out)
-    x2 = min(W, cx + r_out)
-    y2 = min(H, cy + r_out)
-    patch = frame_bgr[y1:y2, x1:x2]
+class AdaptivePlayerTracker(PlayerTracker):
+    """PlayerTracker with motion prediction and staged, cheap-first search.
 
-    gray = cv2.cvtColor(patch, cv2.COLOR_BGR2GRAY)
-    blur = cv2.GaussianBlur(gray, (0, 0), sigmaX=3.0)
-    diff = cv2.subtract(blur, gray)
-    _, mask = cv2.threshold(diff, 12, 255, cv2.THRESH_BINARY)
+    The next position is predicted from the recent velocity and the held
+    action (``set_heading``); the first search window is sized from recent
+    match confidence. If that misses, the search widens in tiers and only
+    scans the full frame at full resolution as a last resort:
+
+      "predicted"  full-res window around the prediction
+      "widened"    window of 2x search_radius around the prediction on pyramid
+                   level ``coarse_level``, refined (skipped when that window is
+                   over half the frame: "coarse" is then as cheap)
+      "coarse"     whole frame on pyramid level ``coarse_level``, refined
+      "full"       whole frame at full res (``full_scan=True`` only)
+
+    ``last_tier``/``last_ms`` describe the latest call and ``stats()`` the
+    hit counts and mean time per tier.
+    """
+
+    TIERS = ("predicted", "widened", "coarse", "full", "miss")
+
+    def __init__(self, template_path: str, threshold: float = 0.72, search_radius: int = 220,
+                 min_radius: int = 60, move_px: float = 8.0, coarse_level: int = 2,
+                 full_scan: bool = True, refine_margin: int = 6):
+        super().__init__(template_path, threshold, search_radius)
+        self.min_radius = int(min_radius)
+        self.move_px = float(move_px)
+        self.coarse_level = int(coarse_level)
+        self.full_scan = bool(full_scan)
+        self.refine_margin = int(refine_margin)
+        self._tpl_pyr = [self.tpl]
+        for _ in range(max(1, self.coarse_level)):
+            self._tpl_pyr.append(cv2.pyrDown(self._tpl_pyr[-1]))
+        self.heading = (0.0, 0.0)
+        self.velocity = np.zeros(2, dtype=np.float32)
+        self.confidence = 0.0
+        self.last_tier = None
+        self.last_ms = 0.0
+        self._counts = dict.fromkeys(self.TIERS, 0)
+        self._time = dict.fromkeys(self.TIERS, 0.0)
+
+    def reset(self):
+        super().reset()
+        self.velocity[:] = 0.0
+        self.confidence = 0.0
+
+    def set_heading(self, direction):
+        """Unit (dx, dy) of the currently held action."""
+        self.heading = (float(direction[0]), float(direction[1]))
+
+    def stats(self) -> dict:
+        return {
+            tier: {"count": self._counts[tier],
+                   "mean_ms": 1000.0 * self._time[tier] / self._counts[tier] if self._counts[tier] else 0.0}
+            for tier in self.TIERS
+        }
+
+    def _match(self, img, tpl, x0, y0):
+        """Best match of tpl in img; returns (score, top-left x, top-left y) in img's scale + offset."""
+        th, tw = tpl.shape[:2]
+        if img.shape[0] < th or img.shape[1] < tw:
+            return -1.0, 0, 0
+        res = cv2.matchTemplate(img, tpl, cv2.TM_CCOEFF_NORMED)
+        _, max_val, _, max_loc = cv2.minMaxLoc(res)
+        return float(max_val), x0 + max_loc[0], y0 + max_loc[1]
+
+    def _window(self, shape, cx, cy, r):
+        H, W = shape[:2]
+        return max(0, int(cx - r)), max(0, int(cy - r)), min(W, int(cx + r)), min(H, int(cy + r))
+
+    def _full_res(self, gray, cx, cy, r):
+        x1, y1, x2, y2 = self._window(gray.shape, cx, cy, r)
+        return self._match(gray[y1:y2, x1:x2], self.tpl, x1, y1)
+
+    def _pyramid(self, ctx, level, rect):
+        """Coarse search of rect (full-res coords) on a pyramid level, refined at full res."""
+        s = 2 ** level
+        x1, y1, x2, y2 = rect
+        img = ctx.pyramid(level)[y1 // s:y2 // s, x1 // s:x2 // s]
+        val, px, py = self._match(img, self._tpl_pyr[level], x1 // s, y1 // s)
+        if val < 0.8 * self.thresh:
+            return val, 0, 0
+        # Refine around the coarse candidate's centre.
+        cx, cy = px * s + self.tw // 2, py * s + self.th // 2
+        r = max(self.tw, self.th) // 2 + s + self.refine_margin
+        return self._full_res(ctx.gray, cx, cy, r)
+
+    def _accept(self, tier, val, px, py, t0):
+        cx, cy = px + self.tw // 2, py + self.th // 2
+        if self.last_xy is not None:
+            d = np.array([cx - self.last_xy[0], cy - self.last_xy[1]], dtype=np.float32)
+            self.velocity = 0.5 * self.velocity + 0.5 * d
+        self.last_xy = (cx, cy)
+        self.confidence = 0.7 * self.confidence + 0.3 * val
+        self._finish(tier, t0)
+        return cx, cy, float(val)
+
+    def _finish(self, tier, t0):
+        self.last_ms = 1000.0 * (time.perf_counter() - t0)
+        self.last_tier = tier
+        self._counts[tier] += 1
+        self._time[tier] += self.last_ms / 1000.0
+        self.metrics.count("player_lost" if tier == "miss" else "player_found")
+        if tier in ("coarse", "full", "miss"):
+            self.metrics.count("player_fullframe_searches")
+
+    def locate(self, frame_bgr):
+        t0 = time.perf_counter()
+        ctx = as_context(frame_bgr)
+        gray = ctx.gray
+        H, W = gray.shape[:2]
+        best = -1.0
+
+        if self.last_xy is not None:
+            hx, hy = self.heading
+            pred_x = self.last_xy[0] + 0.5 * (self.velocity[0] + hx * self.move_px)
+            pred_y = self.last_xy[1] + 0.5 * (self.velocity[1] + hy * self.move_px)
+            # Confident recent matches -> tight window; shaky ones -> up to search_radius.
+            slack = float(np.clip((1.0 - self.confidence) / max(1e-6, 1.0 - self.thresh), 0.0, 1.0))
+            r = self.min_radius + slack * (self.search_radius - self.min_radius) + float(np.abs(self.velocity).max())
+            r = max(r, max(self.tw, self.th))
+
+            val, px, py = self._full_res(gray, pred_x, pred_y, r)
+            best = max(best, val)
+            if val >= self.thresh:
+                return self._accept("predicted", val, px, py, t0)
+
+            rect = self._window(gray.shape, pred_x, pred_y, 2 * self.search_radius)
+            if (rect[2] - rect[0]) * (rect[3] - rect[1]) <= 0.5 * W * H:
+                val, px, py = self._pyramid(ctx, self.coarse_level, rect)
+                best = max(best, val)
+                if val >= self.thresh:
+                    return self._accept("widened", val, px, py, t0)
 
-    ph, pw = gray.shape
+        val, px, py = self._pyramid(ctx, self.coarse_level, (0, 0, W, H))
+        best = max(best, val)
+        if val >= self.thresh:
+            return self._accept("coarse", val, px, py, t0)
+
+        if self.full_scan:
+            val, px, py = self._match(gray, self.tpl, 0, 0)
+            best = max(best, val)
+            if val >= self.thresh:
+                return self._accept("full", val, px, py, t0)
+
+        self.confidence *= 0.7
+        self.velocity[:] = 0.0
+        self._finish("miss", t0)
+        return None, None, float(best)
+
+@lru_cache(maxsize=128)
+def _ring_index(ph: int, pw: int, ccx: int, ccy: int, r_in: int, r_out: int) -> np.ndarray:
+    """Flat indices of the ring pixels inside a (ph, pw) patch centred at (ccx, ccy).
+
+    The geometry only changes with the radii or when the patch is clipped at a
+    screen edge, so the result is cached on exactly those values.
+    """
     yy, xx = np.ogrid[:ph, :pw]
-    ccx = cx - x1
-    ccy = cy - y1
     dist2 = (xx - ccx) ** 2 + (yy - ccy) ** 2
     ring = (dist2 >= r_in * r_in) & (dist2 <= r_out * r_out)
+    idx = np.flatnonzero(ring)
+    idx.flags.writeable = False
+    return idx
 
-    ring_mask = mask[ring]
-    if ring_mask.size == 0:
+@lru_cache(maxsize=16)
+def _ring_offsets(r_in: int, r_out: int, stride: int) -> np.ndarray:
+    """Flat offsets of the unclipped ring pixels in a row-major image of width `stride`."""
+    idx = _ring_index(2 * r_out, 2 * r_out, r_out, r_out, r_in, r_out)
+    dy, dx = np.divmod(idx, 2 * r_out)
+    off = ((dy - r_out) * stride + (dx - r_out)).astype(np.int64)
+    off.flags.writeable = False
+    return off
+
+_MASK_SIGMA = 3.0
+# Reach of the mask blur (OpenCV's 8-bit kernel radius is 3 sigma), plus one.
+_MASK_PAD = int(np.ceil(3 * _MASK_SIGMA)) + 1
+
+def enemy_mask(gray: np.ndarray) -> np.ndarray:
+    """Small dark blobs (pixels well below their blurred surroundings) as 0/255."""
+    blur = cv2.GaussianBlur(gray, (0, 0), sigmaX=_MASK_SIGMA)
+    diff = cv2.subtract(blur, gray)
+    _, mask = cv2.threshold(diff, 12, 255, cv2.THRESH_BINARY)
+    return mask
+
+def _enemy_mask_rect(gray: np.ndarray, x1: int, y1: int, x2: int, y2: int) -> np.ndarray:
+    """enemy_mask of gray[y1:y2, x1:x2], blurred with the real surroundings.
+
+    The crop is padded by the blur radius (within the frame) and cut back, so
+    a pixel's value does not depend on where the crop happens to end.
+    """
+    H, W = gray.shape[:2]
+    px1, py1 = max(0, x1 - _MASK_PAD), max(0, y1 - _MASK_PAD)
+    px2, py2 = min(W, x2 + _MASK_PAD), min(H, y2 + _MASK_PAD)
+    mask = enemy_mask(gray[py1:py2, px1:px2])
+    return mask[y1 - py1:y2 - py1, x1 - px1:x2 - px1]
+
+def enemy_density_ring(frame_bgr, cx: int, cy: int, r_in: int, r_out: int) -> float:
+    ctx = as_context(frame_bgr)
+    H, W = ctx.shape[:2]
+    x1 = max(0, cx - r_out)
+    y1 = max(0, cy - r_out)
+    x2 = min(W, cx + r_out)
+    y2 = min(H, cy + r_out)
+    mask = _enemy_mask_rect(ctx.gray, x1, y1, x2, y2)
+
+    ph, pw = mask.shape
+    idx = _ring_index(ph, pw, cx - x1, cy - y1, int(r_in), int(r_out))
+    if idx.size == 0:
         return 0.0
-    return float((ring_mask > 0).mean())
+    return float(np.count_nonzero(mask.ravel()[idx]) / idx.size)
+
+class EnemyDensityEstimator:
+    """Ring enemy density with cached geometry and a batched API.
+
+    ``score`` matches enemy_density_ring. ``score_many`` evaluates several
+    candidate centres (e.g. where each of the 9 actions would move the
+    player) in one vectorized pass: the enemy mask is computed once over the
+    union of their patches and every unclipped ring is gathered with one
+    fancy index. Centres whose patch is clipped by a screen edge take the
+    single-position path.
+    """
+
+    def __init__(self, r_in: int, r_out: int):
+        self.r_in = int(r_in)
+        self.r_out = int(r_out)
+
+    def score(self, frame_bgr, cx: int, cy: int) -> float:
+        return enemy_density_ring(frame_bgr, cx, cy, self.r_in, self.r_out)
+
+    def score_many(self, frame_bgr, positions) -> np.ndarray:
+        ctx = as_context(frame_bgr)
+        H, W = ctx.shape[:2]
+        pos = np.asarray(positions, dtype=np.int32).reshape(-1, 2)
+        if pos.shape[0] == 0:
+            return np.zeros(0, dtype=np.float32)
+        r = self.r_out
+        x1 = max(0, int(pos[:, 0].min()) - r)
+        y1 = max(0, int(pos[:, 1].min()) - r)
+        x2 = min(W, int(pos[:, 0].max()) + r)
+        y2 = min(H, int(pos[:, 1].max()) + r)
+        if x2 <= x1 or y2 <= y1:
+            return np.zeros(pos.shape[0], dtype=np.float32)
+        out = np.zeros(pos.shape[0], dtype=np.float32)
+        inside = (pos[:, 0] >= r) & (pos[:, 0] + r <= W) & (pos[:, 1] >= r) & (pos[:, 1] + r <= H)
+        if inside.any():
+            mask = np.ascontiguousarray(_enemy_mask_rect(ctx.gray, x1, y1, x2, y2))
+            stride = x2 - x1
+            off = _ring_offsets(self.r_in, self.r_out, stride)
+            p = pos[inside]
+            base = (p[:, 1] - y1) * stride + (p[:, 0] - x1)
+            hits = mask.ravel()[base[:, None] + off[None, :]]
+            out[inside] = np.count_nonzero(hits, axis=1) / max(off.size, 1)
+        for i in np.flatnonzero(~inside):
+            out[i] = self.score(ctx, int(pos[i, 0]), int(pos[i, 1]))
+        return out
+
+
+class ScreenChangeDetector:
+    """Decides which frames are worth an expensive check while waiting for a screen transition.
+
+    Every frame is reduced to a tiny grayscale thumbnail (strided subsample +
+    area resize, well under a millisecond at 1080p). ``update`` says "check"
+    when the thumbnail differs from the one of the last checked frame
+    (``mark``) by more than ``threshold`` mean gray levels, or when the screen
+    moved since that check and has now settled, so the end state of a fade
+    gets checked too.
+    """
+
+    def __init__(self, threshold: float = 4.0, size=(48, 27), stride: int = 8):
+        self.threshold = float(threshold)
+        self.size = (int(size[0]), int(size[1]))
+        self.stride = max(1, int(stride))
+        self.reset()
+
+    def reset(self):
+        self._ref = None
+        self._prev = None
+        self._moved = False
+        self.last_diff = 0.0
+
+    def thumbnail(self, frame_bgr) -> np.ndarray:
+        f = as_context(frame_bgr).frame
+        small = cv2.resize(f[::self.stride, ::self.stride], self.size, interpolation=cv2.INTER_AREA)
+        return to_gray(small).astype(np.int16)
+
+    def update(self, frame_bgr) -> bool:
+        """Feed the next frame; True if it should be checked (then call ``mark``)."""
+        thumb = self.thumbnail(frame_bgr)
+        prev, self._prev = self._prev, thumb
+        if self._ref is None:
+            return True
+        self.last_diff = float(np.abs(thumb - self._ref).mean())
+        if self.last_diff > self.threshold:
+            return True
+        moving = float(np.abs(thumb - prev).mean()) > self.threshold
+        self._moved = self._moved or moving
+        return self._moved and not moving
+
+    def mark(self):
+        """The frame last passed to ``update`` was checked."""
+        self._ref = self._prev
+        self._moved = False
@@ -3,19 +3,88 @@ import yaml
 import numpy as np
 import gymnasium as gym
 from gymnasium import spaces
-from collections import deque
 
-from capture_fixed import MonitorCapture, preprocess
+from capture_fixed import MonitorCapture, SyntheticCapture, FileCapture, FrameStacker
+from capture_worker import CaptureWorker
+from recorder import EpisodeRecorder, ReplayCapture
+from scheduler import StepScheduler
+from pipeline import VisionPipeline, Analysis
+from signals import SignalLog
+from metrics import Metrics, NULL_METRICS
+from frame_context import FrameContext
 from controls import KeyController
-from reward import crop, bar_fill_ratio, TemplateMatcher
-from vision import PlayerTracker, enemy_density_ring
+from reward import bar_fill_ratio, make_bar_reader, make_matcher
+from vision import PlayerTracker, AdaptivePlayerTracker, EnemyDensityEstimator, ScreenChangeDetector
+
+# Unit screen-space direction (dx, dy) each Discrete(9) action moves the player;
+# must stay in sync with _action_to_keys and KeyController.actions.
+_D = 0.5 ** 0.5
+ACTION_DIRS = np.array([
+    (0.0, 0.0), (0.0, -1.0), (0.0, 1.0), (-1.0, 0.0), (1.0, 0.0),
+    (-_D, -_D), (_D, -_D), (-_D, _D), (_D, _D),
+], dtype=np.float32)
+
+def merge_config(cfg: dict, overrides: dict) -> dict:
+    """Recursively apply `overrides` on top of `cfg` (in place) and return it."""
+    for k, v in (overrides or {}).items():
+        if isinstance(v, dict) and isinstance(cfg.get(k), dict):
+            merge_config(cfg[k], v)
+        else:
+            cfg[k] = v
+    return cfg
+
+def make_source(cfg: dict):
+    """Capture source selected by ``capture_source`` (also built inside pipeline processes)."""
+    source = cfg.get("capture_source", "monitor")
+    bars = [cfg["roi"]["xp_bar"], cfg["roi"]["hp_bar"]]
+    if source == "monitor":
+        # "monitor" grabs the whole screen; "window"/"regions" grab only the game
+        # viewport (and, for "regions", the XP/HP strips on their own).
+        return MonitorCapture(
+            int(cfg.get("monitor_index", 1)),
+            mode=cfg.get("capture_mode", "monitor"),
+            window=cfg.get("capture_window"),
+            regions=bars,
+        )
+    if source == "synthetic":
+        scfg = cfg.get("synthetic", {}) or {}
+        return SyntheticCapture(
+            cfg["templates"],
+            width=int(scfg.get("width", 1920)),
+            height=int(scfg.get("height", 1080)),
+            bars=bars,
+            game_over_after=scfg.get("game_over_after"),
+            seed=int(scfg.get("seed", 0)),
+        )
+    if source == "file":
+        return FileCapture(cfg["capture_file"], loop=bool(cfg.get("capture_file_loop", True)))
+    if source == "replay":
+        rcfg = cfg.get("replay", {}) or {}
+        return ReplayCapture(rcfg["path"], loop=bool(rcfg.get("loop", True)))
+    raise ValueError(f"Unknown capture_source: {source!r}")
+
+def check_rois(rois: dict, window):
+    """Raise if an (x, y, w, h) roi is not fully inside the captured ``window``.
+
+    Both are in monitor coordinates; a roi outside the frame crops to an
+    empty (or clipped) strip and the bar reader fails on the first step.
+    """
+    wx, wy, ww, wh = (int(v) for v in window)
+    for name, roi in rois.items():
+        x, y, w, h = (int(v) for v in roi)
+        if w <= 0 or h <= 0 or x < wx or y < wy or x + w > wx + ww or y + h > wy + wh:
+            raise ValueError(
+                f"roi.{name} {[x, y, w, h]} is outside the captured window {[wx, wy, ww, wh]}; "
+                "fix roi (monitor coordinates) or capture_window"
+            )
 
 class VampireSurvivorsEnv(gym.Env):
     metadata = {"render_modes": []}
 
-    def __init__(self, config_path="config.yaml"):
+    def __init__(self, config_path="config.yaml", overrides=None):
         super().__init__()
         cfg = yaml.safe_load(open(config_path, "r", encoding="utf-8"))
+        cfg = merge_config(cfg, overrides)
         self.cfg = cfg
 
         self.obs_w = int(cfg["obs_width"])
@@ -25,59 +94,225 @@ class VampireSurvivorsEnv(gym.Env):
         self.dt = 1.0 / self.fps
         self.action_repeat = int(cfg["action_repeat"])
 
-        keys = cfg["keys"]
-        self.controller = KeyController(keys["up"], keys["down"], keys["left"], keys["right"])
-        self.cap = MonitorCapture(int(cfg.get("monitor_index", 1)))
+        # timing.mode "deadline" paces sub-steps on absolute monotonic deadlines
+        # (processing time is absorbed into dt); "sleep" is the old sleep(dt).
+        tm = cfg.get("timing", {}) or {}
+        self.scheduler = None
+        if tm.get("mode", "sleep") == "deadline":
+            self.scheduler = StepScheduler(self.dt, max_lag=float(tm.get("max_lag_periods", 3.0)))
+        self.skip_stale = bool(tm.get("skip_stale", False))
 
+        # Optional per-stage timers/counters, drained by MetricsCallback via metrics_snapshot().
+        icfg = cfg.get("instrumentation", {}) or {}
+        self.metrics = Metrics() if icfg.get("enabled", False) else NULL_METRICS
+        self._last_step_end = None
+
+        keys = cfg["keys"]
+        self.controller = KeyController(
+            keys["up"], keys["down"], keys["left"], keys["right"], window=cfg.get("input_window"),
+            backend=cfg.get("input_backend", "auto"),
+            threaded=bool((cfg.get("input_thread", {}) or {}).get("enabled", False)),
+        )
+        self.controller.metrics = self.metrics
+        if self.controller.dispatcher is not None:
+            self.controller.dispatcher.metrics = self.metrics
         self.roi_xp = cfg["roi"]["xp_bar"]
         self.roi_hp = cfg["roi"]["hp_bar"]
-
-        self.game_over_matcher = TemplateMatcher(cfg["templates"]["game_over"], threshold=0.75)
+        # In window mode the frame is only the capture_window; the bars must lie inside it.
+        if cfg.get("capture_source", "monitor") == "monitor" and cfg.get("capture_mode", "monitor") == "window" \
+                and cfg.get("capture_window") is not None:
+            check_rois({"xp_bar": self.roi_xp, "hp_bar": self.roi_hp}, cfg["capture_window"])
+        # bar_reader.mode "calibrated" reads XP/HP against fixed levels (see reward.BarReader).
+        bcfg = cfg.get("bar_reader", {}) or {}
+        self.xp_reader = make_bar_reader(bcfg, "xp")
+        self.hp_reader = make_bar_reader(bcfg, "hp")
+
+        # Optional background capture: a worker thread grabs at `fps` into a
+        # ring buffer and _grab_frame just takes the freshest frame.
+        tcfg = cfg.get("capture_thread", {}) or {}
+        pcfg = cfg.get("capture_pipeline", {}) or {}
+        self.capture_worker = None
+        self.pipeline = None
+        self.cap = None
+        self.frames_missed = 0
+        if pcfg.get("enabled", False):
+            # Capture and vision run in other processes; step() only consumes Analysis results.
+            if tcfg.get("enabled", False):
+                raise ValueError("capture_pipeline and capture_thread cannot both be enabled")
+            if cfg.get("capture_mode", "monitor") == "regions":
+                raise ValueError("capture_pipeline does not support capture_mode: regions")
+            if (cfg.get("record", {}) or {}).get("enabled", False):
+                raise ValueError("record needs full frames in the env process; disable capture_pipeline")
+            self.pipeline = VisionPipeline(
+                cfg, workers=int(pcfg.get("workers", 2)), slots=int(pcfg.get("slots", 0))
+            ).start()
+            for i, reader in enumerate((self.xp_reader, self.hp_reader)):
+                if reader is not None and reader.calibrated:
+                    self.pipeline.set_bar_levels(i, reader.levels)
+        elif tcfg.get("enabled", False):
+            if cfg.get("capture_mode", "monitor") == "regions":
+                raise ValueError("capture_thread does not support capture_mode: regions")
+            self.capture_worker = CaptureWorker(
+                self._make_source, self.fps, int(tcfg.get("buffer_size", 4))
+            ).start()
+            # The source is only built inside the worker; check the bars against its first frame.
+            h, w = self.capture_worker.shape[:2]
+            try:
+                check_rois({"xp_bar": self.roi_xp, "hp_bar": self.roi_hp},
+                           (*self.capture_worker.origin, w, h))
+            except ValueError:
+                self.capture_worker.stop()
+                raise
+        else:
+            self.cap = self._make_source()
+            if isinstance(self.cap, MonitorCapture) and self.cap.mode == "monitor":
+                check_rois({"xp_bar": self.roi_xp, "hp_bar": self.roi_hp}, self.cap.window)
+            elif isinstance(self.cap, SyntheticCapture):
+                check_rois({"xp_bar": self.roi_xp, "hp_bar": self.roi_hp}, (0, 0, self.cap.width, self.cap.height))
+
+        # Optional episode recording (frames + actions + signals) for offline replay.
+        rec = cfg.get("record", {}) or {}
+        self.recorder = None
+        if rec.get("enabled", False):
+            # Recordings hold the full frame only; regions mode reads the bars from separate strips.
+            if cfg.get("capture_mode", "monitor") == "regions":
+                raise ValueError("record does not support capture_mode: regions")
+            self.recorder = EpisodeRecorder(
+                rec.get("dir", "recordings"),
+                chunk_frames=int(rec.get("chunk_frames", 256)),
+                png_compression=int(rec.get("png_compression", 1)),
+            )
+            self.recorder.metrics = self.metrics
+
+        # Optional columnar log of the raw per-sub-step reward signals (see signals.relabel).
+        scfg = cfg.get("signal_log", {}) or {}
+        self.signal_log = None
+        if scfg.get("enabled", False):
+            self.signal_log = SignalLog(scfg.get("dir", "signals"), chunk_rows=int(scfg.get("chunk_rows", 65536)))
+        self.episode = -1
+
+        # matching.<name>.mode picks full-frame or coarse-to-fine pyramid matching.
+        mcfg = cfg.get("matching", {}) or {}
+        self.game_over_matcher = make_matcher(
+            cfg["templates"]["game_over"], 0.75, mcfg.get("game_over")
+        )
 
         # NEW: gameplay HUD matcher for reset waiting
-        self.hud_matcher = TemplateMatcher(
+        self.hud_matcher = make_matcher(
             cfg["templates"]["hud"],
-            threshold=float(cfg["reset_wait"]["hud_threshold"])
+            float(cfg["reset_wait"]["hud_threshold"]),
+            mcfg.get("hud"),
         )
+        self.game_over_matcher.metrics = self.metrics
+        self.hud_matcher.metrics = self.metrics
         self.reset_max_seconds = float(cfg["reset_wait"]["max_seconds"])
         self.reset_check_fps = float(cfg["reset_wait"]["check_fps"])
+        # reset_wait.mode "change" watches a cheap thumbnail diff at detect_fps and
+        # only runs the HUD match when the screen changed (or every recheck_seconds).
+        rw = cfg["reset_wait"]
+        self.reset_detector = None
+        mode = rw.get("mode", "poll")
+        if mode == "change":
+            self.reset_detector = ScreenChangeDetector(float(rw.get("change_threshold", 4.0)))
+        elif mode != "poll":
+            raise ValueError(f"Unknown reset_wait.mode: {mode!r}")
+        self.reset_detect_fps = float(rw.get("detect_fps", 15.0))
+        self.reset_recheck_seconds = float(rw.get("recheck_seconds", 1.0))
 
         vcfg = cfg["vision"]
-        self.player = PlayerTracker(
-            cfg["templates"]["player"],
-            threshold=float(vcfg["player_match_threshold"]),
-            search_radius=int(vcfg["search_radius"]),
-        )
+        tracker = vcfg.get("tracker", "fixed")
+        if tracker == "adaptive":
+            self.player = AdaptivePlayerTracker(
+                cfg["templates"]["player"],
+                threshold=float(vcfg["player_match_threshold"]),
+                search_radius=int(vcfg["search_radius"]),
+                min_radius=int(vcfg.get("min_radius", 60)),
+                move_px=float(vcfg.get("move_px", 8.0)),
+                coarse_level=int(vcfg.get("coarse_level", 2)),
+                full_scan=bool(vcfg.get("full_scan", True)),
+            )
+        elif tracker == "fixed":
+            self.player = PlayerTracker(
+                cfg["templates"]["player"],
+                threshold=float(vcfg["player_match_threshold"]),
+                search_radius=int(vcfg["search_radius"]),
+            )
+        else:
+            raise ValueError(f"Unknown vision.tracker: {tracker!r}")
+        self.player.metrics = self.metrics
         self.prev_player_xy = None
 
         ep = cfg["enemy_penalty"]
         self.r_in = int(ep["ring_inner"])
         self.r_out = int(ep["ring_outer"])
         self.enemy_w = float(ep["density_weight"])
+        self.density = EnemyDensityEstimator(self.r_in, self.r_out)
+        # >0: also report info["action_density"], the ring density at the spot
+        # each action would reach after moving lookahead_px.
+        self.lookahead_px = float(ep.get("lookahead_px", 0.0))
 
         ip = cfg["idle_penalty"]
         self.idle_speed_thr = float(ip["speed_px_threshold"])
         self.idle_w = float(ip["weight"])
 
+        # obs_channels_first emits (stack, h, w) directly so VecTransposeImage can be skipped.
+        self.frames = FrameStacker(
+            self.stack_n, self.obs_w, self.obs_h,
+            channels_first=bool(cfg.get("obs_channels_first", False)),
+        )
         self.action_space = spaces.Discrete(9)
         self.observation_space = spaces.Box(
-            low=0, high=255, shape=(self.obs_h, self.obs_w, self.stack_n), dtype=np.uint8
+            low=0, high=255, shape=self.frames.shape, dtype=np.uint8
         )
 
-        self.frames = deque(maxlen=self.stack_n)
         self.steps = 0
         self.paused = False  # toggled by hotkeys
         self.prev_xp = None
         self.prev_hp = None
 
+        # In-game pause used by GamePauseCallback while the learner updates.
+        pcfg = cfg.get("auto_pause", {}) or {}
+        self.pause_key = pcfg.get("key", "esc")
+        self.pause_settle = float(pcfg.get("settle_seconds", 0.2))
+        self.game_paused = False
+
+        self._load_reward_config()
+
+    def _load_reward_config(self):
         # Reward config (safe defaults)
-        rcfg = cfg.get('reward', {})
+        rcfg = self.cfg.get('reward', {})
         self.time_reward = float(rcfg.get('time_reward', 0.01))
         self.hp_loss_scale = float(rcfg.get('hp_loss_scale', 5.0))
         self.max_neg = float(rcfg.get('max_negative_per_step', 1.0))
         self.max_pos = float(rcfg.get('max_positive_per_step', 1.0))
         self.idle_when_unknown_penalty = float(rcfg.get('idle_when_unknown_penalty', 0.0))
 
+    def set_reward_params(self, density_weight=None, idle_weight=None, xp_scale=None, reward=None):
+        """Update reward shaping in place (curriculum phases, schedules, sweeps).
+
+        Writes through to self.cfg so the values survive reset(); no file I/O
+        and no env rebuild. ``reward`` is merged into the ``reward:`` block.
+        """
+        if density_weight is not None:
+            self.cfg["enemy_penalty"]["density_weight"] = float(density_weight)
+            self.enemy_w = float(density_weight)
+        if idle_weight is not None:
+            self.cfg["idle_penalty"]["weight"] = float(idle_weight)
+            self.idle_w = float(idle_weight)
+        if xp_scale is not None:
+            self.cfg["_xp_scale"] = float(xp_scale)
+        if reward:
+            self.cfg.setdefault("reward", {}).update(reward)
+            self._load_reward_config()
+
+    def get_reward_params(self) -> dict:
+        return {
+            "density_weight": self.enemy_w,
+            "idle_weight": self.idle_w,
+            "xp_scale": float(self.cfg.get("_xp_scale", 2.0)),
+            "reward": dict(self.cfg.get("reward", {}) or {}),
+        }
+
     def _action_to_keys(self, a: int):
         if a == 0: return []
         if a == 1: return [self.controller.up]
@@ -90,23 +325,103 @@ class VampireSurvivorsEnv(gym.Env):
         if a == 8: return [self.controller.down, self.controller.right]
         return []
 
+    def _make_source(self):
+        src = make_source(self.cfg)
+        src.metrics = self.metrics
+        return src
+
     def _grab_frame(self):
-        return self.cap.grab()
+        # Wrap once per capture so grayscale/crops are shared by every consumer.
+        if self.capture_worker is not None:
+            frame, _, _, missed = self.capture_worker.latest()
+            self.frames_missed += missed
+            return FrameContext(frame, origin=self.capture_worker.origin)
+        frame = self.cap.grab()
+        return FrameContext(frame, origin=self.cap.origin, regions=self.cap.grab_regions())
 
     def _get_obs(self, frame_bgr):
-        proc = preprocess(frame_bgr, self.obs_w, self.obs_h)
-        if len(self.frames) == 0:
-            for _ in range(self.stack_n):
-                self.frames.append(proc)
-        else:
-            self.frames.append(proc)
-        return np.stack(list(self.frames), axis=-1)
-
-    def _compute_signals(self, frame_bgr):
-        xp = bar_fill_ratio(crop(frame_bgr, self.roi_xp))
-        hp = bar_fill_ratio(crop(frame_bgr, self.roi_hp))
+        self.frames.push(frame_bgr)
+        return self.frames.observation()
+
+    def _compute_signals(self, frame):
+        if self.xp_reader is not None:
+            xp = self.xp_reader.read(frame.gray_crop(self.roi_xp))
+            hp = self.hp_reader.read(frame.gray_crop(self.roi_hp))
+            return xp, hp
+        xp = bar_fill_ratio(frame.gray_crop(self.roi_xp))
+        hp = bar_fill_ratio(frame.gray_crop(self.roi_hp))
         return xp, hp
 
+    def _smooth_signals(self, a):
+        # Pipeline workers measure bars unfiltered; the temporal filter runs here, in frame order.
+        if self.xp_reader is None or a.game_over:
+            return a
+        values = [a.xp, a.hp]
+        if a.profiles is not None:
+            # Workers missing a level send column profiles; calibration happens here,
+            # the levels go to every worker, and this frame is read with them.
+            for i, (reader, prof) in enumerate(zip((self.xp_reader, self.hp_reader), a.profiles)):
+                if not reader.complete and reader.calibrate_profile(prof):
+                    self.pipeline.set_bar_levels(i, reader.levels)
+                if reader.calibrated:
+                    values[i] = reader.measure_profile(prof)
+        return a._replace(xp=self.xp_reader.smooth(values[0]), hp=self.hp_reader.smooth(values[1]), profiles=None)
+
+    def _observe(self, analyze=True):
+        """One sub-step: push its frame onto the stack and return (frame, Analysis).
+
+        With capture_pipeline the analysis arrives ready from the worker
+        processes and frame is None; otherwise it is computed here.
+        """
+        m = self.metrics
+        if self.pipeline is not None:
+            with m.timer("capture_ms"):
+                a = self.pipeline.latest()
+            self.frames_missed += a.missed
+            self.frames.push_processed(a.obs)
+            return None, self._smooth_signals(a)
+        with m.timer("capture_ms"):
+            frame = self._grab_frame()
+        with m.timer("preprocess_ms"):
+            self.frames.push(frame)
+        if not analyze:
+            return frame, None
+        if self.game_over_matcher.matches(frame):
+            return frame, Analysis(0, 0.0, 0, None, True, False, np.nan, np.nan, None, None, np.nan, None)
+
+        t0 = time.perf_counter()
+        xp, hp = self._compute_signals(frame)
+        dens = np.nan
+        action_density = None
+        with m.timer("player_ms"):
+            cx, cy, _ = self.player.locate(frame)
+        if cx is not None:
+            dens = self.density.score(frame, cx, cy)
+            if self.lookahead_px > 0:
+                cands = np.rint(np.array([cx, cy]) + self.lookahead_px * ACTION_DIRS).astype(np.int32)
+                action_density = self.density.score_many(frame, cands)
+        m.observe("reward_ms", 1000.0 * (time.perf_counter() - t0))
+        return frame, Analysis(0, 0.0, 0, None, False, False, xp, hp, cx, cy, dens, action_density)
+
+    def _tick(self) -> float:
+        """Wait for the next sub-step; returns lateness in seconds (deadline mode)."""
+        if self.scheduler is None:
+            time.sleep(self.dt)
+            return 0.0
+        return self.scheduler.wait()
+
+    def metrics_snapshot(self, reset: bool = True):
+        """Drain this env's stage timings/counters (None when instrumentation is off)."""
+        return self.metrics.snapshot(reset)
+
+    def _record(self, frame, action, substep, xp=np.nan, hp=np.nan, cx=None, cy=None,
+                density=np.nan, game_over=False):
+        if self.recorder is not None:
+            self.recorder.record(frame.frame, action, xp, hp, (cx, cy), game_over)
+        if self.signal_log is not None:
+            self.signal_log.append(self.episode, self.steps, substep, action, game_over,
+                                   xp, hp, cx, cy, density)
+
     def reset(self, seed=None, options=None):
         super().reset(seed=seed)
         self.controller.release_all()
@@ -116,48 +431,94 @@ class VampireSurvivorsEnv(gym.Env):
         self.prev_xp = None
         self.prev_hp = None
 
-        # Reward config (safe defaults)
-        rcfg = self.cfg.get('reward', {})
-        self.time_reward = float(rcfg.get('time_reward', 0.01))
-        self.hp_loss_scale = float(rcfg.get('hp_loss_scale', 5.0))
-        self.max_neg = float(rcfg.get('max_negative_per_step', 1.0))
-        self.max_pos = float(rcfg.get('max_positive_per_step', 1.0))
-        self.idle_when_unknown_penalty = float(rcfg.get('idle_when_unknown_penalty', 0.0))
+        self._load_reward_config()
         self.prev_player_xy = None
-        self.player.last_xy = None
+        self.player.reset()
+        if self.xp_reader is not None:
+            self.xp_reader.reset()
+            self.hp_reader.reset()
+        self._last_step_end = None
+        if self.pipeline is not None:
+            self.pipeline.reset_tracking()
+            self.pipeline.set_want_hud(True)
 
         # Wait until you're actually in gameplay (HUD visible)
         deadline = time.time() + self.reset_max_seconds
-        last_frame = None
-        while True:
-            frame = self._grab_frame()
-            last_frame = frame
-
-            if self.hud_matcher.matches(frame):
-                obs = self._get_obs(frame)
-                xp, hp = self._compute_signals(frame)
-                self.prev_xp, self.prev_hp = xp, hp
-
-                cx, cy, _ = self.player.locate(frame)
-                if cx is not None:
-                    self.prev_player_xy = (cx, cy)
-
-                return obs, {}
-
-            # If we timed out, optionally continue anyway with the last captured frame.
-            if time.time() > deadline:
-                allow = bool(self.cfg.get("reset_wait", {}).get("allow_timeout_start", False))
-                if allow and last_frame is not None:
-                    obs = self._get_obs(last_frame)
-                    xp, hp = self._compute_signals(last_frame)
+        last = None
+        detector = self.reset_detector if self.pipeline is None else None
+        if detector is not None:
+            detector.reset()
+        wait_start = time.monotonic()
+        next_check = wait_start
+        hud_checks = 0
+        try:
+            while True:
+                if self.pipeline is not None:
+                    a = self.pipeline.latest()
+                    frame, in_game = None, a.hud
+                else:
+                    a = None
+                    frame = self._grab_frame()
+                    in_game = False
+                    if detector is None or detector.update(frame) or time.monotonic() >= next_check:
+                        in_game = self.hud_matcher.matches(frame)
+                        hud_checks += 1
+                        if detector is not None:
+                            detector.mark()
+                            next_check = time.monotonic() + self.reset_recheck_seconds
+                last = (frame, a)
+                waited = {"time_to_gameplay": time.monotonic() - wait_start, "hud_checks": hud_checks}
+
+                if in_game:
+                    obs, xp, hp, cx, cy = self._reset_signals(frame, a)
                     self.prev_xp, self.prev_hp = xp, hp
-                    return obs, {"reset_timeout": True}
-                # Otherwise, keep waiting (likely in menu). Print a hint occasionally.
-                if int(time.time()) % 5 == 0:
-                    print('[vs_env] Waiting for gameplay HUD... start a run in-game (Alt-Tab back and click).')
-                deadline = time.time() + self.reset_max_seconds
-
-            time.sleep(1.0 / self.reset_check_fps)
+                    if cx is not None:
+                        self.prev_player_xy = (cx, cy)
+
+                    self.episode += 1
+                    if self.recorder is not None:
+                        self.recorder.begin_episode(origin=frame.origin, fps=self.fps)
+                    self._record(frame, -1, -1, xp, hp, cx, cy)
+                    if self.scheduler is not None:
+                        self.scheduler.reset()
+                    self.metrics.observe("reset_wait_ms", 1000.0 * waited["time_to_gameplay"])
+                    return obs, waited
+
+                # If we timed out, optionally continue anyway with the last captured frame.
+                if time.time() > deadline:
+                    allow = bool(self.cfg.get("reset_wait", {}).get("allow_timeout_start", False))
+                    if allow and last is not None:
+                        obs, xp, hp, _, _ = self._reset_signals(*last, locate=False)
+                        self.prev_xp, self.prev_hp = xp, hp
+                        self.episode += 1
+                        if self.recorder is not None:
+                            self.recorder.begin_episode(origin=last[0].origin, fps=self.fps)
+                        self._record(last[0], -1, -1, xp, hp)
+                        if self.scheduler is not None:
+                            self.scheduler.reset()
+                        return obs, {"reset_timeout": True, **waited}
+                    # Otherwise, keep waiting (likely in menu). Print a hint occasionally.
+                    if int(time.time()) % 5 == 0:
+                        print('[vs_env] Waiting for gameplay HUD... start a run in-game (Alt-Tab back and click).')
+                    deadline = time.time() + self.reset_max_seconds
+
+                time.sleep(1.0 / (self.reset_detect_fps if detector is not None else self.reset_check_fps))
+        finally:
+            if self.pipeline is not None:
+                self.pipeline.set_want_hud(False)
+
+    def _reset_signals(self, frame, a, locate=True):
+        """First observation + signals of an episode, from a local frame or a pipeline Analysis."""
+        if a is not None:
+            self.frames.push_processed(a.obs)
+            a = self._smooth_signals(a)
+            return self.frames.observation(), a.xp, a.hp, a.cx, a.cy
+        obs = self._get_obs(frame)
+        xp, hp = self._compute_signals(frame)
+        cx = cy = None
+        if locate:
+            cx, cy, _ = self.player.locate(frame)
+        return obs, xp, hp, cx, cy
 
     
     def set_paused(self, paused: bool):
@@ -167,38 +528,80 @@ class VampireSurvivorsEnv(gym.Env):
             # ensure no stuck keys while paused
             self.controller.release_all()
 
+    def pause_game(self):
+        """Freeze the game itself (in-game pause key), e.g. during PPO updates."""
+        if self.game_paused:
+            return
+        self.controller.release_all()
+        self.controller.tap(self.pause_key)
+        self.game_paused = True
+        self._last_step_end = None
+
+    def resume_game(self):
+        if not self.game_paused:
+            return
+        self.controller.tap(self.pause_key)
+        self.game_paused = False
+        # Let the pause menu close, then restart pacing from "now".
+        time.sleep(self.pause_settle)
+        if self.scheduler is not None:
+            self.scheduler.reset()
+
     def step(self, action):
+        t_start = time.perf_counter()
+        m = self.metrics
+        if self._last_step_end is not None:
+            # Time spent outside the env between steps: policy inference + SB3 bookkeeping.
+            m.observe("outside_step_ms", 1000.0 * (t_start - self._last_step_end))
+        m.count("steps")
         self.steps += 1
+        self.frames_missed = 0
 
         # If paused, do not send actions; just return the latest observation.
         if self.paused:
             self.controller.release_all()
-            frame = self._grab_frame()
-            obs = self._get_obs(frame)
-            time.sleep(self.dt)
-            return obs, 0.0, False, False, {"paused": True, "steps": self.steps}
-
-        self.controller.hold(self._action_to_keys(int(action)))
+            self._observe(analyze=False)
+            obs = self.frames.observation()
+            self._tick()
+            self._last_step_end = time.perf_counter()
+            m.observe("step_ms", 1000.0 * (self._last_step_end - t_start))
+            return obs, 0.0, False, False, {"paused": True, "steps": self.steps, "frames_missed": self.frames_missed}
+
+        self.controller.hold_action(int(action))
+        if self.pipeline is not None:
+            self.pipeline.set_action(int(action))
+        elif hasattr(self.player, "set_heading"):
+            self.player.set_heading(ACTION_DIRS[int(action)])
 
         total_reward = 0.0
         terminated = False
         truncated = False
-        obs = None
-
-        for _ in range(self.action_repeat):
-            time.sleep(self.dt)
-            frame = self._grab_frame()
-            obs = self._get_obs(frame)
-
-            if self.game_over_matcher.matches(frame):
+        action_density = None
+        late = 0.0
+        skipped = 0
+
+        for i in range(self.action_repeat):
+            late = max(late, self._tick())
+            # Catch up after an overrun: drop whole sub-steps whose next deadline
+            # has already passed (never the last one, which produces the obs).
+            if self.skip_stale and i < self.action_repeat - 1 and self.scheduler is not None \
+                    and self.scheduler.is_stale():
+                skipped += 1
+                continue
+            # Only the last sub-step's observation is returned; _observe just pushes it.
+            frame, a = self._observe()
+
+            if a.game_over:
                 terminated = True
                 total_reward -= 25.0
+                self._record(frame, action, i, game_over=True)
                 break
 
-            xp, hp = self._compute_signals(frame)
+            xp, hp = a.xp, a.hp
             total_reward += self.time_reward
 
-            if self.prev_xp is not None:
+            # NaN bar readings (calibrated bar reader before its first calibration) give no delta.
+            if self.prev_xp is not None and not np.isnan(xp - self.prev_xp):
                 xp_scale = float(self.cfg.get("_xp_scale", 2.0))
                 total_reward += xp_scale * (xp - self.prev_xp)
 
@@ -209,9 +612,10 @@ class VampireSurvivorsEnv(gym.Env):
 
             self.prev_xp, self.prev_hp = xp, hp
 
-            cx, cy, _ = self.player.locate(frame)
+            cx, cy, dens = a.cx, a.cy, a.density
             if cx is not None:
-                dens = enemy_density_ring(frame, cx, cy, self.r_in, self.r_out)
+                if a.action_density is not None:
+                    action_density = a.action_density
                 total_reward -= self.enemy_w * dens
 
                 if self.prev_player_xy is not None:
@@ -225,13 +629,39 @@ class VampireSurvivorsEnv(gym.Env):
                 total_reward -= self.idle_when_unknown_penalty
                 self.prev_player_xy = None
 
+            self._record(frame, action, i, xp, hp, cx, cy, dens)
+
         # Clip reward for training stability
         if total_reward > self.max_pos:
             total_reward = self.max_pos
         if total_reward < -self.max_neg:
             total_reward = -self.max_neg
 
-        return obs, float(total_reward), terminated, truncated, {"steps": self.steps, "terminated": terminated}
+        obs = self.frames.observation()
+        info = {"steps": self.steps, "terminated": terminated, "frames_missed": self.frames_missed}
+        if action_density is not None:
+            info["action_density"] = action_density
+        if self.scheduler is not None:
+            st = self.scheduler.stats()
+            info["step_late_ms"] = 1000.0 * late
+            info["substeps_skipped"] = skipped
+            info["sched_overruns"] = st["overruns"]
+            info["sched_jitter_ms"] = st["jitter_ms"]
+            info["sched_period_ms"] = st["period_ms"]
+        if getattr(self.player, "last_tier", None) is not None:
+            info["player_search"] = self.player.last_tier
+            info["player_search_ms"] = self.player.last_ms
+        self._last_step_end = time.perf_counter()
+        m.observe("step_ms", 1000.0 * (self._last_step_end - t_start))
+        return obs, float(total_reward), terminated, truncated, info
 
     def close(self):
-        self.controller.release_all()
+        self.controller.close()
+        if self.pipeline is not None:
+            self.pipeline.stop()
+        if self.capture_worker is not None:
+            self.capture_worker.stop()
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.signal_log is not None:
+            self.signal_log.close()